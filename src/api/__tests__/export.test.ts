@@ -1,7 +1,293 @@
-import { runExport } from '../src/routers/export';
+import { LambdaClient } from '@aws-sdk/client-lambda';
+import { S3Client } from '@aws-sdk/client-s3';
+import { runExport, runImport, runPdfReview } from '../src/routers/export';
+
+const KMS_KEY_ARN = 'arn:aws:kms:us-east-1:123456789012:key/test-key';
+
+jest.mock('../src/process', () => ({
+  loadConfig: jest.fn(() => ({
+    REGION: 'us-east-1',
+    BUCKET_NAME: 'test-uploads',
+    KMS_KEY_ARN: 'arn:aws:kms:us-east-1:123456789012:key/test-key',
+  })),
+}));
+
+interface MockableCommand {
+  constructor: { name: string };
+  input: Record<string, unknown>;
+}
+
+// What a Python Lambda returns through Invoke: an API-style response in the payload.
+function lambdaResponse(statusCode: number, body: Record<string, unknown>) {
+  return {
+    Payload: new TextEncoder().encode(JSON.stringify({ statusCode, body: JSON.stringify(body) })),
+  };
+}
+
+function invokePayload(cmd: MockableCommand): Record<string, unknown> {
+  return JSON.parse(cmd.input.Payload as string);
+}
+
+let lambdaSendSpy: jest.SpyInstance;
+let s3SendSpy: jest.SpyInstance;
+
+beforeAll(() => {
+  lambdaSendSpy = jest.spyOn(LambdaClient.prototype, 'send');
+  s3SendSpy = jest.spyOn(S3Client.prototype, 'send');
+});
+
+afterAll(() => {
+  lambdaSendSpy.mockRestore();
+  s3SendSpy.mockRestore();
+});
+
+beforeEach(() => {
+  jest.clearAllMocks();
+  s3SendSpy.mockResolvedValue({});
+  process.env.IMPORT_INVENTORY_FUNCTION_NAME = 'import-fn';
+});
 
 describe('runExport()', () => {
-  it.skip('returns parsed pdf2404 and inventory CSV responses', async () => {});
+  // One invocation of an export function: how long it takes and what it returns.
+  interface Invocation {
+    ms: number;
+    statusCode: number;
+    body: Record<string, unknown>;
+  }
+
+  const START = 1_700_000_000_000;
+  let now: number;
+  let dateNowSpy: jest.SpyInstance;
+
+  // Answer each function's invocations in order, advancing the clock by their duration.
+  function invocations(byFunction: Record<string, Invocation[]>) {
+    lambdaSendSpy.mockImplementation(async (cmd: MockableCommand) => {
+      const next = byFunction[cmd.input.FunctionName as string].shift();
+      if (!next) throw new Error(`unexpected invocation of ${cmd.input.FunctionName}`);
+      now += next.ms;
+      return lambdaResponse(next.statusCode, next.body);
+    });
+  }
+
+  const finished = (ms: number, body: Record<string, unknown> = { ok: true }): Invocation => ({
+    ms,
+    statusCode: 200,
+    body,
+  });
+
+  const unfinished = (
+    ms: number,
+    continuation: string,
+    progress: Record<string, number>,
+  ): Invocation => ({
+    ms,
+    statusCode: 202,
+    body: { ok: true, done: false, continuation, progress },
+  });
+
+  function payloadsFor(functionName: string) {
+    return lambdaSendSpy.mock.calls
+      .map(([cmd]) => cmd as MockableCommand)
+      .filter((cmd) => cmd.input.FunctionName === functionName)
+      .map(invokePayload);
+  }
+
+  beforeEach(() => {
+    process.env.EXPORT_2404_FUNCTION_NAME = 'export-2404-fn';
+    process.env.EXPORT_INVENTORY_FUNCTION_NAME = 'export-inventory-fn';
+    now = START;
+    dateNowSpy = jest.spyOn(Date, 'now').mockImplementation(() => now);
+  });
+
+  afterEach(() => {
+    dateNowSpy.mockRestore();
+  });
+
+  it('returns parsed pdf2404 and inventory CSV responses', async () => {
+    const pdf2404 = { ok: true, url: 'https://example.com/2404.pdf' };
+    const csvInventory = { ok: true, url: 'https://example.com/inventory.csv' };
+    invocations({
+      'export-2404-fn': [finished(3_000, pdf2404)],
+      'export-inventory-fn': [finished(1_000, csvInventory)],
+    });
+
+    const res = await runExport('team123');
+
+    expect(res).toEqual({ success: true, pdf2404, csvInventory });
+  });
+
+  it('invokes both Lambda functions in parallel with the options and a budget', async () => {
+    let inFlight = 0;
+    let maxInFlight = 0;
+    lambdaSendSpy.mockImplementation(async () => {
+      inFlight += 1;
+      maxInFlight = Math.max(maxInFlight, inFlight);
+      await new Promise((resolve) => setImmediate(resolve));
+      inFlight -= 1;
+      return lambdaResponse(200, { ok: true });
+    });
+
+    await runExport('team123', { evidence: true, inventoryFormat: 'pdf' });
+
+    expect(maxInFlight).toBe(2);
+    expect(payloadsFor('export-2404-fn')).toEqual([
+      { teamId: 'team123', evidence: true, budgetMs: 23_000 },
+    ]);
+    expect(payloadsFor('export-inventory-fn')).toEqual([
+      { teamId: 'team123', format: 'pdf', budgetMs: 23_000 },
+    ]);
+  });
+
+  it('follows continuations while the budget leaves room for another invocation', async () => {
+    const done = { ok: true, url: 'https://example.com/2404.pdf' };
+    invocations({
+      'export-2404-fn': [
+        unfinished(5_000, 'c1', { items: 40 }),
+        unfinished(5_000, 'c2', { items: 80 }),
+        finished(3_000, done),
+      ],
+      'export-inventory-fn': [finished(0)],
+    });
+
+    const res = await runExport('team123');
+
+    expect(res).toEqual({ success: true, pdf2404: done, csvInventory: { ok: true } });
+    // Each invocation gets what is left of the 25 s budget, less the invoke overhead.
+    expect(payloadsFor('export-2404-fn')).toEqual([
+      { teamId: 'team123', budgetMs: 23_000 },
+      { teamId: 'team123', continuation: 'c1', budgetMs: 18_000 },
+      { teamId: 'team123', continuation: 'c2', budgetMs: 13_000 },
+    ]);
+  });
+
+  it('returns the continuation once less than MIN_EXPORT_INVOCATION_MS is left', async () => {
+    invocations({
+      'export-2404-fn': [
+        unfinished(8_000, 'c1', { items: 40 }),
+        unfinished(6_000, 'c2', { items: 70 }),
+      ],
+      'export-inventory-fn': [finished(0)],
+    });
+
+    const res = await runExport('team123');
+
+    // 11 s left after the second invocation: not enough for a third.
+    expect(payloadsFor('export-2404-fn')).toHaveLength(2);
+    expect(res).toEqual({
+      success: true,
+      done: false,
+      continuation: { pdf2404: 'c2', inventory: undefined },
+      progress: { pdf2404: { items: 70 }, inventory: undefined },
+    });
+  });
+
+  it('resumes both exports from the continuation of an earlier call', async () => {
+    invocations({
+      'export-2404-fn': [finished(2_000)],
+      'export-inventory-fn': [unfinished(2_000, 'i2', { groups: 5 }), finished(2_000)],
+    });
+
+    const res = await runExport('team123', { continuation: { pdf2404: 'c2', inventory: 'i1' } });
+
+    expect(res).toMatchObject({ success: true, pdf2404: { ok: true }, csvInventory: { ok: true } });
+    expect(payloadsFor('export-2404-fn')[0]).toMatchObject({ continuation: 'c2' });
+    expect(payloadsFor('export-inventory-fn').map((p) => p.continuation)).toEqual(['i1', 'i2']);
+  });
+
+  it('throws when the export functions are not configured', async () => {
+    delete process.env.EXPORT_2404_FUNCTION_NAME;
+
+    await expect(runExport('team123')).rejects.toThrow('Export function names not configured.');
+    expect(lambdaSendSpy).not.toHaveBeenCalled();
+  });
+});
+
+describe('runImport()', () => {
+  it('invokes the import Lambda with userId, csv and options', async () => {
+    lambdaSendSpy.mockResolvedValue(lambdaResponse(200, { ok: true, dryRun: true, items: 2 }));
+
+    const res = await runImport('team123', 'user1', 'NIIN,LIN\n', {
+      status: 'Completed',
+      dryRun: true,
+    });
+
+    expect(res).toEqual({ ok: true, dryRun: true, items: 2 });
+    expect(lambdaSendSpy).toHaveBeenCalledTimes(1);
+    const cmd = lambdaSendSpy.mock.calls[0][0] as MockableCommand;
+    expect(cmd.input.FunctionName).toBe('import-fn');
+    expect(invokePayload(cmd)).toEqual({
+      teamId: 'team123',
+      userId: 'user1',
+      csv: 'NIIN,LIN\n',
+      status: 'Completed',
+      dryRun: true,
+    });
+  });
+
+  it('returns the validation report when the file is rejected', async () => {
+    const errors = [{ line: 3, error: 'Duplicate NSN 1234-56-789-0123' }];
+    lambdaSendSpy.mockResolvedValue(lambdaResponse(409, { ok: false, errors }));
+
+    const res = await runImport('team123', 'user1', 'NIIN,LIN\n');
+
+    expect(res).toEqual({ ok: false, errors });
+  });
+
+  it('throws when the import function is not configured', async () => {
+    delete process.env.IMPORT_INVENTORY_FUNCTION_NAME;
+
+    await expect(runImport('team123', 'user1', 'NIIN,LIN\n')).rejects.toThrow(
+      'Import function name not configured.',
+    );
+    expect(lambdaSendSpy).not.toHaveBeenCalled();
+  });
+});
+
+describe('runPdfReview()', () => {
+  it('uploads the PDF under imports/<teamId>/, invokes the import Lambda with its key and deletes it', async () => {
+    lambdaSendSpy.mockResolvedValue(
+      lambdaResponse(200, { ok: true, pages: 1, candidates: [], csv: '', errors: [] }),
+    );
+    const pdf = Buffer.from('%PDF-1.4\n%%EOF\n');
+
+    const res = await runPdfReview('team123', 'user1', pdf);
+
+    expect(res).toMatchObject({ ok: true, pages: 1 });
+    expect(s3SendSpy).toHaveBeenCalledTimes(2);
+    const put = s3SendSpy.mock.calls[0][0] as MockableCommand;
+    expect(put.constructor.name).toBe('PutObjectCommand');
+    expect(put.input).toMatchObject({
+      Bucket: 'test-uploads',
+      Body: pdf,
+      ContentType: 'application/pdf',
+      ServerSideEncryption: 'aws:kms',
+      SSEKMSKeyId: KMS_KEY_ARN,
+    });
+    const key = put.input.Key as string;
+    expect(key.startsWith('imports/team123/')).toBe(true);
+    expect(key.endsWith('.pdf')).toBe(true);
+
+    expect(lambdaSendSpy).toHaveBeenCalledTimes(1);
+    expect(invokePayload(lambdaSendSpy.mock.calls[0][0] as MockableCommand)).toEqual({
+      teamId: 'team123',
+      userId: 'user1',
+      s3Key: key,
+    });
+
+    const del = s3SendSpy.mock.calls[1][0] as MockableCommand;
+    expect(del.constructor.name).toBe('DeleteObjectCommand');
+    expect(del.input).toEqual({ Bucket: 'test-uploads', Key: key });
+  });
+
+  it('deletes the PDF when the review fails', async () => {
+    lambdaSendSpy.mockRejectedValue(new Error('Task timed out'));
+
+    await expect(runPdfReview('team123', 'user1', Buffer.from('%PDF-1.4\n'))).rejects.toThrow(
+      'Task timed out',
+    );
 
-  it.skip('invokes both Lambda functions in parallel', async () => {});
+    const del = s3SendSpy.mock.calls[1][0] as MockableCommand;
+    expect(del.constructor.name).toBe('DeleteObjectCommand');
+    expect((del.input.Key as string).startsWith('imports/team123/')).toBe(true);
+  });
 });
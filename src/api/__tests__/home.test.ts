@@ -198,6 +198,7 @@ describe('Home Router', () => {
         }
         if (isCommandNamed(command, 'UpdateCommand')) {
           const key = command.input.Key as { SK: string };
+          if (key.SK === 'METADATA') return {};
           const values = command.input.ExpressionAttributeValues as Record<string, unknown>;
 
           expect(values[':s']).toBe('To Review');
@@ -224,6 +225,33 @@ describe('Home Router', () => {
       expect(updatedItems).toHaveLength(3);
     });
 
+    it('bumps the team itemsVersion once', async () => {
+      const metadataUpdates: Record<string, unknown>[] = [];
+
+      dynamoSendSpy.mockImplementation(async (command: MockableCommand) => {
+        if (isCommandNamed(command, 'QueryCommand')) {
+          return { Items: mockItems };
+        }
+        if (isCommandNamed(command, 'UpdateCommand')) {
+          const key = command.input.Key as { SK: string };
+          if (key.SK === 'METADATA') metadataUpdates.push(command.input);
+          return {};
+        }
+        return {};
+      });
+
+      await request(app)
+        .post('/trpc/softReset')
+        .set('Cookie', validAuthCookie)
+        .send({ teamId: 'team123' });
+
+      expect(metadataUpdates).toHaveLength(1);
+      expect(metadataUpdates[0]).toMatchObject({
+        Key: { PK: 'TEAM#team123', SK: 'METADATA' },
+        UpdateExpression: 'ADD itemsVersion :one',
+      });
+    });
+
     it('handles empty team (no items)', async () => {
       dynamoSendSpy.mockResolvedValue({ Items: [] });
 
@@ -359,12 +359,43 @@ describe('Items Router', () => {
       expect(s3SendSpy).toHaveBeenCalled();
     });
 
+    it('records the uploaded photo ETag as imageEtag', async () => {
+      let itemUpdate: Record<string, unknown> | undefined;
+
+      s3SendSpy.mockResolvedValue({ ETag: '"etag-2"' });
+      dynamoSendSpy.mockImplementation(async (command: MockableCommand) => {
+        if (isCommandNamed(command, 'GetCommand')) {
+          return { Item: { name: 'Test User' } };
+        }
+        if (isCommandNamed(command, 'UpdateCommand')) {
+          const key = command.input.Key as { SK: string };
+          if (key.SK === 'METADATA') return {};
+          itemUpdate = command.input;
+          return { Attributes: mockItem };
+        }
+        return {};
+      });
+
+      await request(app).post('/trpc/updateItem').set('Cookie', validAuthCookie).send({
+        teamId: 'team123',
+        itemId: 'item456',
+        userId: 'test-user-id',
+        imageBase64: 'data:image/jpeg;base64,/9j/4AAQSkZJRg==',
+      });
+
+      expect(itemUpdate?.UpdateExpression).toContain('imageEtag = :imageEtag');
+      expect(itemUpdate?.UpdateExpression).toContain('REMOVE thumbnailKey, mediumKey');
+      expect(itemUpdate?.ExpressionAttributeValues).toMatchObject({ ':imageEtag': '"etag-2"' });
+    });
+
     it('adds entry to updateLog', async () => {
       dynamoSendSpy.mockImplementation(async (command: MockableCommand) => {
         if (isCommandNamed(command, 'GetCommand')) {
           return { Item: { name: 'Test User' } };
         }
         if (isCommandNamed(command, 'UpdateCommand')) {
+          const key = command.input.Key as { SK: string };
+          if (key.SK === 'METADATA') return {};
           const values = command.input.ExpressionAttributeValues as Record<string, unknown>;
           const log = values[':log'] as Array<Record<string, unknown>>;
           expect(log[0]).toMatchObject({
@@ -388,6 +419,64 @@ describe('Items Router', () => {
     });
   });
 
+  describe('itemsVersion', () => {
+    it('bumps the team itemsVersion after an update', async () => {
+      const metadataUpdates: Record<string, unknown>[] = [];
+
+      dynamoSendSpy.mockImplementation(async (command: MockableCommand) => {
+        if (isCommandNamed(command, 'GetCommand')) {
+          return { Item: { name: 'Test User' } };
+        }
+        if (isCommandNamed(command, 'UpdateCommand')) {
+          const key = command.input.Key as { SK: string };
+          if (key.SK === 'METADATA') {
+            metadataUpdates.push(command.input);
+            return {};
+          }
+          return { Attributes: mockItem };
+        }
+        return {};
+      });
+
+      const res = await request(app).post('/trpc/updateItem').set('Cookie', validAuthCookie).send({
+        teamId: 'team123',
+        itemId: 'item456',
+        userId: 'test-user-id',
+        status: 'Damaged',
+      });
+
+      expect(res.body?.result?.data?.success).toBe(true);
+      expect(metadataUpdates).toHaveLength(1);
+      expect(metadataUpdates[0]).toMatchObject({
+        Key: { PK: 'TEAM#team123', SK: 'METADATA' },
+        UpdateExpression: 'ADD itemsVersion :one',
+      });
+    });
+
+    it('fails the write when the bump fails', async () => {
+      dynamoSendSpy.mockImplementation(async (command: MockableCommand) => {
+        if (isCommandNamed(command, 'GetCommand')) {
+          return { Item: mockItem };
+        }
+        if (isCommandNamed(command, 'UpdateCommand')) {
+          throw new Error('ConditionalCheckFailedException');
+        }
+        return {};
+      });
+
+      const res = await request(app).post('/trpc/deleteItem').set('Cookie', validAuthCookie).send({
+        teamId: 'team123',
+        itemId: 'item456',
+        userId: 'test-user-id',
+      });
+
+      expect(res.body?.result?.data).toMatchObject({
+        success: false,
+        error: 'ConditionalCheckFailedException',
+      });
+    });
+  });
+
   describe('deleteItem', () => {
     it('deletes item successfully', async () => {
       dynamoSendSpy.mockImplementation(async (command: MockableCommand) => {
@@ -0,0 +1,32 @@
+import { UpdateCommand } from '@aws-sdk/lib-dynamodb';
+import { doc } from '../aws';
+import { loadConfig } from '../process';
+
+const config = loadConfig();
+const TABLE_NAME = config.TABLE_NAME;
+
+/**
+ * Bump the team's item version after any item write.
+ * The export Lambdas compare it with the token stored on their last
+ * artifact and skip re-rendering when nothing changed, so a failed bump
+ * would let them serve a stale artifact: the error is not swallowed and
+ * fails the mutation instead, which the caller can retry.
+ * PK: TEAM#<teamId>
+ * SK: METADATA
+ */
+export const bumpItemsVersion = async (teamId: string): Promise<void> => {
+  try {
+    await doc.send(
+      new UpdateCommand({
+        TableName: TABLE_NAME,
+        Key: { PK: `TEAM#${teamId}`, SK: 'METADATA' },
+        UpdateExpression: 'ADD itemsVersion :one',
+        ConditionExpression: 'attribute_exists(PK)',
+        ExpressionAttributeValues: { ':one': 1 },
+      }),
+    );
+  } catch (err) {
+    console.error(`[TeamVersion] Failed to bump itemsVersion teamId=${teamId}`, err);
+    throw err;
+  }
+};
@@ -1,9 +1,9 @@
-// Export router — invokes Python Lambdas and clears old S3 exports
+// Export router — invokes Python Lambdas
 import { z } from 'zod';
 import { router, permissionedProcedure } from './trpc';
 import { LambdaClient, InvokeCommand } from '@aws-sdk/client-lambda';
+import { S3Client, PutObjectCommand, DeleteObjectCommand } from '@aws-sdk/client-s3';
 import { loadConfig } from '../process';
-import { S3Client, ListObjectsV2Command, DeleteObjectsCommand } from '@aws-sdk/client-s3';
 import { isLocalDev } from '../localDev';
 
 const config = loadConfig();
@@ -12,50 +12,19 @@ const REGION = config.REGION;
 const lambda = isLocalDev ? null : new LambdaClient({ region: REGION });
 const s3 = isLocalDev ? null : new S3Client({ region: REGION });
 
-const UPLOADS_BUCKET = config.BUCKET_NAME;
-
-// Remove all old files under Documents/<teamId>/
-async function _clearOldExports(teamId: string) {
-  console.log(`[Export] Clearing old exports teamId=${teamId}`);
-
-  if (!UPLOADS_BUCKET) throw new Error('UPLOADS_BUCKET env var missing');
-  if (!s3) throw new Error('S3 client not initialized');
-
-  const prefix = `Documents/${teamId}/`;
-
-  const listed = await s3.send(
-    new ListObjectsV2Command({
-      Bucket: UPLOADS_BUCKET,
-      Prefix: prefix,
-    }),
-  );
-
-  const count = listed.Contents?.length ?? 0;
-  console.log(`[S3] Found ${count} existing export files`);
-
-  if (count === 0) return;
-
-  const toDelete = listed.Contents!.map((obj) => ({ Key: obj.Key! }));
-
-  await s3.send(
-    new DeleteObjectsCommand({
-      Bucket: UPLOADS_BUCKET,
-      Delete: { Objects: toDelete },
-    }),
-  );
-
-  console.log(`[S3] Deleted ${toDelete.length} old export objects`);
-}
-
-// Invoke Python Lambda with payload { teamId }
-async function _invokePythonLambda(functionName: string, teamId: string) {
+// Invoke Python Lambda with payload { teamId, ...extra }
+async function _invokePythonLambda(
+  functionName: string,
+  teamId: string,
+  extra: Record<string, unknown> = {},
+) {
   console.log(`[Lambda] Invoking ${functionName} for teamId=${teamId}`);
 
   try {
     if (!lambda) throw new Error('Lambda client not initialized');
     const command = new InvokeCommand({
       FunctionName: functionName,
-      Payload: JSON.stringify({ teamId }),
+      Payload: JSON.stringify({ teamId, ...extra }),
     });
 
     const response = await lambda.send(command);
@@ -82,8 +51,51 @@ async function _invokePythonLambda(functionName: string, teamId: string) {
   }
 }
 
-// Main export: clears exports → invokes inventory + pdf Lambdas
-export async function runExport(teamId: string) {
+// Exports too large for one invocation checkpoint and return a continuation.
+// Each invocation gets a budgetMs that keeps it inside this function's own
+// timeout (and the HTTP API's 30 s); once another invocation no longer fits,
+// the continuation goes back to the client, which calls getExport with it.
+const EXPORT_BUDGET_MS = Number(process.env.EXPORT_BUDGET_MS) || 25_000;
+// The export Lambda keeps its last 8 s (EXPORT_CHECKPOINT_RESERVE_MS) for
+// saving parts, so less than this left isn't worth another invocation.
+const MIN_EXPORT_INVOCATION_MS = 12_000;
+// Allowance for the invoke round trip and a cold start.
+const INVOKE_OVERHEAD_MS = 2_000;
+
+async function _invokeExport(
+  functionName: string,
+  teamId: string,
+  extra: Record<string, unknown> = {},
+  continuation?: string,
+) {
+  const until = Date.now() + EXPORT_BUDGET_MS;
+  let result: any;
+  do {
+    result = await _invokePythonLambda(functionName, teamId, {
+      ...extra,
+      ...(continuation ? { continuation } : {}),
+      budgetMs: until - Date.now() - INVOKE_OVERHEAD_MS,
+    });
+    continuation = result?.continuation;
+    if (continuation) {
+      console.log(`[Export] ${functionName} continuing (${JSON.stringify(result.progress)})`);
+    }
+  } while (continuation && until - Date.now() >= MIN_EXPORT_INVOCATION_MS);
+  return result;
+}
+
+// Main export: invokes inventory + pdf Lambdas.
+// `evidence` appends a photo page after each damaged item's 2404;
+// `inventoryFormat: 'pdf'` returns a printable inventory instead of the CSV.
+// `continuation` resumes exports an earlier call returned unfinished.
+export async function runExport(
+  teamId: string,
+  options: {
+    evidence?: boolean;
+    inventoryFormat?: 'csv' | 'pdf';
+    continuation?: { pdf2404?: string; inventory?: string };
+  } = {},
+) {
   console.log(`[Export] runExport start teamId=${teamId}`);
 
   // Local dev mode: return mock response with actual data
@@ -120,12 +132,26 @@ export async function runExport(teamId: string) {
     throw new Error('Export function names not configured.');
   }
 
-  await _clearOldExports(teamId);
-
+  // Exports are written to stable keys under Documents/<teamId>/ and tagged
+  // with the team's itemsVersion, so unchanged artifacts are reused rather
+  // than cleared and regenerated on every request. The Lambdas track them in
+  // Documents/<teamId>/manifest.json and delete superseded or expired ones.
+  // An export that finished in an earlier call is simply invoked again: it
+  // finds its artifact unchanged and returns a fresh URL.
   try {
     const [pdf2404Response, csvResponse] = await Promise.all([
-      _invokePythonLambda(pdf2404FunctionName, teamId),
-      _invokePythonLambda(inventoryFunctionName, teamId),
+      _invokeExport(
+        pdf2404FunctionName,
+        teamId,
+        options.evidence === undefined ? {} : { evidence: options.evidence },
+        options.continuation?.pdf2404,
+      ),
+      _invokeExport(
+        inventoryFunctionName,
+        teamId,
+        options.inventoryFormat ? { format: options.inventoryFormat } : {},
+        options.continuation?.inventory,
+      ),
     ]);
 
     const ok1 = pdf2404Response?.ok;
@@ -137,6 +163,22 @@ export async function runExport(teamId: string) {
       throw new Error('Both export operations failed');
     }
 
+    if (pdf2404Response?.continuation || csvResponse?.continuation) {
+      console.log('[Export] runExport unfinished, returning continuation');
+      return {
+        success: true,
+        done: false,
+        continuation: {
+          pdf2404: pdf2404Response?.continuation,
+          inventory: csvResponse?.continuation,
+        },
+        progress: {
+          pdf2404: pdf2404Response?.progress,
+          inventory: csvResponse?.progress,
+        },
+      };
+    }
+
     console.log('[Export] runExport success');
     return {
       success: true,
@@ -149,15 +191,91 @@ export async function runExport(teamId: string) {
   }
 }
 
+// Bulk import of an inventory CSV (the inventory export's layout).
+// The Lambda validates the whole file first; on parse errors or duplicate
+// NSN/End Item NIIN it writes nothing and returns { ok: false, errors }.
+export async function runImport(
+  teamId: string,
+  userId: string,
+  csv: string,
+  options: { status?: string; dryRun?: boolean } = {},
+) {
+  if (isLocalDev) {
+    throw new Error('Inventory import is not available in local dev mode.');
+  }
+
+  const importFunctionName = process.env.IMPORT_INVENTORY_FUNCTION_NAME;
+  if (!importFunctionName) {
+    console.error('[Import] Missing IMPORT_INVENTORY_FUNCTION_NAME');
+    throw new Error('Import function name not configured.');
+  }
+
+  return _invokePythonLambda(importFunctionName, teamId, { userId, csv, ...options });
+}
+
+// Candidate items from a legacy PDF hand receipt. The PDF is stored under
+// imports/<teamId>/ and the import Lambda returns { candidates, csv, errors }
+// without writing items; the reviewed CSV then goes through runImport.
+// The PDF is deleted once reviewed; the Lambda's page text cache next to it
+// (and anything left behind) expires with the bucket's imports/ rule.
+export async function runPdfReview(teamId: string, userId: string, pdf: Buffer) {
+  if (isLocalDev) {
+    throw new Error('Inventory import is not available in local dev mode.');
+  }
+
+  const importFunctionName = process.env.IMPORT_INVENTORY_FUNCTION_NAME;
+  if (!importFunctionName) {
+    console.error('[Import] Missing IMPORT_INVENTORY_FUNCTION_NAME');
+    throw new Error('Import function name not configured.');
+  }
+
+  const key = `imports/${teamId}/receipt-${Date.now()}.pdf`;
+  await s3!.send(
+    new PutObjectCommand({
+      Bucket: config.BUCKET_NAME,
+      Key: key,
+      Body: pdf,
+      ContentType: 'application/pdf',
+      ...(config.KMS_KEY_ARN
+        ? { ServerSideEncryption: 'aws:kms', SSEKMSKeyId: config.KMS_KEY_ARN }
+        : {}),
+    }),
+  );
+  console.log(`[Import] Uploaded ${key} size=${pdf.byteLength}`);
+
+  try {
+    return await _invokePythonLambda(importFunctionName, teamId, { userId, s3Key: key });
+  } finally {
+    try {
+      await s3!.send(new DeleteObjectCommand({ Bucket: config.BUCKET_NAME, Key: key }));
+    } catch (err) {
+      console.error(`[Import] Failed to delete ${key}:`, err);
+    }
+  }
+}
+
 // TRPC Router
 export const exportRouter = router({
   getExport: permissionedProcedure('reports.create')
-    .input(z.object({ teamId: z.string().min(1) }))
+    .input(
+      z.object({
+        teamId: z.string().min(1),
+        evidence: z.boolean().optional(),
+        inventoryFormat: z.enum(['csv', 'pdf']).optional(),
+        continuation: z
+          .object({ pdf2404: z.string().optional(), inventory: z.string().optional() })
+          .optional(),
+      }),
+    )
     .mutation(async ({ input }) => {
       console.log(`[Export] getExport called teamId=${input.teamId}`);
 
       try {
-        const result = await runExport(input.teamId);
+        const result = await runExport(input.teamId, {
+          evidence: input.evidence,
+          inventoryFormat: input.inventoryFormat,
+          continuation: input.continuation,
+        });
         return result;
       } catch (err: any) {
         console.error(`[Export] Failed teamId=${input.teamId}`, err);
@@ -168,4 +286,55 @@ export const exportRouter = router({
         };
       }
     }),
+
+  importInventory: permissionedProcedure('item.create')
+    .input(
+      z.object({
+        teamId: z.string().min(1),
+        userId: z.string().min(1),
+        // Inline CSV; the invoke payload is capped at 6 MB.
+        csv: z.string().min(1).max(5_000_000),
+        status: z.enum(['To Review', 'Completed', 'Damaged', 'Shortages']).optional(),
+        dryRun: z.boolean().optional(),
+      }),
+    )
+    .mutation(async ({ input }) => {
+      console.log(`[Import] importInventory called teamId=${input.teamId} dryRun=${!!input.dryRun}`);
+
+      try {
+        return await runImport(input.teamId, input.userId, input.csv, {
+          status: input.status,
+          dryRun: input.dryRun,
+        });
+      } catch (err: any) {
+        console.error(`[Import] Failed teamId=${input.teamId}`, err);
+        return {
+          ok: false,
+          error: err.message || 'Failed to import inventory.',
+        };
+      }
+    }),
+
+  reviewInventoryPdf: permissionedProcedure('item.create')
+    .input(
+      z.object({
+        teamId: z.string().min(1),
+        userId: z.string().min(1),
+        dataUrl: z.string().startsWith('data:application/pdf;base64,'),
+      }),
+    )
+    .mutation(async ({ input }) => {
+      console.log(`[Import] reviewInventoryPdf called teamId=${input.teamId}`);
+
+      try {
+        const pdf = Buffer.from(input.dataUrl.slice(input.dataUrl.indexOf(',') + 1), 'base64');
+        return await runPdfReview(input.teamId, input.userId, pdf);
+      } catch (err: any) {
+        console.error(`[Import] PDF review failed teamId=${input.teamId}`, err);
+        return {
+          ok: false,
+          error: err.message || 'Failed to read the PDF.',
+        };
+      }
+    }),
 });
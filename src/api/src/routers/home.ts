@@ -5,6 +5,7 @@ import { S3Client, ListObjectsV2Command, DeleteObjectsCommand } from '@aws-sdk/c
 import { doc } from '../aws';
 import { loadConfig } from '../process';
 import { isLocalDev } from '../localDev';
+import { bumpItemsVersion } from '../helpers/teamVersion';
 
 const config = loadConfig();
 const TABLE_NAME = config.TABLE_NAME;
@@ -38,6 +39,8 @@ async function hardReset(teamId: string) {
     );
   }
 
+  await bumpItemsVersion(teamId);
+
   // Delete all S3 objects under team prefix (skip in local dev)
   if (!isLocalDev && s3) {
     const listed = await s3.send(
@@ -88,6 +91,7 @@ async function softReset(teamId: string) {
       }),
     );
   }
+  await bumpItemsVersion(teamId);
 
   return { success: true, message: 'Soft reset completed.' };
 }
@@ -9,11 +9,13 @@ import {
   HeadObjectCommand,
 } from '@aws-sdk/client-s3';
 import { getSignedUrl } from '@aws-sdk/s3-request-presigner';
+import { LambdaClient, InvokeCommand } from '@aws-sdk/client-lambda';
 import crypto from 'crypto';
 import { doc } from '../aws';
 import { loadConfig } from '../process';
 import { TRPCError } from '@trpc/server';
 import { isLocalDev } from '../localDev';
+import { bumpItemsVersion } from '../helpers/teamVersion';
 
 const config = loadConfig();
 const TABLE_NAME = config.TABLE_NAME;
@@ -26,6 +28,8 @@ const localItemImages = new Map<string, string>();
 
 if (!isLocalDev && !BUCKET_NAME) throw new Error('❌ Missing S3 bucket name');
 const s3 = isLocalDev ? null : new S3Client({ region: REGION });
+const lambda = isLocalDev ? null : new LambdaClient({ region: REGION });
+const ITEM_IMAGES_FUNCTION_NAME = process.env.ITEM_IMAGES_FUNCTION_NAME;
 
 // creates an ID for the item
 function newId(n = 10): string {
@@ -85,8 +89,13 @@ async function getPresignedUrl(imageKey?: string): Promise<string | undefined> {
   return url;
 }
 
-// Helper to upload image (handles local dev)
-async function uploadImage(key: string, base64Data: string, contentType: string): Promise<void> {
+// Helper to upload image (handles local dev).
+// Returns the object's ETag, which changes with every upload to the same key.
+async function uploadImage(
+  key: string,
+  base64Data: string,
+  contentType: string,
+): Promise<string | undefined> {
   if (isLocalDev) {
     // Store the full base64 data URL (with header) for local retrieval
     // This ensures the browser can display it directly
@@ -96,11 +105,11 @@ async function uploadImage(key: string, base64Data: string, contentType: string)
     }
     localItemImages.set(key, base64Data);
     console.log(`[LocalDev] Stored item image: ${key} (size: ${base64Data.length} chars)`);
-    return;
+    return undefined;
   }
 
   const buffer = Buffer.from(stripBase64Header(base64Data), 'base64');
-  await s3!.send(
+  const res = await s3!.send(
     new PutObjectCommand({
       Bucket: BUCKET_NAME,
       Key: key,
@@ -109,6 +118,36 @@ async function uploadImage(key: string, base64Data: string, contentType: string)
       ...(KMS_KEY_ARN ? { ServerSideEncryption: 'aws:kms', SSEKMSKeyId: KMS_KEY_ARN } : {}),
     }),
   );
+  return res.ETag;
+}
+
+// Ask the images Lambda to build thumbnail/medium renditions of an uploaded photo.
+// Fire-and-forget: until it records thumbnailKey, lists fall back to the original.
+// Photos go to a stable key, so the item's imageEtag is what tells the Lambda
+// whether the photo it rendered is still the item's current one.
+async function requestRenditions(
+  teamId: string,
+  imageKey: string,
+  itemId?: string,
+  imageEtag?: string,
+) {
+  if (!lambda || !ITEM_IMAGES_FUNCTION_NAME) return;
+  try {
+    await lambda.send(
+      new InvokeCommand({
+        FunctionName: ITEM_IMAGES_FUNCTION_NAME,
+        InvocationType: 'Event',
+        Payload: JSON.stringify({ teamId, imageKey, itemId, imageEtag }),
+      }),
+    );
+  } catch (err) {
+    console.error(`[Images] Failed to request renditions for ${imageKey}:`, err);
+  }
+}
+
+// Lists only need a small preview
+function listImageKey(item: any): string | undefined {
+  return item.thumbnailKey ?? item.imageKey;
 }
 
 export const itemsRouter = router({
@@ -176,12 +215,13 @@ export const itemsRouter = router({
         const now = new Date().toISOString();
 
         let imageKey: string | undefined;
+        let imageEtag: string | undefined;
 
         if (input.imageBase64) {
         const ext = getImageExtension(input.imageBase64);
         const identifier = input.nsn || input.liin || input.endItemNiin || itemId;
         imageKey = `items/${input.teamId}/${identifier}.${ext}`;
-        await uploadImage(imageKey, input.imageBase64, `image/${ext}`);
+        imageEtag = await uploadImage(imageKey, input.imageBase64, `image/${ext}`);
 }
 
         const userName = await getUserName(input.userId);
@@ -215,6 +255,7 @@ export const itemsRouter = router({
 
           // image + reports
           imageKey,
+          imageEtag,
           damageReports: input.damageReports ?? [],
 
           // metadata
@@ -233,6 +274,8 @@ export const itemsRouter = router({
         };
 
         await doc.send(new PutCommand({ TableName: TABLE_NAME, Item: item }));
+        await bumpItemsVersion(input.teamId);
+        if (imageKey) await requestRenditions(input.teamId, imageKey, itemId, imageEtag);
         return { success: true, itemId, item };
       } catch (err: any) {
         // If it's already a TRPCError, re-throw it
@@ -265,7 +308,7 @@ export const itemsRouter = router({
 
         const items = await Promise.all(
           rawItems.map(async (raw: any) => {
-            const signed = await getPresignedUrl(raw.imageKey);
+            const signed = await getPresignedUrl(listImageKey(raw));
 
             let parentName: string | null = null;
 
@@ -376,14 +419,21 @@ export const itemsRouter = router({
         };
 
         // new image upload
+        let newImageKey: string | undefined;
+        let newImageEtag: string | undefined;
           if (input.imageBase64) {
             const ext = getImageExtension(input.imageBase64);
             const identifier = input.nsn || input.liin || input.endItemNiin || input.itemId;
             const newKey = `items/${input.teamId}/${identifier}.${ext}`;
-            await uploadImage(newKey, input.imageBase64, `image/${ext}`);
+            newImageEtag = await uploadImage(newKey, input.imageBase64, `image/${ext}`);
 
             updates.push('imageKey = :imageKey');
             values[':imageKey'] = newKey;
+            if (newImageEtag) {
+              updates.push('imageEtag = :imageEtag');
+              values[':imageEtag'] = newImageEtag;
+            }
+            newImageKey = newKey;
 }
         // base fields
         push('name', input.name, '#name');
@@ -424,12 +474,18 @@ export const itemsRouter = router({
           new UpdateCommand({
             TableName: TABLE_NAME,
             Key: { PK: `TEAM#${input.teamId}`, SK: `ITEM#${input.itemId}` },
-            UpdateExpression: `SET ${updates.join(', ')}`,
+            // Renditions of the previous photo are stale until the images Lambda runs again
+            UpdateExpression:
+              `SET ${updates.join(', ')}` + (newImageKey ? ' REMOVE thumbnailKey, mediumKey' : ''),
             ExpressionAttributeValues: values,
             ExpressionAttributeNames: Object.keys(names).length ? names : undefined,
             ReturnValues: 'ALL_NEW',
           }),
         );
+        await bumpItemsVersion(input.teamId);
+        if (newImageKey) {
+          await requestRenditions(input.teamId, newImageKey, input.itemId, newImageEtag);
+        }
 
         const attrs = result.Attributes;
         const signed = await getPresignedUrl(attrs?.imageKey);
@@ -497,6 +553,7 @@ export const itemsRouter = router({
             Key: key,
           }),
         );
+        await bumpItemsVersion(input.teamId);
 
         return { success: true, message: 'Item deleted successfully' };
       } catch (err: any) {
@@ -582,7 +639,7 @@ export const itemsRouter = router({
           // Add presigned URLs for images and team name
           const itemsWithImages = await Promise.all(
             items.map(async (item: any) => {
-              const imageLink = await getPresignedUrl(item.imageKey);
+              const imageLink = await getPresignedUrl(listImageKey(item));
               return {
                 ...item,
                 teamId,
@@ -0,0 +1,119 @@
+"""
+2404 fill modes: overlay stamping vs flattened form fields.
+
+Renders every damaged item of synthetic teams with render_parts and
+concat_parts, once per EXPORT_2404_FILL mode, and reports the best time of
+--repeat runs, forms/s, pages, output size and the speedup over the first
+mode.
+
+    PYTHONPATH=layers/export-common/python:layers/pdf-deps/python \
+        python3 bench/bench_2404_fill.py [--sizes 1000,10000] [--modes overlay,form]
+            [--repeat 3] [--template PDF] [--check]
+
+--template benches another template, e.g. one with AcroForm fields whose
+rects and /DA the form mode should follow. --check compares the text of
+each form's first page (pypdf layout mode) between the modes.
+"""
+import argparse
+import importlib.util
+import io
+import os
+import sys
+import tempfile
+import time
+
+CDK_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [
+    os.path.join(CDK_DIR, "layers", "export-common", "python"),
+    os.path.join(CDK_DIR, "layers", "pdf-deps", "python"),
+    os.path.dirname(os.path.abspath(__file__)),
+]
+
+os.environ.update(
+    TABLE_NAME="bench-table",
+    UPLOADS_BUCKET="bench-bucket",
+    BUNDLED_TEMPLATE_PATH=os.path.join(CDK_DIR, "templates", "2404-template.pdf"),
+    PRIME_ON_INIT="",
+    SNAPSHOT_PREFIX="",
+    EXPORT_TRACE="",
+    EXPORT_PROFILE="",
+)
+
+
+def load_handler(name, path):
+    spec = importlib.util.spec_from_file_location(name, path)
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+
+def render(h, tmpl, damaged, mode):
+    """(pdf bytes, pages) for every damaged item in one export."""
+    with tempfile.TemporaryDirectory(prefix="bench-2404-") as tmp:
+        parts, pages, _ = h.render_parts(tmpl, damaged, "Bench Team", tmp, fill=mode)
+        path = h.concat_parts(parts, os.path.join(tmp, "out.pdf"))
+        with open(path, "rb") as f:
+            return f.read(), pages
+
+
+def form_texts(pdf, per_form):
+    from pypdf import PdfReader
+
+    pages = PdfReader(io.BytesIO(pdf)).pages
+    return [" ".join(pages[i].extract_text(extraction_mode="layout").split()) for i in range(0, len(pages), per_form)]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="1000,10000", help="synthetic team sizes")
+    ap.add_argument("--modes", default="overlay,form", help="first one is the baseline")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--template", help="template PDF (default: the bundled one)")
+    ap.add_argument("--check", action="store_true", help="compare each form's text between the modes")
+    args = ap.parse_args()
+
+    if args.template:
+        os.environ["BUNDLED_TEMPLATE_PATH"] = os.path.abspath(args.template)
+
+    from synthetic import make_team
+    from export_common.records import decode_item
+
+    h = load_handler("handler_2404", os.path.join(CDK_DIR, "python_2404", "2404_handler.py"))
+    tmpl = h.read_template_bytes()
+    modes = [m.strip() for m in args.modes.split(",") if m.strip()]
+    # Template parsing, fonts and imports happen once per container; keep them out of the timings.
+    for mode in modes:
+        h.stamp(tmpl, h.to_pdf_values({"name": "warm", "damageReports": ["warm"]}), mode)
+
+    failed = False
+    for n in [int(s) for s in args.sizes.split(",")]:
+        _, rows = make_team(n)
+        damaged = [itm for itm in map(decode_item, rows) if (itm.get("status") or "").lower() == "damaged"]
+        damaged.sort(key=lambda itm: itm.get("itemId") or "")
+
+        base = None
+        outputs = {}
+        for mode in modes:
+            best = None
+            for _ in range(args.repeat):
+                t0 = time.perf_counter()
+                pdf, pages = render(h, tmpl, damaged, mode)
+                elapsed = time.perf_counter() - t0
+                best = elapsed if best is None else min(best, elapsed)
+            base = base or best
+            outputs[mode] = pdf
+            print(f"items={n:6d} {mode:8s} {len(damaged):5d} forms {best * 1000:9.1f} ms"
+                  f"  {len(damaged) / best:7.1f} forms/s  {pages:5d} pages  {len(pdf) / 1e6:6.2f} MB  x{base / best:5.2f}")
+
+        if args.check:
+            per_form = pages // len(damaged)
+            ref = form_texts(outputs[modes[0]], per_form)
+            for mode in modes[1:]:
+                same = form_texts(outputs[mode], per_form) == ref
+                failed |= not same
+                print(f"items={n:6d} {mode:8s} text vs {modes[0]}: {'ok' if same else 'MISMATCH'}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
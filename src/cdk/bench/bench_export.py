@@ -0,0 +1,227 @@
+"""
+Export pipeline benchmark on synthetic teams (see synthetic.py).
+
+For each team size it times the pipeline stages and both handlers end to
+end against in-process MemoryDynamoDB/MemoryS3 clients:
+
+  decode          raw Query rows -> ItemRecord
+  lv              group_items + _compute_lv_for_group over every group
+  csv             render_inventory_csv with an empty block cache
+  csv_cached      render_inventory_csv again (all groups cached)
+  overlay         make_overlay per damaged item (sampled)
+  stamp           stamp per damaged item (sampled)
+  inventory       inventory lambda_handler, force=True
+  2404            2404 lambda_handler, force=True (skipped for large teams)
+
+Reports p50/p99 latency, throughput (items/s) and peak traced memory per
+stage and compares p50 against bench/baselines/export_pipeline.json.
+
+    python3 bench/bench_export.py [--sizes 10,1000,10000,100000] [--repeat 5]
+                                  [--update-baseline]
+"""
+import argparse
+import importlib.util
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+CDK_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE = os.path.join(CDK_DIR, "bench", "baselines", "export_pipeline.json")
+sys.path[:0] = [
+    os.path.join(CDK_DIR, "layers", "export-common", "python"),
+    os.path.join(CDK_DIR, "layers", "pdf-deps", "python"),
+    os.path.dirname(os.path.abspath(__file__)),
+]
+
+os.environ.update(
+    TABLE_NAME="bench-table",
+    UPLOADS_BUCKET="bench-bucket",
+    BUNDLED_TEMPLATE_PATH=os.path.join(CDK_DIR, "templates", "2404-template.pdf"),
+    PRIME_ON_INIT="",
+    SNAPSHOT_PREFIX="",
+    EXPORT_TRACE="",
+    EXPORT_PROFILE="",
+)
+
+from export_common import clients  # noqa: E402
+from export_common.local_backend import MemoryDynamoDB, MemoryS3  # noqa: E402
+from export_common.records import decode_items  # noqa: E402
+
+from synthetic import make_team  # noqa: E402
+
+
+def load_handler(name, path):
+    spec = importlib.util.spec_from_file_location(name, path)
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+def measure(fn, units, repeat):
+    """
+    Time fn() `repeat` times, then once more under tracemalloc for the peak.
+    fn returns a list of per-call latencies (per-item stages) or None.
+    """
+    samples = []
+    total = 0.0
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        per_call = fn()
+        elapsed = time.perf_counter() - t0
+        total += elapsed
+        samples.extend(per_call if per_call else [elapsed])
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "units": units,
+        "p50_ms": round(statistics.median(samples) * 1000, 3),
+        "p99_ms": round(percentile(samples, 99) * 1000, 3),
+        "items_per_s": round(units * repeat / total, 1) if total else None,
+        "peak_mb": round(peak / 1e6, 1),
+    }
+
+
+def per_call(fn, args_list):
+    out = []
+    for args in args_list:
+        t0 = time.perf_counter()
+        fn(*args)
+        out.append(time.perf_counter() - t0)
+    return out
+
+
+def bench_size(n, inv, h2404, args):
+    meta, rows = make_team(n)
+    team_id = meta["teamId"]["S"]
+    ddb = MemoryDynamoDB().load([meta] + rows)
+    # Build the table's sorted view now so the first handler run doesn't pay for it.
+    ddb.query(TableName="bench-table", KeyConditionExpression="PK = :pk",
+              ExpressionAttributeValues={":pk": meta["PK"]}, Limit=1)
+    records = decode_items(rows)
+    exportable = [r for r in records if inv._exportable(r)]
+    data = {"items": exportable, "overrides": inv.merge_overrides(meta, {})}
+    damaged = [r for r in records if (r.status or "").lower() == "damaged"]
+
+    def clear_cache():
+        inv._BLOCK_CACHE.clear()
+        inv._block_cache_bytes = 0
+
+    def lv():
+        for kit_items in inv.group_items(exportable).values():
+            inv._compute_lv_for_group(kit_items)
+
+    def csv():
+        clear_cache()
+        inv.render_inventory_csv(data)
+
+    tmpl = h2404.read_template_bytes()
+    mb_w, mb_h = 612.0, 792.0
+    values = [
+        (h2404.to_pdf_values({
+            "name": "Local Dev Team",
+            "actualName": r.actualName or r.name,
+            "serialNumber": r.serialNumber,
+            "damageReports": r.damageReports,
+        }),)
+        for r in damaged
+    ]
+
+    if values:
+        # Font and template parsing happen on the first stamp; keep them out of the samples.
+        h2404.stamp(tmpl, values[0][0])
+
+    def run_inventory():
+        clear_cache()
+        clients.use(ddb=ddb, s3=MemoryS3())
+        resp = inv.lambda_handler({"teamId": team_id, "force": True}, None)
+        assert resp["statusCode"] == 200, resp
+
+    def run_2404():
+        clients.use(ddb=ddb, s3=MemoryS3())
+        resp = h2404.lambda_handler({"teamId": team_id, "force": True}, None)
+        assert resp["statusCode"] == 200, resp
+
+    stages = [
+        ("decode", lambda: decode_items(rows) and None, n, args.repeat),
+        ("lv", lv, len(exportable), args.repeat),
+        ("csv", csv, len(exportable), args.repeat),
+        ("csv_cached", lambda: inv.render_inventory_csv(data) and None, len(exportable), args.repeat),
+        ("overlay", lambda: per_call(lambda v: h2404.make_overlay(mb_w, mb_h, v), values[:args.overlay_sample]),
+         min(len(values), args.overlay_sample), 1),
+        ("stamp", lambda: per_call(lambda v: h2404.stamp(tmpl, v), values[:args.stamp_sample]),
+         min(len(values), args.stamp_sample), 1),
+        ("inventory", run_inventory, n, args.repeat),
+    ]
+    if len(damaged) <= args.max_2404_damaged:
+        stages.append(("2404", run_2404, len(damaged), 1 if len(damaged) > 50 else args.repeat))
+
+    results = {}
+    for name, fn, units, repeat in stages:
+        if not units:
+            continue
+        results[name] = r = measure(fn, units, repeat)
+        print(f"  {name:11s} p50 {r['p50_ms']:10.3f} ms  p99 {r['p99_ms']:10.3f} ms"
+              f"  {r['items_per_s'] or 0:12.1f} items/s  peak {r['peak_mb']:7.1f} MB  (n={units})")
+    if len(damaged) > args.max_2404_damaged:
+        print(f"  2404        skipped ({len(damaged)} damaged items > --max-2404-damaged)")
+    return results
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="10,1000,10000,100000")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--overlay-sample", type=int, default=100)
+    ap.add_argument("--stamp-sample", type=int, default=20)
+    ap.add_argument("--max-2404-damaged", type=int, default=300)
+    ap.add_argument("--update-baseline", action="store_true")
+    ap.add_argument("--tolerance", type=float, default=0.25,
+                    help="allowed p50 regression vs baseline (fraction)")
+    args = ap.parse_args()
+
+    inv = load_handler("inventory_handler", os.path.join(CDK_DIR, "python_inventory", "inventory_handler.py"))
+    h2404 = load_handler("handler_2404", os.path.join(CDK_DIR, "python_2404", "2404_handler.py"))
+
+    results = {}
+    for n in (int(s) for s in args.sizes.split(",")):
+        print(f"team size {n}")
+        for stage, r in bench_size(n, inv, h2404, args).items():
+            results[f"{n}/{stage}"] = r
+
+    if args.update_baseline:
+        os.makedirs(os.path.dirname(BASELINE), exist_ok=True)
+        with open(BASELINE, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"baseline written to {BASELINE}")
+        return 0
+
+    if not os.path.exists(BASELINE):
+        return 0
+    with open(BASELINE) as f:
+        baseline = json.load(f)
+    failed = False
+    for key, r in results.items():
+        base = baseline.get(key)
+        if not base:
+            continue
+        limit = base["p50_ms"] * (1 + args.tolerance)
+        if r["p50_ms"] > limit:
+            failed = True
+            print(f"REGRESSION {key}: p50 {r['p50_ms']} ms > {limit:.3f} ms (baseline {base['p50_ms']} ms)")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,109 @@
+"""
+Inventory PDF layout: the stock platypus.Table path vs FixedTable.
+
+Renders the printable inventory for synthetic teams with each
+INVENTORY_PDF_ENGINE and reports the best time of --repeat runs, pages,
+bytes, rows/s and the speedup over the first engine.
+
+    PYTHONPATH=layers/export-common/python:layers/pdf-deps/python \
+        python3 bench/bench_inventory_pdf.py [--sizes 1000,20000] [--engines table,fixed]
+            [--repeat 3] [--check]
+
+--check extracts the text of each engine's PDF and compares the item
+lines (page headers and footers dropped): page breaks differ between the
+engines, the rows must not.
+"""
+import argparse
+import importlib.util
+import io
+import os
+import sys
+import time
+from collections import Counter
+
+CDK_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [
+    os.path.join(CDK_DIR, "layers", "export-common", "python"),
+    os.path.join(CDK_DIR, "layers", "pdf-deps", "python"),
+    os.path.dirname(os.path.abspath(__file__)),
+]
+
+os.environ.update(
+    TABLE_NAME="bench-table",
+    UPLOADS_BUCKET="bench-bucket",
+    PRIME_ON_INIT="",
+    SNAPSHOT_PREFIX="",
+    EXPORT_TRACE="",
+    EXPORT_PROFILE="",
+)
+
+
+def load_handler(name, path):
+    spec = importlib.util.spec_from_file_location(name, path)
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+
+def item_lines(pdf):
+    """Counter of text lines that aren't page furniture or repeated headers."""
+    from pypdf import PdfReader
+
+    lines = Counter()
+    for page in PdfReader(io.BytesIO(pdf)).pages:
+        # Layout mode joins a row's cells by position; the stock Table draws each cell separately.
+        for line in page.extract_text(extraction_mode="layout").split("\n"):
+            line = " ".join(line.split())
+            if not line or line.startswith(("Page ", "Name Material", "FE UIC")) or " - generated " in line:
+                continue
+            lines[line] += 1
+    return lines
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="1000,20000", help="synthetic team sizes")
+    ap.add_argument("--engines", default="table,fixed", help="first one is the baseline")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--check", action="store_true", help="compare the item rows of each engine's PDF")
+    args = ap.parse_args()
+
+    from export_common import clients
+    from export_common.local_backend import MemoryDynamoDB
+    from synthetic import make_team
+
+    inv = load_handler("inventory_handler", os.path.join(CDK_DIR, "python_inventory", "inventory_handler.py"))
+    engines = [e.strip() for e in args.engines.split(",") if e.strip()]
+
+    failed = False
+    for n in [int(s) for s in args.sizes.split(",")]:
+        meta, rows = make_team(n)
+        clients.use(ddb=MemoryDynamoDB().load([meta] + rows))
+        data = inv.fetch_inventory_from_dynamo(meta["teamId"]["S"], {})
+        n_rows = len(data["items"])
+
+        base = None
+        outputs = {}
+        for engine in engines:
+            best = None
+            for _ in range(args.repeat):
+                t0 = time.perf_counter()
+                pdf, _, groups, pages = inv.render_inventory_pdf(data, engine=engine)
+                elapsed = time.perf_counter() - t0
+                best = elapsed if best is None else min(best, elapsed)
+            base = base or best
+            outputs[engine] = pdf
+            print(f"items={n:6d} {engine:6s} {best * 1000:9.1f} ms  {pages:5d} pages  {len(pdf) / 1e6:6.2f} MB"
+                  f"  {n_rows / best:9.0f} rows/s  x{base / best:5.2f}")
+
+        if args.check:
+            ref = item_lines(outputs[engines[0]])
+            for engine in engines[1:]:
+                same = item_lines(outputs[engine]) == ref
+                failed |= not same
+                print(f"items={n:6d} {engine:6s} rows vs {engines[0]}: {'ok' if same else 'MISMATCH'}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
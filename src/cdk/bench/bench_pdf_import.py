@@ -0,0 +1,123 @@
+"""
+PDF hand receipt review: extraction workers and the page text cache.
+
+Renders the printable inventory of synthetic teams (a stand-in for a
+legacy hand receipt), then runs the import function's PDF review on it
+once per --workers count: cold, again with the container LRU warm, and
+again with only the S3 cache (a new container). Reports the best time of
+--repeat runs for each.
+
+    PYTHONPATH=layers/export-common/python:layers/pdf-deps/python \
+        python3 bench/bench_pdf_import.py [--sizes 1000,5000] [--workers 1,2,4]
+            [--repeat 3] [--pdf FILE] [--check]
+
+--pdf reviews an existing file instead of the synthetic ones. --check
+compares the review CSV's rows per group with the inventory CSV export of
+the same team.
+"""
+import argparse
+import importlib.util
+import json
+import os
+import sys
+import time
+
+CDK_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [
+    os.path.join(CDK_DIR, "layers", "export-common", "python"),
+    os.path.join(CDK_DIR, "layers", "pdf-deps", "python"),
+    os.path.join(CDK_DIR, "python_import"),
+    os.path.dirname(os.path.abspath(__file__)),
+]
+
+os.environ.update(
+    TABLE_NAME="bench-table",
+    UPLOADS_BUCKET="bench-bucket",
+    PRIME_ON_INIT="",
+    SNAPSHOT_PREFIX="",
+    EXPORT_TRACE="",
+    EXPORT_PROFILE="",
+)
+
+
+def load_handler(name, path):
+    spec = importlib.util.spec_from_file_location(name, path)
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+
+def groups(imp, text):
+    """Sorted (niin, lin, rows) per group; the description of a group without a NIIN isn't in the PDF's row."""
+    parsed, errors = imp.parse_inventory_csv(text)
+    assert not errors, errors[:3]
+    return sorted((g["niin"], g["lin"], g["desc"] if g["niin"] else "", tuple(sorted(
+        (r["name"], r["nsn"], r["lv"], r["description"], r["authQuantity"], r["ohQuantity"]) for r in g["rows"])))
+        for g in parsed)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="1000,5000", help="synthetic team sizes")
+    ap.add_argument("--workers", default="1,2,4", help="IMPORT_PDF_WORKERS values")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--pdf", help="review this file instead")
+    ap.add_argument("--check", action="store_true", help="compare the review CSV with the CSV export")
+    args = ap.parse_args()
+
+    from export_common import clients
+    from export_common.local_backend import MemoryDynamoDB, MemoryS3
+    from synthetic import make_team
+
+    import import_handler
+    import pdf_import
+
+    inv = load_handler("inventory_handler", os.path.join(CDK_DIR, "python_inventory", "inventory_handler.py"))
+
+    cases = []
+    if args.pdf:
+        meta, _ = make_team(1)
+        with open(args.pdf, "rb") as f:
+            cases.append((os.path.basename(args.pdf), meta, f.read(), None))
+    else:
+        for n in [int(s) for s in args.sizes.split(",")]:
+            meta, rows = make_team(n)
+            for row in rows:
+                # Exports skip items still under review.
+                row["status"] = {"S": "Completed"}
+            clients.use(ddb=MemoryDynamoDB().load([meta] + rows))
+            data = inv.fetch_inventory_from_dynamo(meta["teamId"]["S"], {})
+            pdf = inv.render_inventory_pdf(data)[0]
+            cases.append((f"items={n}", meta, pdf, inv.render_inventory_csv(data).decode("utf-8-sig")))
+
+    failed = False
+    for label, meta, pdf, export_csv in cases:
+        team_id = meta["teamId"]["S"]
+        key = f"imports/{team_id}/bench.pdf"
+        payload = {"teamId": team_id, "userId": "bench-user", "s3Key": key}
+        for workers in [w.strip() for w in args.workers.split(",") if w.strip()]:
+            os.environ["IMPORT_PDF_WORKERS"] = workers
+            best = {}
+            for _ in range(args.repeat):
+                s3 = MemoryS3()
+                s3.put_object(Bucket="bench-bucket", Key=key, Body=pdf)
+                clients.use(ddb=MemoryDynamoDB().load([meta]), s3=s3)
+                pdf_import._TEXT.clear()
+                for run in ("cold", "lru", "s3"):
+                    if run == "s3":
+                        pdf_import._TEXT.clear()
+                    t0 = time.perf_counter()
+                    body = json.loads(import_handler.lambda_handler(payload, None)["body"])
+                    best[run] = min(best.get(run, 1e9), time.perf_counter() - t0)
+            print(f"{label:12s} workers={workers:2s} {body['pages']:5d} pages {body['candidateCount']:6d} candidates"
+                  f"  cold {best['cold'] * 1000:8.1f} ms  lru {best['lru'] * 1000:7.1f} ms"
+                  f"  s3 {best['s3'] * 1000:7.1f} ms  {body['pages'] / best['cold']:6.1f} pages/s")
+        if args.check and export_csv is not None:
+            same = groups(import_handler, body["csv"]) == groups(import_handler, export_csv)
+            failed |= not same
+            print(f"{label:12s} review CSV vs export: {'ok' if same else 'MISMATCH'}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,86 @@
+"""
+Microbenchmark: TypeDeserializer dict rows vs export_common.records.decode_item.
+
+    PYTHONPATH=layers/export-common/python python3 bench/bench_records.py [rows]
+"""
+import sys
+import time
+import tracemalloc
+
+from boto3.dynamodb.types import TypeDeserializer
+
+from export_common.records import decode_item
+
+
+def raw_row(i):
+    return {
+        "PK": {"S": "TEAM#bench"},
+        "SK": {"S": f"ITEM#{i:08d}"},
+        "Type": {"S": "Item"},
+        "teamId": {"S": "bench"},
+        "itemId": {"S": f"{i:08d}"},
+        "name": {"S": f"Item {i}"},
+        "actualName": {"S": "RIFLE, 5.56 MILLIMETER: M4"},
+        "description": {"S": "Carbine with rail adapter system and sling"},
+        "status": {"S": "Damaged" if i % 7 == 0 else "Completed"},
+        "parent": {"S": f"{i // 10:08d}"} if i % 10 else {"NULL": True},
+        "isKit": {"BOOL": i % 10 == 0},
+        "nsn": {"S": f"1005-01-{i:06d}"},
+        "serialNumber": {"S": f"W{i:07d}"},
+        "authQuantity": {"N": "1"},
+        "ohQuantity": {"N": "1"},
+        "liin": {"S": "R97234"},
+        "endItemNiin": {"S": "012345678"},
+        "damageReports": {"L": [{"S": "Cracked handguard"}, {"S": "Missing sling swivel"}]},
+        "createdAt": {"S": "2025-01-01T00:00:00.000Z"},
+        "updatedAt": {"S": "2025-02-01T00:00:00.000Z"},
+        "createdBy": {"S": "user-1"},
+        "updateLog": {"L": [
+            {"M": {
+                "userId": {"S": "user-1"},
+                "userName": {"S": "SGT Smith"},
+                "action": {"S": "update"},
+                "timestamp": {"S": "2025-02-01T00:00:00.000Z"},
+            }}
+            for _ in range(5)
+        ]},
+    }
+
+
+def decode_dicts(rows):
+    deser = TypeDeserializer()
+    return [{k: deser.deserialize(v) for k, v in r.items()} for r in rows]
+
+
+def decode_records(rows):
+    return [decode_item(r) for r in rows]
+
+
+def measure(fn, rows):
+    t0 = time.perf_counter()
+    fn(rows)
+    elapsed = time.perf_counter() - t0
+
+    tracemalloc.start()
+    out = fn(rows)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del out
+    return elapsed, peak
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    rows = [raw_row(i) for i in range(n)]
+
+    base_t, base_m = measure(decode_dicts, rows)
+    rec_t, rec_m = measure(decode_records, rows)
+
+    print(f"rows={n}")
+    print(f"TypeDeserializer dicts: {base_t * 1000:8.1f} ms  {base_m / 1e6:7.1f} MB")
+    print(f"ItemRecord slots:       {rec_t * 1000:8.1f} ms  {rec_m / 1e6:7.1f} MB")
+    print(f"speedup x{base_t / rec_t:.1f}, memory x{base_m / rec_m:.1f}")
+
+
+if __name__ == "__main__":
+    main()
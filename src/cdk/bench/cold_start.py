@@ -0,0 +1,157 @@
+"""
+Cold-start benchmark for the export Lambdas.
+
+Each sample is a fresh interpreter (like a new Lambda container) started with
+`-X importtime` and the same layers on sys.path that the function gets in
+AWS. It loads the handler module and serves one request:
+
+  get        module init + GET health check (what a warm-up ping costs)
+  first-post module init + the heavy imports the first POST pulls in
+
+Reports p50/p99 wall time per handler/scenario plus the slowest top-level
+imports, and compares against bench/baselines/cold_start.json.
+
+    python3 bench/cold_start.py [--runs 30] [--prime] [--update-baseline]
+
+Baselines are recorded without --prime.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+CDK_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE = os.path.join(CDK_DIR, "bench", "baselines", "cold_start.json")
+
+PDF_LAYER = os.path.join(CDK_DIR, "layers", "pdf-deps", "python")
+COMMON_LAYER = os.path.join(CDK_DIR, "layers", "export-common", "python")
+
+HANDLERS = {
+    "2404": {
+        "path": os.path.join(CDK_DIR, "python_2404", "2404_handler.py"),
+        "layers": [PDF_LAYER, COMMON_LAYER],
+        "post_imports": ["boto3", "pypdf", "reportlab.pdfgen.canvas"],
+    },
+    "inventory": {
+        "path": os.path.join(CDK_DIR, "python_inventory", "inventory_handler.py"),
+        "layers": [COMMON_LAYER],
+        "post_imports": ["boto3"],
+    },
+}
+
+CHILD = r"""
+import importlib, importlib.util, json, sys, time
+t0 = time.perf_counter()
+spec = importlib.util.spec_from_file_location("handler", sys.argv[1])
+mod = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(mod)
+resp = mod.lambda_handler({"requestContext": {"http": {"method": "GET"}}}, None)
+assert resp["statusCode"] == 200, resp
+for name in sys.argv[2:]:
+    importlib.import_module(name)
+print(json.dumps({"init_ms": (time.perf_counter() - t0) * 1000}))
+"""
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+def parse_importtime(stderr, top=10):
+    """Top-level imports (no indentation) by cumulative microseconds."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        name = name[1:]
+        if name.startswith(" "):
+            continue
+        rows.append((int(cumulative_us), name.strip()))
+    rows.sort(reverse=True)
+    return [{"module": name, "cumulative_ms": round(us / 1000, 1)} for us, name in rows[:top]]
+
+
+def run_once(spec, scenario, prime=False):
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(spec["layers"]),
+               PRIME_ON_INIT="true" if prime else "")
+    args = [sys.executable, "-X", "importtime", "-c", CHILD, spec["path"]]
+    if scenario == "first-post":
+        args += spec["post_imports"]
+    t0 = time.perf_counter()
+    proc = subprocess.run(args, env=env, capture_output=True, text=True, check=True)
+    wall_ms = (time.perf_counter() - t0) * 1000
+    init_ms = json.loads(proc.stdout.strip().splitlines()[-1])["init_ms"]
+    return wall_ms, init_ms, proc.stderr
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=30)
+    ap.add_argument("--update-baseline", action="store_true")
+    ap.add_argument("--prime", action="store_true",
+                    help="run with PRIME_ON_INIT=true (init cost moves ahead of the first request)")
+    ap.add_argument("--tolerance", type=float, default=0.25,
+                    help="allowed p50 regression vs baseline (fraction)")
+    args = ap.parse_args()
+
+    results = {}
+    for name, spec in HANDLERS.items():
+        for scenario in ("get", "first-post"):
+            # One throwaway run so .pyc files exist, as they do in the deployed layer.
+            run_once(spec, scenario, args.prime)
+            walls, inits, stderr = [], [], ""
+            for _ in range(args.runs):
+                wall, init, stderr = run_once(spec, scenario, args.prime)
+                walls.append(wall)
+                inits.append(init)
+            key = f"{name}/{scenario}"
+            results[key] = {
+                "runs": args.runs,
+                "init_p50_ms": round(statistics.median(inits), 1),
+                "init_p99_ms": round(percentile(inits, 99), 1),
+                "process_p50_ms": round(statistics.median(walls), 1),
+                "process_p99_ms": round(percentile(walls, 99), 1),
+                "top_imports": parse_importtime(stderr),
+            }
+            r = results[key]
+            print(f"{key:22s} init p50 {r['init_p50_ms']:7.1f} ms  p99 {r['init_p99_ms']:7.1f} ms"
+                  f"   process p50 {r['process_p50_ms']:7.1f} ms  p99 {r['process_p99_ms']:7.1f} ms")
+            for row in r["top_imports"][:5]:
+                print(f"    {row['cumulative_ms']:8.1f} ms  {row['module']}")
+
+    if args.prime:
+        return 0
+
+    if args.update_baseline:
+        os.makedirs(os.path.dirname(BASELINE), exist_ok=True)
+        with open(BASELINE, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"baseline written to {BASELINE}")
+        return 0
+
+    if not os.path.exists(BASELINE):
+        return 0
+    with open(BASELINE) as f:
+        baseline = json.load(f)
+    failed = False
+    for key, r in results.items():
+        base = baseline.get(key)
+        if not base:
+            continue
+        limit = base["init_p50_ms"] * (1 + args.tolerance)
+        if r["init_p50_ms"] > limit:
+            failed = True
+            print(f"REGRESSION {key}: init p50 {r['init_p50_ms']} ms > {limit:.1f} ms "
+                  f"(baseline {base['init_p50_ms']} ms)")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,299 @@
+"""
+Concurrent export load test against the local backend.
+
+Each worker process stands in for one Lambda container: it loads both
+handlers once, seeds an in-process MemoryDynamoDB with the synthetic teams
+in the mix, and then serves requests one at a time (warm invocations).
+All requests are queued at once, like a burst of teams exporting in the
+same minute, and are spread over --concurrency workers.
+
+Every request is checked the way a user would notice a failure:
+
+  timeout     the handler ran past --timeout-s (SIGALRM, like Lambda's kill)
+  memory      the container's RSS went past --memory-mb
+  truncated   the CSV has fewer item rows / the PDF fewer pages than expected
+  error       non-200 response or an exception
+
+    python3 bench/load_test.py [--concurrency 12] [--requests 48]
+        [--mix inventory:100:3,inventory:1000:3,inventory:10000:2,2404:100:3,2404:1000:1]
+        [--timeout-s 60] [--memory-mb 512] [--json out.json]
+
+Results are per handler/team size: throughput, p50/p90/p99/max latency,
+peak RSS per request (excluding the seeded fixture table) and failure
+counts. With more workers than CPU cores the latencies include CPU
+contention that Lambda would not have.
+"""
+import argparse
+import csv
+import gzip
+import io
+import json
+import multiprocessing
+import os
+import random
+import resource
+import signal
+import statistics
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+CDK_DIR = os.path.dirname(BENCH_DIR)
+sys.path[:0] = [
+    os.path.join(CDK_DIR, "layers", "export-common", "python"),
+    os.path.join(CDK_DIR, "layers", "pdf-deps", "python"),
+    BENCH_DIR,
+]
+
+os.environ.update(
+    TABLE_NAME="load-table",
+    UPLOADS_BUCKET="load-bucket",
+    BUNDLED_TEMPLATE_PATH=os.path.join(CDK_DIR, "templates", "2404-template.pdf"),
+    PRIME_ON_INIT="",
+    SNAPSHOT_PREFIX="",
+    EXPORT_TRACE="",
+    EXPORT_PROFILE="",
+)
+
+DEFAULT_MIX = "inventory:100:3,inventory:1000:3,inventory:10000:2,2404:100:3,2404:1000:1"
+
+_worker = {}
+
+
+class _Timeout(BaseException):
+    # Not an Exception, so the handlers' own `except Exception` blocks can't swallow it.
+    pass
+
+
+def _alarm(signum, frame):
+    raise _Timeout()
+
+
+def rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1048576
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def reset_peak_rss():
+    """Reset VmHWM so the next reading covers one request only (Linux)."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def parse_mix(spec):
+    mix = []
+    for part in spec.split(","):
+        handler, size, weight = part.split(":")
+        if handler not in ("inventory", "2404"):
+            raise ValueError(f"unknown handler {handler!r}")
+        mix.append((handler, int(size), float(weight)))
+    return mix
+
+
+def _init(sizes, timeout_s, memory_mb, ready):
+    import importlib.util
+
+    from export_common import clients
+    from export_common.local_backend import MemoryDynamoDB, MemoryS3
+    from export_common.records import decode_items
+    from synthetic import make_team
+
+    def load(name, path):
+        spec = importlib.util.spec_from_file_location(name, path)
+        mod = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(mod)
+        return mod
+
+    inv = load("inventory_handler", os.path.join(CDK_DIR, "python_inventory", "inventory_handler.py"))
+    h2404 = load("handler_2404", os.path.join(CDK_DIR, "python_2404", "2404_handler.py"))
+
+    from pypdf import PdfReader
+
+    template_pages = len(PdfReader(io.BytesIO(h2404.read_template_bytes())).pages)
+    rss_loaded = rss_mb()
+
+    ddb = MemoryDynamoDB()
+    expected = {}
+    for n in sizes:
+        meta, rows = make_team(n)
+        ddb.load([meta] + rows)
+        records = decode_items(rows)
+        expected[n] = {
+            "teamId": meta["teamId"]["S"],
+            "csv_rows": sum(1 for r in records if inv._exportable(r)),
+            "pdf_pages": template_pages * sum(1 for r in records if (r.status or "").lower() == "damaged"),
+        }
+    s3 = MemoryS3()
+    clients.use(ddb=ddb, s3=s3)
+    signal.signal(signal.SIGALRM, _alarm)
+    # The seeded table lives in DynamoDB in production, not in the container.
+    _worker.update(inv=inv, h2404=h2404, s3=s3, expected=expected,
+                   timeout_s=timeout_s, memory_mb=memory_mb,
+                   fixture_mb=max(0.0, rss_mb() - rss_loaded))
+    ready.put(os.getpid())
+
+
+def _csv_item_rows(body, content_encoding=None):
+    """Count item rows in the grouped CSV (rows under each Name,Material,... header)."""
+    if content_encoding == "gzip":
+        body = gzip.decompress(body)
+    count = 0
+    in_table = False
+    for row in csv.reader(io.StringIO(body.decode("utf-8-sig"))):
+        if not row or not any(row):
+            in_table = False
+        elif row[:2] == ["Name", "Material"]:
+            in_table = True
+        elif in_table:
+            count += 1
+    return count
+
+
+def _check(handler, size, resp):
+    w = _worker
+    exp = w["expected"][size]
+    if resp.get("statusCode") != 200:
+        return "error", f"status {resp.get('statusCode')}: {str(resp.get('body'))[:200]}"
+    body = json.loads(resp["body"])
+    if handler == "2404" and not exp["pdf_pages"]:
+        return "ok", None
+    data, meta = w["s3"].objects[(os.environ["UPLOADS_BUCKET"], body["s3Key"])]
+    if handler == "inventory":
+        got, want = _csv_item_rows(data, meta.get("ContentEncoding")), exp["csv_rows"]
+    else:
+        from pypdf import PdfReader
+
+        got, want = len(PdfReader(io.BytesIO(data)).pages), exp["pdf_pages"]
+    if got != want:
+        return "truncated", f"{got} of {want}"
+    return "ok", None
+
+
+def _run(task):
+    handler, size = task
+    w = _worker
+    team_id = w["expected"][size]["teamId"]
+    fn = w["inv"].lambda_handler if handler == "inventory" else w["h2404"].lambda_handler
+    status, detail = "ok", None
+    reset_peak_rss()
+    t0 = time.perf_counter()
+    signal.setitimer(signal.ITIMER_REAL, w["timeout_s"])
+    try:
+        resp = fn({"teamId": team_id, "force": True}, None)
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        latency = time.perf_counter() - t0
+        status, detail = _check(handler, size, resp)
+    except _Timeout:
+        latency = time.perf_counter() - t0
+        status, detail = "timeout", f"killed after {w['timeout_s']} s"
+    except Exception as e:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        latency = time.perf_counter() - t0
+        status, detail = "error", f"{type(e).__name__}: {e}"
+    rss = rss_mb() - w["fixture_mb"]
+    peak = peak_rss_mb() - w["fixture_mb"]
+    if status == "ok" and peak > w["memory_mb"]:
+        status, detail = "memory", f"peak RSS {peak:.0f} MB"
+    # Free what the request left behind, as the next invocation would see it.
+    w["s3"].objects.clear()
+    return {
+        "handler": handler, "size": size, "status": status, "detail": detail,
+        "latency_s": latency, "rss_mb": rss, "peak_rss_mb": peak, "pid": os.getpid(),
+    }
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+def summarize(results, wall_s):
+    groups = {}
+    for r in results:
+        groups.setdefault((r["handler"], r["size"]), []).append(r)
+    out = {"wall_s": round(wall_s, 2), "requests": len(results),
+           "throughput_rps": round(len(results) / wall_s, 2) if wall_s else None, "groups": {}}
+    for (handler, size), rs in sorted(groups.items()):
+        lat = [r["latency_s"] for r in rs]
+        failures = {}
+        for r in rs:
+            if r["status"] != "ok":
+                failures[r["status"]] = failures.get(r["status"], 0) + 1
+        out["groups"][f"{handler}/{size}"] = {
+            "requests": len(rs),
+            "p50_s": round(statistics.median(lat), 3),
+            "p90_s": round(percentile(lat, 90), 3),
+            "p99_s": round(percentile(lat, 99), 3),
+            "max_s": round(max(lat), 3),
+            "peak_rss_mb": round(max(r["peak_rss_mb"] for r in rs), 1),
+            "failures": failures,
+            "examples": sorted({r["detail"] for r in rs if r["detail"]})[:3],
+        }
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--concurrency", type=int, default=12, help="worker processes (containers)")
+    ap.add_argument("--requests", type=int, default=48)
+    ap.add_argument("--mix", default=DEFAULT_MIX, help="handler:teamSize:weight,...")
+    ap.add_argument("--timeout-s", type=float, default=60.0, help="Lambda timeout to enforce")
+    ap.add_argument("--memory-mb", type=float, default=512.0, help="Lambda memorySize to check RSS against")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--json", help="also write the summary here")
+    args = ap.parse_args()
+
+    mix = parse_mix(args.mix)
+    rng = random.Random(args.seed)
+    tasks = rng.choices([(h, n) for h, n, _ in mix], weights=[w for _, _, w in mix], k=args.requests)
+    sizes = sorted({n for _, n, _ in mix})
+
+    ctx = multiprocessing.get_context("fork" if hasattr(os, "fork") else "spawn")
+    print(f"{args.requests} requests over {args.concurrency} workers "
+          f"(timeout {args.timeout_s:g} s, memory {args.memory_mb:g} MB)")
+    ready = ctx.Queue()
+    with ctx.Pool(args.concurrency, initializer=_init,
+                  initargs=(sizes, args.timeout_s, args.memory_mb, ready)) as pool:
+        # Start the clock once every worker has finished seeding.
+        for _ in range(args.concurrency):
+            ready.get()
+        t0 = time.perf_counter()
+        results = list(pool.imap_unordered(_run, tasks))
+        wall = time.perf_counter() - t0
+
+    summary = summarize(results, wall)
+    print(f"wall {summary['wall_s']} s, {summary['throughput_rps']} req/s")
+    for key, g in summary["groups"].items():
+        failed = ", ".join(f"{k} {v}" for k, v in sorted(g["failures"].items())) or "none"
+        print(f"  {key:16s} n={g['requests']:3d}  p50 {g['p50_s']:7.3f}  p90 {g['p90_s']:7.3f}"
+              f"  p99 {g['p99_s']:7.3f}  max {g['max_s']:7.3f} s  peak RSS {g['peak_rss_mb']:7.1f} MB"
+              f"  failures: {failed}")
+        for ex in g["examples"]:
+            print(f"      {ex}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": vars(args), **summary}, f, indent=2)
+    return 1 if any(g["failures"] for g in summary["groups"].values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
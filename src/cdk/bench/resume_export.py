@@ -0,0 +1,194 @@
+"""
+Checkpoint/resume check for the export handlers against the local backend.
+
+Runs each export once without a Lambda context (single pass), then again
+with a FakeContext that gives every invocation only --timeout-ms, following
+the returned continuation until the export completes. With --budget-ms the
+resumed invocations get no context and pass {"budgetMs"} instead, the way
+the API does.
+
+The resumed artifact must match the single-pass one: identical CSV bytes,
+and for the 2404 the same page content streams and the same PDF once both
+are rewritten with their objects renumbered. The resumed 2404 is still a
+little larger: each part brings its own copies of the shared objects,
+compress_identical_objects drops the duplicates, and their object numbers
+stay behind as free xref entries (20 bytes each, plus longer numbers in
+references). The check asserts that this is the whole difference.
+
+    python3 bench/resume_export.py [--handlers inventory,2404] [--size 1000]
+        [--timeout-ms 1500 | --budget-ms 1500] [--reserve-ms 300] [--max-invocations 200]
+
+Exits non-zero on a mismatch, an error response, or when the export makes
+no progress within --max-invocations.
+"""
+import argparse
+import importlib.util
+import io
+import json
+import os
+import sys
+import time
+
+CDK_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [
+    os.path.join(CDK_DIR, "layers", "export-common", "python"),
+    os.path.join(CDK_DIR, "layers", "pdf-deps", "python"),
+    os.path.dirname(os.path.abspath(__file__)),
+]
+
+os.environ.update(
+    TABLE_NAME="resume-table",
+    UPLOADS_BUCKET="resume-bucket",
+    BUNDLED_TEMPLATE_PATH=os.path.join(CDK_DIR, "templates", "2404-template.pdf"),
+    PRIME_ON_INIT="",
+    SNAPSHOT_PREFIX="",
+    EXPORT_TRACE="",
+    EXPORT_PROFILE="",
+)
+
+
+def load_handler(name, path):
+    spec = importlib.util.spec_from_file_location(name, path)
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+
+def run_export(fn, team_id, s3, context_factory, max_invocations, **extra):
+    """Invoke until done; returns (artifact bytes or None, invocations, seconds)."""
+    payload = {"teamId": team_id, "force": True, **extra}
+    t0 = time.perf_counter()
+    for n in range(1, max_invocations + 1):
+        resp = fn(dict(payload), context_factory())
+        body = json.loads(resp["body"])
+        if resp["statusCode"] == 202:
+            payload["continuation"] = body["continuation"]
+            continue
+        if resp["statusCode"] != 200:
+            raise RuntimeError(f"status {resp['statusCode']}: {body}")
+        elapsed = time.perf_counter() - t0
+        if "s3Key" not in body:
+            return None, n, elapsed
+        data, _ = s3.objects[(os.environ["UPLOADS_BUCKET"], body["s3Key"])]
+        return data, n, elapsed
+    raise RuntimeError(f"not finished after {max_invocations} invocations")
+
+
+def pdf_pages(data):
+    """Each page's own content stream: the template form call plus the item's overlay."""
+    from pypdf import PdfReader
+
+    return [page.get_contents().get_data() for page in PdfReader(io.BytesIO(data)).pages]
+
+
+def pdf_objects(data):
+    """
+    (the PDF rewritten with its reachable objects renumbered in order,
+    free object numbers, digits spent on object numbers in headers and references).
+    """
+    from pypdf import PdfReader, PdfWriter
+
+    reader = PdfReader(io.BytesIO(data))
+    used, digits = 0, 0
+    for number in _object_numbers(reader):
+        used += 1
+        digits += len(str(number)) + _reference_digits(reader.get_object(number))
+    out = io.BytesIO()
+    PdfWriter(clone_from=reader).write(out)
+    return out.getvalue(), int(reader.trailer["/Size"]) - 1 - used, digits
+
+
+def _object_numbers(reader):
+    for numbers in reader.xref.values():
+        yield from numbers
+    yield from reader.xref_objStm
+
+
+def _reference_digits(obj):
+    from pypdf.generic import ArrayObject, DictionaryObject, IndirectObject
+
+    if isinstance(obj, IndirectObject):
+        return len(str(obj.idnum))
+    if isinstance(obj, DictionaryObject):
+        return sum(_reference_digits(v) for v in obj.values())
+    if isinstance(obj, ArrayObject):
+        return sum(_reference_digits(v) for v in obj)
+    return 0
+
+
+def same_pdf(whole, resumed):
+    """None when the PDFs match; otherwise what differs."""
+    if pdf_pages(whole) != pdf_pages(resumed):
+        return "page content differs"
+    (a, free_a, digits_a), (b, free_b, digits_b) = pdf_objects(whole), pdf_objects(resumed)
+    if a != b:
+        return "objects differ"
+    # What is left: 20 bytes per free xref entry, the longer object numbers
+    # that come with them, and a digit or two in the xref header and startxref.
+    extra = len(resumed) - len(whole) - 20 * (free_b - free_a) - (digits_b - digits_a)
+    if not 0 <= extra <= 4:
+        return f"{len(resumed) - len(whole)} extra bytes, {free_b - free_a} extra free objects"
+    return None
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--handlers", default="inventory,2404")
+    ap.add_argument("--size", type=int, default=1000, help="synthetic team size")
+    ap.add_argument("--timeout-ms", type=int, default=1500, help="time each invocation gets")
+    ap.add_argument("--budget-ms", type=int, help="pass this budgetMs instead of a context")
+    ap.add_argument("--reserve-ms", type=int, default=300, help="EXPORT_CHECKPOINT_RESERVE_MS")
+    ap.add_argument("--max-invocations", type=int, default=200)
+    args = ap.parse_args()
+
+    # Deadline picks its reserve up at import time.
+    os.environ["EXPORT_CHECKPOINT_RESERVE_MS"] = str(args.reserve_ms)
+
+    from export_common import clients
+    from export_common.local_backend import FakeContext, MemoryDynamoDB, MemoryS3
+    from synthetic import make_team
+
+    handlers = {
+        "inventory": load_handler("inventory_handler", os.path.join(CDK_DIR, "python_inventory", "inventory_handler.py")),
+        "2404": load_handler("handler_2404", os.path.join(CDK_DIR, "python_2404", "2404_handler.py")),
+    }
+
+    meta, rows = make_team(args.size)
+    team_id = meta["teamId"]["S"]
+    ddb = MemoryDynamoDB().load([meta] + rows)
+
+    failed = False
+    for name in args.handlers.split(","):
+        mod = handlers[name]
+        s3 = MemoryS3()
+        clients.use(ddb=ddb, s3=s3)
+        if name == "inventory":
+            mod._BLOCK_CACHE.clear()
+            mod._block_cache_bytes = 0
+        whole, n1, t1 = run_export(mod.lambda_handler, team_id, s3, lambda: None, 1)
+        if name == "inventory":
+            mod._BLOCK_CACHE.clear()
+            mod._block_cache_bytes = 0
+        if args.budget_ms:
+            resumed, n2, t2 = run_export(mod.lambda_handler, team_id, s3, lambda: None, args.max_invocations,
+                                         budgetMs=args.budget_ms)
+        else:
+            resumed, n2, t2 = run_export(mod.lambda_handler, team_id, s3,
+                                         lambda: FakeContext(args.timeout_ms), args.max_invocations)
+        leftovers = [k for (_, k) in s3.objects if k.startswith("ops/exports/")]
+
+        if name == "inventory":
+            problem = None if whole == resumed else "bytes differ"
+        elif whole is None or resumed is None:
+            problem = None if whole is resumed else "one export is empty"
+        else:
+            problem = same_pdf(whole, resumed)
+        status = f"MISMATCH ({problem})" if problem else "LEFTOVER PARTS" if leftovers else "ok"
+        failed |= status != "ok"
+        print(f"{name:9s} team {args.size}: single pass {t1:7.2f} s; resumed {t2:7.2f} s over {n2} invocations"
+              f" of {args.budget_ms or args.timeout_ms} ms; {len(whole or b'')} vs {len(resumed or b'')} bytes  {status}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,155 @@
+"""
+Synthetic teams for the export benchmarks, modeled on src/api/src/seed.ts.
+
+Items reuse the seed catalogue and status mix ("To Review", "Completed",
+"Damaged", "Shortages"). Most items sit in end-item kits (one CSV group per
+kit, nested up to three levels); the rest are loose items. Damaged items
+carry several long damage reports so the 2404 remarks column wraps.
+
+Rows are returned in DynamoDB wire format, sorted by SK like a Query.
+"""
+import random
+
+STATUSES = ("To Review", "Completed", "Damaged", "Shortages")
+
+# (name, actualName, nsn, serialPrefix, description) from seed.ts ITEM_DEFINITIONS.
+CATALOGUE = (
+    ("M4 Carbine", "M4A1 Carbine Rifle", "1005-01-231-0973", "W", "Standard issue M4 carbine"),
+    ("M9 Pistol", "M9 Beretta 9mm Pistol", "1005-01-118-2187", "M9-", "Sidearm pistol"),
+    ("M240 Machine Gun", "M240 7.62mm Machine Gun", "1005-01-429-5879", "MG-", "General purpose machine gun"),
+    ("IOTV Body Armor", "Improved Outer Tactical Vest", "8470-01-580-1305", "BA-", "Body armor vest with plate carrier"),
+    ("ACH Helmet", "Advanced Combat Helmet", "8470-01-519-8669", "HELM-", "Combat helmet with padding"),
+    ("Night Vision Goggles", "AN/PVS-14 Night Vision Monocular", "5855-01-432-0524", "NVG-", "Night vision device"),
+    ("ACOG Scope", "Advanced Combat Optical Gunsight", "5855-00-121-9223", "ACOG-", "Magnified rifle optic"),
+    ("Radio Set AN/PRC-152", "Multiband Handheld Radio", "5820-01-525-6389", "RADIO-", "Tactical communications radio"),
+    ("IFAK", "Individual First Aid Kit", "6545-01-531-3147", "IFAK-", "Standard issue first aid kit"),
+    ("Combat Tourniquet", "CAT Combat Application Tourniquet", "6515-01-609-9034", "CAT-", "Combat tourniquet"),
+    ("Assault Pack", "MOLLE II Assault Pack", "8465-01-525-0585", "PACK-", "Three-day assault pack"),
+    ("Sleeping Bag", "Modular Sleeping Bag System", "8465-01-547-2657", "SLP-", "Cold weather sleeping system"),
+    ("Tent", "General Purpose Tent", "8340-01-529-0639", "TENT-", "Two-person field tent"),
+    ("Flashlight", "MX-991/U Angle Head Flashlight", "6230-00-106-6471", "FLASH-", "Angle-head flashlight with filters"),
+    ("Compass", "M2 Lensatic Compass", "6695-00-935-7319", "COMP-", "Military compass"),
+    ("Magazine Pouch", "Double Mag Pouch", "8465-01-234-5679", "MP-", "Magazine carrier"),
+    ("Mag 30 round", "5.56mm Magazine 30rd", "1080-01-245-6789", "MAG-", "30 round magazine"),
+    ("Sling", "Combat Weapon Sling", "8465-00-234-5678", "SLING-", "Three-point weapon sling"),
+    ("Multi-tool", "Leatherman Multi-Tool", "5110-01-234-5687", "MT-", "Military multi-tool"),
+    ("Wire Cutters", "Wire Cutters", "5110-00-234-5688", "WC-", "Diagonal wire cutters"),
+)
+
+# (name, actualName, description) from seed.ts KIT_DEFINITIONS.
+KITS = (
+    ("Rifleman Kit", "Complete Rifleman Combat Kit", "Full combat loadout for rifleman"),
+    ("Patrol Kit", "Field Patrol Essentials Kit", "Essential items for patrol operations"),
+    ("Medical Kit Advanced", "Advanced Field Medical Kit", "Extended medical supplies for squad"),
+    ("Engineer Tool Kit", "Combat Engineer Basic Tool Set", "Engineering and construction tools"),
+)
+
+DAMAGE_REPORTS = (
+    "Cracked handguard near the front sight post, unserviceable until replaced at unit level",
+    "Missing sling swivel; rear attachment point bent and will not accept replacement hardware",
+    "Water intrusion in battery compartment with visible corrosion on the contacts and housing",
+    "Torn stitching along the left shoulder strap, approximately 15 cm, load-bearing seam affected",
+    "Lens assembly scratched across center of field of view, image distortion at all magnifications",
+    "Zipper pull broken off main compartment; slider separates from chain under light load",
+    "Dented housing and loose mounting bracket, fails function check after drop during field exercise",
+)
+
+LOOSE_SHARE = 0.2
+KIT_SIZE = (8, 40)
+
+
+def _s(v):
+    return {"S": v}
+
+
+def _item(rng, team_id, seq, parent, kit, depth, ts):
+    name, actual, nsn, prefix, desc = CATALOGUE[rng.randrange(len(CATALOGUE))]
+    status = STATUSES[seq % len(STATUSES)]
+    row = {
+        "PK": _s(f"TEAM#{team_id}"),
+        "SK": _s(f"ITEM#item-{seq:07d}"),
+        "Type": _s("Item"),
+        "teamId": _s(team_id),
+        "itemId": _s(f"item-{seq:07d}"),
+        "name": _s(name),
+        "actualName": _s(actual),
+        "description": _s(desc),
+        "nsn": _s(nsn),
+        "serialNumber": _s(f"{prefix}{seq:06d}"),
+        "status": _s(status),
+        "isKit": {"BOOL": False},
+        "parent": _s(parent) if parent else {"NULL": True},
+        "authQuantity": {"N": str(1 + seq % 5)},
+        "ohQuantity": {"N": str(1 + (seq + depth) % 5)},
+        "endItemNiin": _s(kit[0] if kit else ""),
+        "liin": _s(kit[1] if kit else ""),
+        "createdAt": _s(ts),
+        "updatedAt": _s(ts),
+        "createdBy": _s("local-dev-user-001"),
+        "updateLog": {"L": [
+            {"M": {"userId": _s("local-dev-user-002"), "userName": _s("Jane Smith"),
+                   "action": _s(f"review - {status.lower()}"), "timestamp": _s(ts)}}
+            for _ in range(1 + seq % 4)
+        ]},
+    }
+    if status == "Damaged":
+        reports = [DAMAGE_REPORTS[(seq + k) % len(DAMAGE_REPORTS)] for k in range(2 + seq % 5)]
+        row["damageReports"] = {"L": [_s(r) for r in reports]}
+    else:
+        row["damageReports"] = {"L": []}
+    return row
+
+
+def make_team(n_items, team_id=None, seed=0):
+    """Return (metadata_row, item_rows) for a team of n_items items."""
+    rng = random.Random(seed)
+    team_id = team_id or f"bench-{n_items}"
+    ts = "2025-02-01T00:00:00.000Z"
+    rows = []
+    seq = 0
+    n_loose = int(n_items * LOOSE_SHARE)
+    kit_no = 0
+    while seq < n_items - n_loose:
+        kit_no += 1
+        kit = (f"{kit_no:09d}", f"K{kit_no:05d}")
+        kname, kactual, kdesc = KITS[kit_no % len(KITS)]
+        root = _item(rng, team_id, seq, None, kit, 0, ts)
+        root.update(name=_s(kname), actualName=_s(kactual), description=_s(kdesc), isKit={"BOOL": True})
+        rows.append(root)
+        parents = [(root["itemId"]["S"], 0)]
+        seq += 1
+        size = min(rng.randint(*KIT_SIZE), n_items - n_loose - seq)
+        for _ in range(size):
+            parent_id, depth = parents[rng.randrange(len(parents))]
+            row = _item(rng, team_id, seq, parent_id, kit, depth + 1, ts)
+            rows.append(row)
+            if depth + 1 < 3 and rng.random() < 0.2:
+                row["isKit"] = {"BOOL": True}
+                parents.append((row["itemId"]["S"], depth + 1))
+            seq += 1
+    while seq < n_items:
+        rows.append(_item(rng, team_id, seq, None, None, 0, ts))
+        seq += 1
+
+    meta = {
+        "PK": _s(f"TEAM#{team_id}"),
+        "SK": _s("METADATA"),
+        "Type": _s("Team"),
+        "teamId": _s(team_id),
+        "name": _s("Local Dev Team"),
+        "uic": _s("W1A1AA"),
+        "fe": _s("FE001"),
+        "updatedAt": _s(ts),
+    }
+    rows.sort(key=lambda r: r["SK"]["S"])
+    return meta, rows
+
+
+if __name__ == "__main__":
+    import json
+    import sys
+
+    # Write a seed file for MemoryDynamoDB / inventory_handler.py --seed.
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    meta, rows = make_team(n, team_id=sys.argv[2] if len(sys.argv) > 2 else None)
+    json.dump([meta] + rows, sys.stdout)
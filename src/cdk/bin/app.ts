@@ -239,6 +239,8 @@ const exportLambdas = new ExportLambdaStack(app, `MngLambdaExport-${cfg.name}`,
 
 uploads.grantApiAccess(exportLambdas.pdf2404Function.role!);
 uploads.grantApiAccess(exportLambdas.inventoryFunction.role!);
+uploads.grantApiAccess(exportLambdas.imagesFunction.role!);
+uploads.grantApiAccess(exportLambdas.importFunction.role!);
 
 // Grant API Lambda permission to invoke export functions
 exportLambdas.grantInvoke(api.apiFn);
@@ -249,6 +251,17 @@ api.apiFn.addEnvironment(
   'EXPORT_INVENTORY_FUNCTION_NAME',
   exportLambdas.inventoryFunction.functionName,
 );
+api.apiFn.addEnvironment('ITEM_IMAGES_FUNCTION_NAME', exportLambdas.imagesFunction.functionName);
+api.apiFn.addEnvironment(
+  'IMPORT_INVENTORY_FUNCTION_NAME',
+  exportLambdas.importFunction.functionName,
+);
+// Time getExport spends on export invocations per request, 5 s under the
+// API function's timeout and the HTTP API's 30 s integration limit.
+api.apiFn.addEnvironment(
+  'EXPORT_BUDGET_MS',
+  String((Math.min(cfg.lambda?.timeoutSeconds ?? 30, 30) - 5) * 1000),
+);
 
 // Grant API Lambda full access to uploads bucket + KMS key
 uploads.grantApiAccess(api.apiFn.role!);
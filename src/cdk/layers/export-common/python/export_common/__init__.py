@@ -0,0 +1 @@
+"""Helpers shared by the export Lambdas (2404 PDF and inventory CSV)."""
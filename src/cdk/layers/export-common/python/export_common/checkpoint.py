@@ -0,0 +1,161 @@
+"""
+Checkpoints for exports that may not finish inside one invocation.
+
+Exports render in chunks. Between chunks the handler asks its Deadline
+whether the next chunk still fits in the time left
+(context.get_remaining_time_in_millis() minus RESERVE_MS for saving). When
+it does not, the chunks rendered so far are uploaded as parts under
+
+    ops/exports/<teamId>/<runId>/part-NNNN.<ext>
+
+next to a state.json with the final key, the artifact token (a delta
+inventory, which has none, records its since and itemsVersion), the cursor
+(the last processed itemId for the 2404, the next group index for the
+inventory CSV) and the part list, and the handler returns a
+continuation (the run id). Invoking it again with {"teamId", "continuation"}
+resumes after the cursor; the invocation that renders the last chunk
+assembles the parts into the final object and deletes the run.
+
+A caller that has less time than the export function (the API Lambda sits
+behind a 30 s HTTP API) passes {"budgetMs"}; the deadline is then whichever
+comes first, the context's or the budget's counted from when the Deadline
+was made, so the 202 reaches the caller while it is still waiting.
+
+Without a context or a budget (CLI, benchmarks) the deadline never expires,
+and an export that finishes in one invocation never writes a checkpoint.
+Runs that are never resumed are removed by the bucket's
+expire-export-checkpoints lifecycle rule.
+"""
+import json
+import os
+import re
+import time
+import uuid
+
+PREFIX = os.environ.get("EXPORT_CHECKPOINT_PREFIX", "ops/exports").strip().strip("/")
+RESERVE_MS = int(os.environ.get("EXPORT_CHECKPOINT_RESERVE_MS", "8000") or 8000)
+
+_RUN_ID = re.compile(r"^[0-9a-f]{32}$")
+
+
+def _budget_ms(value):
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        return None
+    return value if value > 0 else None
+
+
+class Deadline:
+    def __init__(self, context, reserve_ms=RESERVE_MS, budget_ms=None):
+        self.reserve_ms = reserve_ms
+        self._remaining = getattr(context, "get_remaining_time_in_millis", None)
+        budget_ms = _budget_ms(budget_ms)
+        self._until = time.monotonic() * 1000 + budget_ms if budget_ms else None
+
+    def remaining_ms(self):
+        left = [self._remaining()] if self._remaining else []
+        if self._until is not None:
+            left.append(self._until - time.monotonic() * 1000)
+        return min(left) if left else None
+
+    def expiring(self, next_ms=0):
+        """True when a step estimated at next_ms would run into the reserve."""
+        remaining = self.remaining_ms()
+        return remaining is not None and remaining - next_ms < self.reserve_ms
+
+    def units_left(self, unit_ms):
+        """How many more steps of unit_ms fit before the reserve; None without a deadline."""
+        remaining = self.remaining_ms()
+        if remaining is None or not unit_ms:
+            return None
+        return max(0, int((remaining - self.reserve_ms) / unit_ms))
+
+
+class Checkpoint:
+    def __init__(self, s3, bucket, team_id, run_id, state):
+        self.s3 = s3
+        self.bucket = bucket
+        self.team_id = team_id
+        self.run_id = run_id
+        self.state = state
+
+    @classmethod
+    def start(cls, s3, bucket, team_id, kind, **fields):
+        state = {"kind": kind, "cursor": None, "parts": [], "counts": {}, **fields}
+        return cls(s3, bucket, team_id, uuid.uuid4().hex, state)
+
+    @classmethod
+    def load(cls, s3, bucket, team_id, kind, run_id):
+        """Resume a run; ValueError if the continuation is unknown or for another export."""
+        if not isinstance(run_id, str) or not _RUN_ID.match(run_id):
+            raise ValueError("invalid continuation")
+        ckpt = cls(s3, bucket, team_id, run_id, None)
+        try:
+            blob = s3.get_object(Bucket=bucket, Key=ckpt.key("state.json"))["Body"].read()
+        except Exception:
+            raise ValueError("unknown or expired continuation")
+        ckpt.state = json.loads(blob)
+        if ckpt.state.get("kind") != kind:
+            raise ValueError("continuation belongs to another export")
+        return ckpt
+
+    def key(self, name):
+        return f"{PREFIX}/{self.team_id}/{self.run_id}/{name}"
+
+    @property
+    def cursor(self):
+        return self.state.get("cursor")
+
+    @property
+    def parts(self):
+        return self.state["parts"]
+
+    @property
+    def counts(self):
+        return self.state["counts"]
+
+    def add_part(self, body, ext, content_type="application/octet-stream"):
+        """Upload one part, given as bytes or a local file path."""
+        key = self.key(f"part-{len(self.parts):04d}{ext}")
+        if isinstance(body, (bytes, bytearray)):
+            self.s3.put_object(Bucket=self.bucket, Key=key, Body=body, ContentType=content_type)
+        else:
+            with open(body, "rb") as f:
+                self.s3.put_object(Bucket=self.bucket, Key=key, Body=f, ContentType=content_type)
+        self.parts.append(key)
+        return key
+
+    def save(self, cursor, **counts):
+        self.state["cursor"] = cursor
+        for name, n in counts.items():
+            self.counts[name] = self.counts.get(name, 0) + n
+        self.s3.put_object(Bucket=self.bucket, Key=self.key("state.json"),
+                           Body=json.dumps(self.state).encode("utf-8"),
+                           ContentType="application/json")
+
+    def read_parts(self):
+        """Saved parts as bytes, in order."""
+        for key in self.parts:
+            yield self.s3.get_object(Bucket=self.bucket, Key=key)["Body"].read()
+
+    def fetch_parts(self, out_dir):
+        """Download the saved parts into out_dir; returns local paths in order."""
+        paths = []
+        for key in self.parts:
+            path = os.path.join(out_dir, "saved-" + key.rsplit("/", 1)[-1])
+            body = self.s3.get_object(Bucket=self.bucket, Key=key)["Body"]
+            with open(path, "wb") as f:
+                for chunk in iter(lambda: body.read(1024 * 1024), b""):
+                    f.write(chunk)
+            paths.append(path)
+        return paths
+
+    def discard(self):
+        for key in self.parts + [self.key("state.json")]:
+            try:
+                self.s3.delete_object(Bucket=self.bucket, Key=key)
+            except Exception:
+                # Leftovers are harmless; the bucket lifecycle rule expires ops/exports/.
+                pass
+
@@ -0,0 +1,165 @@
+"""
+DynamoDB and S3 clients for the export handlers.
+
+Clients are created on first use and cached for the life of the container.
+Benchmarks, tests and the CLI can inject their own with use(). Without
+injection the backend comes from the environment:
+
+  (default)                boto3 clients
+  LOCAL_DEV=true           DynamoDB Local at DYNAMODB_ENDPOINT (default
+                           http://localhost:8000, the docker-compose service),
+                           like the API's local dev mode
+  EXPORT_BACKEND=memory    in-process MemoryDynamoDB, seeded from the JSON
+                           file in LOCAL_DDB_SEED
+
+Both local modes store S3 objects under LOCAL_S3_ROOT (DirectoryS3).
+
+boto3 clients share one botocore Config: a connection pool sized for
+EXPORT_MAX_WORKERS concurrent requests, adaptive retries (client-side rate
+limiting when DynamoDB throttles), TCP keepalive, and connect/read timeouts
+derived from the function timeout (EXPORT_TIMEOUT_S) so a hung connection
+is retried instead of consuming the whole invocation. Each boto3 client
+counts calls, retried attempts and throttling errors in `stats`, which the
+handlers report through the trace.
+"""
+import os
+
+DEFAULT_S3_ROOT = "/tmp/mng-local-s3"
+
+MAX_WORKERS = int(os.environ.get("EXPORT_MAX_WORKERS", "16") or 16)
+TIMEOUT_S = float(os.environ.get("EXPORT_TIMEOUT_S", "60") or 60)
+MAX_ATTEMPTS = int(os.environ.get("EXPORT_MAX_ATTEMPTS", "6") or 6)
+
+THROTTLE_CODES = frozenset((
+    "Throttling",
+    "ThrottlingException",
+    "ThrottledException",
+    "RequestThrottledException",
+    "ProvisionedThroughputExceededException",
+    "RequestLimitExceeded",
+    "TooManyRequestsException",
+    "SlowDown",
+))
+
+# Cumulative per-container counters; handlers report the delta per invocation.
+stats = {}
+
+_clients = {}
+
+
+def use(ddb=None, s3=None):
+    """Inject clients; None leaves the current one in place."""
+    if ddb is not None:
+        _clients["ddb"] = ddb
+    if s3 is not None:
+        _clients["s3"] = s3
+
+
+def reset():
+    _clients.clear()
+
+
+def backend():
+    if os.environ.get("EXPORT_BACKEND", "").strip().lower() == "memory":
+        return "memory"
+    if os.environ.get("LOCAL_DEV", "").strip().lower() == "true":
+        return "dynamodb-local"
+    return "aws"
+
+
+def client_config(**overrides):
+    from botocore.config import Config
+
+    params = dict(
+        max_pool_connections=max(10, MAX_WORKERS + 2),
+        retries={"mode": "adaptive", "total_max_attempts": MAX_ATTEMPTS},
+        connect_timeout=min(5.0, max(1.0, TIMEOUT_S / 20)),
+        read_timeout=min(60.0, max(5.0, TIMEOUT_S / 4)),
+        tcp_keepalive=True,
+    )
+    params.update(overrides)
+    return Config(**params)
+
+
+def _bump(name, n=1):
+    stats[name] = stats.get(name, 0) + n
+
+
+def _instrument(client, prefix):
+    """Count calls, attempts and throttled responses via botocore events."""
+    service = client.meta.service_model.service_id.hyphenize()
+
+    def on_call(**_):
+        _bump(f"{prefix}_calls")
+
+    def on_attempt(**_):
+        _bump(f"{prefix}_attempts")
+
+    def on_response(response=None, caught_exception=None, **_):
+        if response is not None:
+            code = ((response[1] or {}).get("Error") or {}).get("Code")
+            if code in THROTTLE_CODES:
+                _bump(f"{prefix}_throttles")
+        elif caught_exception is not None:
+            _bump(f"{prefix}_connection_errors")
+
+    events = client.meta.events
+    events.register(f"before-call.{service}", on_call)
+    events.register(f"request-created.{service}", on_attempt)
+    events.register(f"needs-retry.{service}", on_response)
+    return client
+
+
+def stats_delta(before):
+    """Counters accumulated since `before` (a copy of `stats`), plus derived retries."""
+    out = {k: v - before.get(k, 0) for k, v in stats.items() if v != before.get(k, 0)}
+    for prefix in ("ddb", "s3"):
+        attempts = out.get(f"{prefix}_attempts")
+        if attempts:
+            out[f"{prefix}_retries"] = attempts - out.get(f"{prefix}_calls", 0)
+    return out
+
+
+def _make_ddb():
+    mode = backend()
+    if mode == "memory":
+        from .local_backend import MemoryDynamoDB
+
+        seed = os.environ.get("LOCAL_DDB_SEED", "").strip()
+        return MemoryDynamoDB.from_json(seed) if seed else MemoryDynamoDB()
+    import boto3
+
+    if mode == "dynamodb-local":
+        return _instrument(boto3.client(
+            "dynamodb",
+            region_name="us-east-1",
+            endpoint_url=os.environ.get("DYNAMODB_ENDPOINT", "http://localhost:8000"),
+            aws_access_key_id="dummy",
+            aws_secret_access_key="dummy",
+            config=client_config(),
+        ), "ddb")
+    return _instrument(boto3.client("dynamodb", config=client_config()), "ddb")
+
+
+def _make_s3():
+    if backend() != "aws":
+        from .local_backend import DirectoryS3
+
+        return DirectoryS3(os.environ.get("LOCAL_S3_ROOT", DEFAULT_S3_ROOT))
+    import boto3
+
+    return _instrument(boto3.client("s3", config=client_config(signature_version="s3v4")), "s3")
+
+
+def ddb():
+    client = _clients.get("ddb")
+    if client is None:
+        client = _clients["ddb"] = _make_ddb()
+    return client
+
+
+def s3():
+    client = _clients.get("s3")
+    if client is None:
+        client = _clients["s3"] = _make_s3()
+    return client
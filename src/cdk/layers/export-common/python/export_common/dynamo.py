@@ -0,0 +1,169 @@
+"""Team partition reads shared by the export handlers."""
+
+
+ITEMS_BY_UPDATED_INDEX = "GSI_TeamItemsByUpdatedAt"
+
+
+def _paginate(client, params, on_page=None):
+    while True:
+        resp = client.query(**params)
+        if on_page:
+            on_page(resp)
+        yield from resp.get("Items", [])
+        lek = resp.get("LastEvaluatedKey")
+        if not lek:
+            return
+        params["ExclusiveStartKey"] = lek
+
+
+def query_team_items(client, table_name, team_id, on_page=None, **extra):
+    """
+    Yield raw ITEM# rows for a team, following LastEvaluatedKey so teams
+    larger than one 1 MB query page are read completely. `on_page` is
+    called with each raw Query response.
+    """
+    params = {
+        "TableName": table_name,
+        "KeyConditionExpression": "PK = :pk AND begins_with(SK, :sk)",
+        "ExpressionAttributeValues": {
+            ":pk": {"S": f"TEAM#{team_id}"},
+            ":sk": {"S": "ITEM#"},
+        },
+    }
+    params.update(extra)
+    return _paginate(client, params, on_page)
+
+
+def query_team_items_since(client, table_name, team_id, since, index_name=ITEMS_BY_UPDATED_INDEX, on_page=None):
+    """
+    Yield raw ITEM# rows whose updatedAt is strictly after `since`, read from
+    the (teamId, updatedAt) index so only changed rows are touched. The team
+    METADATA row also carries teamId/updatedAt and is filtered out.
+    """
+    params = {
+        "TableName": table_name,
+        "IndexName": index_name,
+        "KeyConditionExpression": "teamId = :t AND updatedAt > :since",
+        "FilterExpression": "begins_with(SK, :sk)",
+        "ExpressionAttributeValues": {
+            ":t": {"S": team_id},
+            ":since": {"S": since},
+            ":sk": {"S": "ITEM#"},
+        },
+    }
+    return _paginate(client, params, on_page)
+
+
+def get_team_metadata(client, table_name, team_id):
+    resp = client.get_item(
+        TableName=table_name,
+        Key={"PK": {"S": f"TEAM#{team_id}"}, "SK": {"S": "METADATA"}},
+        ConsistentRead=True,
+    )
+    return resp.get("Item") or {}
+
+
+def batch_get_items(client, table_name, keys, projection=None, max_attempts=8):
+    """BatchGetItem in chunks of 100, retrying UnprocessedKeys with backoff."""
+    import time
+
+    out = []
+    for i in range(0, len(keys), 100):
+        request = {"Keys": keys[i:i + 100]}
+        if projection:
+            request["ProjectionExpression"] = projection
+        pending = {table_name: request}
+        attempt = 0
+        while pending:
+            resp = client.batch_get_item(RequestItems=pending)
+            out.extend(resp.get("Responses", {}).get(table_name, []))
+            pending = resp.get("UnprocessedKeys") or {}
+            if pending:
+                attempt += 1
+                if attempt >= max_attempts:
+                    raise RuntimeError("BatchGetItem left unprocessed keys")
+                time.sleep(min(0.05 * (2 ** attempt), 1.0))
+    return out
+
+
+class BatchWriteError(RuntimeError):
+    """
+    A batch write that stopped partway. `applied` holds the (PK, SK) of the
+    requests that landed, `unknown` those of a BatchWriteItem call that
+    raised, which may or may not have.
+    """
+
+    def __init__(self, message, applied, unknown=()):
+        super().__init__(message)
+        self.applied = list(applied)
+        self.unknown = list(unknown)
+
+
+def _request_key(request):
+    key = request["PutRequest"]["Item"] if "PutRequest" in request else request["DeleteRequest"]["Key"]
+    return key["PK"]["S"], key["SK"]["S"]
+
+
+def _batch_write(client, table_name, requests, workers, max_attempts):
+    """BatchWriteItem in chunks of 25; returns the keys written, raises BatchWriteError."""
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+
+    def write(chunk):
+        pending, applied, attempt = chunk, [], 0
+        while pending:
+            try:
+                resp = client.batch_write_item(RequestItems={table_name: pending})
+            except Exception as e:
+                raise BatchWriteError(str(e), applied, [_request_key(r) for r in pending]) from e
+            left = (resp.get("UnprocessedItems") or {}).get(table_name) or []
+            unprocessed = {_request_key(r) for r in left}
+            applied += [k for k in map(_request_key, pending) if k not in unprocessed]
+            pending = left
+            if pending:
+                attempt += 1
+                if attempt >= max_attempts:
+                    raise BatchWriteError("BatchWriteItem left unprocessed items", applied)
+                time.sleep(min(0.05 * (2 ** attempt), 1.0))
+        return applied
+
+    chunks = [requests[i:i + 25] for i in range(0, len(requests), 25)]
+    applied = []
+    if workers <= 1 or len(chunks) <= 1:
+        for chunk in chunks:
+            try:
+                applied += write(chunk)
+            except BatchWriteError as e:
+                raise BatchWriteError(str(e), applied + e.applied, e.unknown) from e
+        return applied
+    with ThreadPoolExecutor(max_workers=min(workers, len(chunks))) as pool:
+        futures = [pool.submit(write, chunk) for chunk in chunks]
+    unknown, error = [], None
+    for fut in futures:
+        try:
+            applied += fut.result()
+        except BatchWriteError as e:
+            applied += e.applied
+            unknown += e.unknown
+            error = error or e
+    if error:
+        raise BatchWriteError(str(error), applied, unknown) from error
+    return applied
+
+
+def batch_write_items(client, table_name, items, workers=1, max_attempts=8):
+    """
+    Put raw rows with BatchWriteItem in chunks of 25, up to `workers` chunks
+    in flight, retrying UnprocessedItems with backoff. Returns the number
+    of rows written. Once a chunk fails, or still has unprocessed rows
+    after max_attempts, raises BatchWriteError after the other chunks
+    finish; it tells the caller which rows are (or may be) live.
+    """
+    requests = [{"PutRequest": {"Item": row}} for row in items]
+    return len(_batch_write(client, table_name, requests, workers, max_attempts))
+
+
+def batch_delete_items(client, table_name, keys, workers=1, max_attempts=8):
+    """Delete (PK, SK) keys the same way; returns how many were deleted."""
+    requests = [{"DeleteRequest": {"Key": {"PK": {"S": pk}, "SK": {"S": sk}}}} for pk, sk in keys]
+    return len(_batch_write(client, table_name, requests, workers, max_attempts))
@@ -0,0 +1,572 @@
+"""
+Local stand-ins for the AWS services the export handlers talk to, so they
+can run without network access.
+
+DirectoryS3 implements the subset of the S3 client API the handlers use
+(including ListObjectsV2 pages, DeleteObjects and conditional puts),
+storing each object as a file under a root directory; MemoryS3 keeps
+objects in a dict. MemoryDynamoDB is a single-table, in-process DynamoDB
+with the Query semantics the handlers rely on: key conditions on the table
+or a GSI, 1 MB pages with LastEvaluatedKey, FilterExpression applied after
+the page is read, and projections. FakeContext stands in for the Lambda
+context object when exercising checkpointed exports.
+"""
+import bisect
+import hashlib
+import io
+import json
+import os
+import re
+import time
+
+from botocore.exceptions import ClientError
+
+
+def _not_found(op, key):
+    return ClientError(
+        {"Error": {"Code": "NoSuchKey", "Message": f"{key} not found"},
+         "ResponseMetadata": {"HTTPStatusCode": 404}},
+        op,
+    )
+
+
+def _precondition_failed(key):
+    return ClientError(
+        {"Error": {"Code": "PreconditionFailed", "Message": f"{key}: At least one of the pre-conditions you specified did not hold"},
+         "ResponseMetadata": {"HTTPStatusCode": 412}},
+        "PutObject",
+    )
+
+
+def _etag(data):
+    return f'"{hashlib.md5(data).hexdigest()}"'
+
+
+def _check_conditions(key, current_etag, IfMatch=None, IfNoneMatch=None, **_):
+    """PutObject's conditional writes: If-Match against the current ETag, If-None-Match: * for create-only."""
+    if IfNoneMatch == "*" and current_etag is not None:
+        raise _precondition_failed(key)
+    if IfMatch is not None and IfMatch != current_etag:
+        raise _precondition_failed(key)
+
+
+def _delete_objects(delete_one, Delete):
+    deleted = []
+    for obj in Delete.get("Objects", []):
+        delete_one(obj["Key"])
+        deleted.append({"Key": obj["Key"]})
+    return {} if Delete.get("Quiet") else {"Deleted": deleted}
+
+
+def _list_page(keys, Prefix="", Delimiter=None, ContinuationToken=None, StartAfter=None, MaxKeys=1000):
+    """ListObjectsV2 over an iterable of (key, size) pairs: sorted, paginated, optional delimiter."""
+    after = ContinuationToken or StartAfter or ""
+    contents, prefixes, last = [], [], None
+    for key, size in sorted(keys):
+        if not key.startswith(Prefix) or key <= after:
+            continue
+        if Delimiter:
+            cut = key.find(Delimiter, len(Prefix))
+            if cut >= 0:
+                common = key[:cut + len(Delimiter)]
+                if prefixes and prefixes[-1]["Prefix"] == common:
+                    continue
+                if common <= after:
+                    continue
+                if len(contents) + len(prefixes) == MaxKeys:
+                    break
+                prefixes.append({"Prefix": common})
+                # Resume after every key under this common prefix.
+                last = common + "\U0010ffff"
+                continue
+        if len(contents) + len(prefixes) == MaxKeys:
+            break
+        contents.append({"Key": key, "Size": size})
+        last = key
+    else:
+        last = None
+    out = {"KeyCount": len(contents) + len(prefixes), "IsTruncated": last is not None, "Prefix": Prefix}
+    if contents:
+        out["Contents"] = contents
+    if prefixes:
+        out["CommonPrefixes"] = prefixes
+    if last is not None:
+        out["NextContinuationToken"] = last
+    return out
+
+
+class DirectoryS3:
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+
+    def _path(self, bucket, key):
+        path = os.path.abspath(os.path.join(self.root, bucket, key))
+        if not path.startswith(self.root + os.sep):
+            raise ValueError(f"key escapes bucket root: {key}")
+        return path
+
+    def put_object(self, Bucket, Key, Body, Metadata=None, **extra):
+        path = self._path(Bucket, Key)
+        if "IfMatch" in extra or "IfNoneMatch" in extra:
+            current = None
+            if os.path.isfile(path):
+                with open(path, "rb") as f:
+                    current = _etag(f.read())
+            _check_conditions(Key, current, **extra)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = Body if isinstance(Body, (bytes, bytearray)) else Body.read()
+        tmp = path + ".part"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        headers = {k: v for k, v in extra.items() if k in ("ContentType", "ContentEncoding")}
+        etag = _etag(data)
+        with open(path + ".meta", "w") as f:
+            json.dump({"Metadata": Metadata or {}, "ETag": etag, **headers}, f)
+        return {"ETag": etag}
+
+    def _meta(self, path):
+        try:
+            with open(path + ".meta") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"Metadata": {}}
+
+    def head_object(self, Bucket, Key, **_):
+        path = self._path(Bucket, Key)
+        if not os.path.isfile(path):
+            raise _not_found("HeadObject", Key)
+        return {"ContentLength": os.path.getsize(path), **self._meta(path)}
+
+    def get_object(self, Bucket, Key, **_):
+        path = self._path(Bucket, Key)
+        if not os.path.isfile(path):
+            raise _not_found("GetObject", Key)
+        with open(path, "rb") as f:
+            data = f.read()
+        return {"Body": io.BytesIO(data), "ContentLength": len(data), **self._meta(path), "ETag": _etag(data)}
+
+    def delete_object(self, Bucket, Key, **_):
+        path = self._path(Bucket, Key)
+        for p in (path, path + ".meta"):
+            try:
+                os.remove(p)
+            except FileNotFoundError:
+                pass
+        return {}
+
+    def delete_objects(self, Bucket, Delete, **_):
+        return _delete_objects(lambda key: self.delete_object(Bucket, key), Delete)
+
+    def list_objects_v2(self, Bucket, Prefix="", **kwargs):
+        base = os.path.join(self.root, Bucket)
+        # Only walk the directory the prefix lives in.
+        start = os.path.join(base, os.path.dirname(Prefix))
+
+        def keys():
+            for dirpath, _, files in os.walk(start):
+                for name in files:
+                    if name.endswith((".meta", ".part")):
+                        continue
+                    path = os.path.join(dirpath, name)
+                    yield os.path.relpath(path, base).replace(os.sep, "/"), os.path.getsize(path)
+
+        return _list_page(keys(), Prefix, **kwargs)
+
+    def generate_presigned_url(self, ClientMethod, Params=None, ExpiresIn=3600, **_):
+        return "file://" + self._path(Params["Bucket"], Params["Key"])
+
+
+class MemoryS3:
+    def __init__(self):
+        self.objects = {}
+
+    def put_object(self, Bucket, Key, Body, Metadata=None, **extra):
+        if "IfMatch" in extra or "IfNoneMatch" in extra:
+            current = self.objects.get((Bucket, Key))
+            _check_conditions(Key, current[1]["ETag"] if current else None, **extra)
+        data = bytes(Body if isinstance(Body, (bytes, bytearray)) else Body.read())
+        headers = {k: v for k, v in extra.items() if k in ("ContentType", "ContentEncoding")}
+        etag = _etag(data)
+        self.objects[(Bucket, Key)] = (data, {"Metadata": dict(Metadata or {}), "ETag": etag, **headers})
+        return {"ETag": etag}
+
+    def head_object(self, Bucket, Key, **_):
+        if (Bucket, Key) not in self.objects:
+            raise _not_found("HeadObject", Key)
+        data, meta = self.objects[(Bucket, Key)]
+        return {"ContentLength": len(data), **meta}
+
+    def get_object(self, Bucket, Key, **_):
+        if (Bucket, Key) not in self.objects:
+            raise _not_found("GetObject", Key)
+        data, meta = self.objects[(Bucket, Key)]
+        return {"Body": io.BytesIO(data), "ContentLength": len(data), **meta}
+
+    def delete_object(self, Bucket, Key, **_):
+        self.objects.pop((Bucket, Key), None)
+        return {}
+
+    def delete_objects(self, Bucket, Delete, **_):
+        return _delete_objects(lambda key: self.delete_object(Bucket, key), Delete)
+
+    def list_objects_v2(self, Bucket, Prefix="", **kwargs):
+        keys = ((k, len(data)) for (b, k), (data, _) in self.objects.items() if b == Bucket)
+        return _list_page(keys, Prefix, **kwargs)
+
+    def generate_presigned_url(self, ClientMethod, Params=None, ExpiresIn=3600, **_):
+        return f"memory://{Params['Bucket']}/{Params['Key']}"
+
+
+class FakeContext:
+    """Lambda context whose remaining time counts down from timeout_ms."""
+
+    def __init__(self, timeout_ms=60000, function_name="local-export"):
+        self.function_name = function_name
+        self.aws_request_id = "local"
+        self._deadline = time.monotonic() + timeout_ms / 1000.0
+
+    def get_remaining_time_in_millis(self):
+        return max(0, int((self._deadline - time.monotonic()) * 1000))
+
+
+PAGE_BYTES = 1024 * 1024
+
+_TYPES = ("S", "N", "B", "BOOL", "NULL", "M", "L", "SS", "NS", "BS")
+
+_CONDITION = re.compile(
+    r"^\s*(?:begins_with\(\s*(?P<bw_attr>[#\w]+)\s*,\s*(?P<bw_val>:\w+)\s*\)"
+    r"|(?P<fn>attribute_exists|attribute_not_exists)\(\s*(?P<fn_attr>[#\w]+)\s*\)"
+    r"|(?P<attr>[#\w]+)\s*(?:(?P<op>=|<>|<=|>=|<|>)\s*(?P<val>:\w+)"
+    r"|BETWEEN\s+(?P<lo>:\w+)\s+AND\s+(?P<hi>:\w+)))\s*$",
+    re.IGNORECASE,
+)
+
+
+def _value_size(v):
+    (t, x), = v.items()
+    if t in ("S", "B"):
+        return len(x.encode("utf-8")) if isinstance(x, str) else len(x)
+    if t == "N":
+        return len(x) // 2 + 1
+    if t in ("BOOL", "NULL"):
+        return 1
+    if t == "L":
+        return 3 + sum(1 + _value_size(e) for e in x)
+    if t == "M":
+        return 3 + sum(1 + len(k) + _value_size(e) for k, e in x.items())
+    return sum(len(str(e)) for e in x)
+
+
+def item_size(item):
+    """Approximate DynamoDB item size in bytes (attribute names + values)."""
+    return sum(len(k) + _value_size(v) for k, v in item.items())
+
+
+def _scalar(v):
+    (t, x), = v.items()
+    return float(x) if t == "N" else x
+
+
+def to_wire(value):
+    """Plain JSON value -> DynamoDB attribute value."""
+    if value is None:
+        return {"NULL": True}
+    if isinstance(value, bool):
+        return {"BOOL": value}
+    if isinstance(value, (int, float)):
+        return {"N": str(value)}
+    if isinstance(value, str):
+        return {"S": value}
+    if isinstance(value, list):
+        return {"L": [to_wire(v) for v in value]}
+    if isinstance(value, dict):
+        return {"M": {k: to_wire(v) for k, v in value.items()}}
+    raise TypeError(f"unsupported value: {value!r}")
+
+
+def _is_wire(item):
+    return all(isinstance(v, dict) and len(v) == 1 and next(iter(v)) in _TYPES for v in item.values())
+
+
+def _split_and(expr):
+    """Split on top-level AND, leaving BETWEEN x AND y intact."""
+    parts, cur = [], []
+    tokens = re.split(r"\s+(AND)\s+", expr.strip(), flags=re.IGNORECASE)
+    between = False
+    for tok in tokens:
+        if tok.upper() == "AND" and not between:
+            parts.append(" ".join(cur))
+            cur = []
+            continue
+        if tok.upper() == "AND":
+            between = False
+        elif re.search(r"\bBETWEEN\s+:\w+$", tok, re.IGNORECASE):
+            between = True
+        cur.append(tok)
+    parts.append(" ".join(cur))
+    return parts
+
+
+def _compile(expr, names, values):
+    """Compile an AND of simple conditions into [(attr, op, operands, predicate)]."""
+    out = []
+    for part in _split_and(expr):
+        m = _CONDITION.match(part)
+        if not m:
+            raise ValueError(f"unsupported expression: {part!r}")
+        if m.group("fn"):
+            attr = names.get(m.group("fn_attr"), m.group("fn_attr"))
+            exists = m.group("fn").lower() == "attribute_exists"
+            out.append((attr, m.group("fn").lower(), (), lambda x, e=exists: (x is not None) == e))
+            continue
+        if m.group("bw_attr"):
+            attr = names.get(m.group("bw_attr"), m.group("bw_attr"))
+            prefix = _scalar(values[m.group("bw_val")])
+            out.append((attr, "begins_with", (prefix,),
+                        lambda x, p=prefix: isinstance(x, str) and x.startswith(p)))
+            continue
+        attr = names.get(m.group("attr"), m.group("attr"))
+        if m.group("lo"):
+            lo, hi = _scalar(values[m.group("lo")]), _scalar(values[m.group("hi")])
+            out.append((attr, "between", (lo, hi),
+                        lambda x, lo=lo, hi=hi: x is not None and lo <= x <= hi))
+            continue
+        ref = _scalar(values[m.group("val")])
+        op = m.group("op")
+        pred = {
+            "=": lambda x, r=ref: x == r,
+            "<>": lambda x, r=ref: x != r,
+            "<": lambda x, r=ref: x is not None and x < r,
+            "<=": lambda x, r=ref: x is not None and x <= r,
+            ">": lambda x, r=ref: x is not None and x > r,
+            ">=": lambda x, r=ref: x is not None and x >= r,
+        }[op]
+        out.append((attr, op, (ref,), pred))
+    return out
+
+
+def _matches(item, conditions):
+    for attr, _, _, pred in conditions:
+        v = item.get(attr)
+        if not pred(_scalar(v) if v is not None else None):
+            return False
+    return True
+
+
+def _range_bounds(rows, lo, hi, cond):
+    """Narrow rows[lo:hi] (one partition, sorted by range key) to a key condition."""
+    if cond is None:
+        return lo, hi
+    _, op, refs, _ = cond
+    rkey = lambda e: e[0][1]  # noqa: E731
+    if op == "begins_with":
+        prefix = refs[0]
+        start = bisect.bisect_left(rows, prefix, lo, hi, key=rkey)
+        if not prefix:
+            return start, hi
+        # Every string with this prefix sorts below the prefix with its last character bumped.
+        upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+        return start, bisect.bisect_left(rows, upper, start, hi, key=rkey)
+    if op == "between":
+        return (bisect.bisect_left(rows, refs[0], lo, hi, key=rkey),
+                bisect.bisect_right(rows, refs[1], lo, hi, key=rkey))
+    ref = refs[0]
+    if op == "=":
+        return bisect.bisect_left(rows, ref, lo, hi, key=rkey), bisect.bisect_right(rows, ref, lo, hi, key=rkey)
+    if op == ">":
+        return bisect.bisect_right(rows, ref, lo, hi, key=rkey), hi
+    if op == ">=":
+        return bisect.bisect_left(rows, ref, lo, hi, key=rkey), hi
+    if op == "<":
+        return lo, bisect.bisect_left(rows, ref, lo, hi, key=rkey)
+    if op == "<=":
+        return lo, bisect.bisect_right(rows, ref, lo, hi, key=rkey)
+    raise ValueError(f"unsupported key condition operator: {op}")
+
+
+def _project(item, projection, names):
+    if not projection:
+        return item
+    attrs = [names.get(a.strip(), a.strip()) for a in projection.split(",")]
+    return {a: item[a] for a in attrs if a in item}
+
+
+class MemoryDynamoDB:
+    """
+    In-process single-table DynamoDB. `indexes` maps GSI name to its
+    (hash, range) attribute names; items missing either are not indexed.
+    """
+
+    def __init__(self, hash_key="PK", range_key="SK", indexes=None, page_bytes=PAGE_BYTES):
+        self.keys = (hash_key, range_key)
+        self.indexes = dict(indexes or {"GSI_TeamItemsByUpdatedAt": ("teamId", "updatedAt")})
+        self.page_bytes = page_bytes
+        self.items = {}
+        self._sorted = {}
+        self.calls = 0
+
+    @classmethod
+    def from_json(cls, path, **kwargs):
+        """Load a JSON list of items, either plain values or DynamoDB attribute maps."""
+        with open(path) as f:
+            rows = json.load(f)
+        return cls(**kwargs).load(rows)
+
+    def load(self, rows):
+        for row in rows:
+            self._put(row if _is_wire(row) else {k: to_wire(v) for k, v in row.items()})
+        return self
+
+    def _key(self, item):
+        h, r = self.keys
+        return (item[h]["S"], item[r]["S"])
+
+    def _put(self, item):
+        self.items[self._key(item)] = item
+        self._sorted.clear()
+
+    def _ordered(self, index):
+        """[(sort_key, item, size)] sorted for the table or a GSI, cached until the next write."""
+        rows = self._sorted.get(index)
+        if rows is None:
+            if index is None:
+                h, r = self.keys
+            else:
+                h, r = self.indexes[index]
+            rows = []
+            for (pk, sk), item in self.items.items():
+                if h in item and r in item:
+                    rows.append(((_scalar(item[h]), _scalar(item[r]), pk, sk), item, item_size(item)))
+            rows.sort(key=lambda e: e[0])
+            self._sorted[index] = rows
+        return rows
+
+    def query(self, TableName, KeyConditionExpression, ExpressionAttributeValues,
+              ExpressionAttributeNames=None, IndexName=None, FilterExpression=None,
+              ProjectionExpression=None, ExclusiveStartKey=None, Limit=None,
+              ScanIndexForward=True, **_):
+        self.calls += 1
+        names = ExpressionAttributeNames or {}
+        values = ExpressionAttributeValues
+        h, r = self.indexes[IndexName] if IndexName else self.keys
+        conditions = _compile(KeyConditionExpression, names, values)
+        hash_cond = next((c for c in conditions if c[0] == h and c[1] == "="), None)
+        if hash_cond is None or len(conditions) > 2:
+            raise ValueError("KeyConditionExpression must be `hash = :v [AND range condition]`")
+        range_cond = next((c for c in conditions if c is not hash_cond), None)
+        if range_cond is not None and range_cond[0] != r:
+            raise ValueError(f"key condition on non-key attribute {range_cond[0]}")
+        filters = _compile(FilterExpression, names, values) if FilterExpression else []
+
+        rows = self._ordered(IndexName)
+        hv = hash_cond[2][0]
+        lo = bisect.bisect_left(rows, hv, key=lambda e: e[0][0])
+        hi = bisect.bisect_right(rows, hv, key=lambda e: e[0][0])
+        lo, hi = _range_bounds(rows, lo, hi, range_cond)
+
+        if ExclusiveStartKey:
+            esk = ExclusiveStartKey
+            pos = (_scalar(esk[h]), _scalar(esk[r]), esk[self.keys[0]]["S"], esk[self.keys[1]]["S"])
+            if ScanIndexForward:
+                lo = max(lo, bisect.bisect_right(rows, pos, lo, hi, key=lambda e: e[0]))
+            else:
+                hi = min(hi, bisect.bisect_left(rows, pos, lo, hi, key=lambda e: e[0]))
+        order = range(lo, hi) if ScanIndexForward else range(hi - 1, lo - 1, -1)
+
+        page, size, scanned, last = [], 0, 0, None
+        for i in order:
+            _, item, item_bytes = rows[i]
+            if scanned and size + item_bytes > self.page_bytes:
+                break
+            size += item_bytes
+            scanned += 1
+            last = item
+            if _matches(item, filters):
+                page.append(_project(item, ProjectionExpression, names))
+            if Limit and scanned >= Limit:
+                break
+        else:
+            last = None
+        if last is not None and last is rows[order[-1]][1]:
+            # The page ended exactly at the end of the key range.
+            last = None
+
+        resp = {"Items": page, "Count": len(page), "ScannedCount": scanned}
+        if last is not None:
+            lek = {self.keys[0]: last[self.keys[0]], self.keys[1]: last[self.keys[1]]}
+            if IndexName:
+                lek.update({h: last[h], r: last[r]})
+            resp["LastEvaluatedKey"] = lek
+        return resp
+
+    def get_item(self, TableName, Key, ProjectionExpression=None, ExpressionAttributeNames=None, **_):
+        self.calls += 1
+        item = self.items.get(self._key(Key))
+        if item is None:
+            return {}
+        return {"Item": _project(item, ProjectionExpression, ExpressionAttributeNames or {})}
+
+    def put_item(self, TableName, Item, **_):
+        self.calls += 1
+        self._put(Item)
+        return {}
+
+    def delete_item(self, TableName, Key, **_):
+        self.calls += 1
+        if self.items.pop(self._key(Key), None) is not None:
+            self._sorted.clear()
+        return {}
+
+    def update_item(self, TableName, Key, UpdateExpression, ExpressionAttributeValues=None,
+                    ExpressionAttributeNames=None, ConditionExpression=None, **_):
+        """SET a = :v[, b = :w] or ADD n :v only, on an existing item or a new one from the key."""
+        self.calls += 1
+        names, values = ExpressionAttributeNames or {}, ExpressionAttributeValues or {}
+        item = self.items.get(self._key(Key))
+        if ConditionExpression and not _matches(item or {}, _compile(ConditionExpression, names, values)):
+            raise ClientError(
+                {"Error": {"Code": "ConditionalCheckFailedException",
+                           "Message": "The conditional request failed"},
+                 "ResponseMetadata": {"HTTPStatusCode": 400}},
+                "UpdateItem",
+            )
+        item = dict(item or Key)
+        m = re.match(r"^\s*ADD\s+(\S+)\s+(:\w+)\s*$", UpdateExpression, re.IGNORECASE)
+        if m:
+            attr = names.get(m.group(1), m.group(1))
+            total = float((item.get(attr) or {}).get("N", 0)) + float(values[m.group(2)]["N"])
+            item[attr] = {"N": str(int(total) if total.is_integer() else total)}
+            self._put(item)
+            return {}
+        m = re.match(r"^\s*SET\s+(.+)$", UpdateExpression, re.IGNORECASE)
+        if not m:
+            raise ValueError(f"unsupported update expression: {UpdateExpression!r}")
+        for assignment in m.group(1).split(","):
+            attr, _, ref = (s.strip() for s in assignment.partition("="))
+            item[names.get(attr, attr)] = values[ref]
+        self._put(item)
+        return {}
+
+    def batch_get_item(self, RequestItems):
+        self.calls += 1
+        responses = {}
+        for table, request in RequestItems.items():
+            names = request.get("ExpressionAttributeNames") or {}
+            out = responses.setdefault(table, [])
+            for key in request["Keys"]:
+                item = self.items.get(self._key(key))
+                if item is not None:
+                    out.append(_project(item, request.get("ProjectionExpression"), names))
+        return {"Responses": responses, "UnprocessedKeys": {}}
+
+    def batch_write_item(self, RequestItems):
+        self.calls += 1
+        for requests in RequestItems.values():
+            for req in requests:
+                if "PutRequest" in req:
+                    self._put(req["PutRequest"]["Item"])
+                else:
+                    self.items.pop(self._key(req["DeleteRequest"]["Key"]), None)
+                    self._sorted.clear()
+        return {"UnprocessedItems": {}}
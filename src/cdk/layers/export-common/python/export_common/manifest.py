@@ -0,0 +1,177 @@
+"""
+Per-team index of export artifacts, Documents/<teamId>/manifest.json:
+
+    {"artifacts": {"<key>": {"slot", "token", "createdAt", "bytes"}}}
+
+A slot is one kind of export ("2404", "2404-evidence", "inventory-csv",
+...); its key carries the team name, so a rename moves the slot to a new
+key. The handlers read the manifest instead of HEADing the artifact: an
+entry with the request's token means the object can be presigned as-is.
+Keys the manifest doesn't know yet (written before it existed) fall back
+to the object's own export-token metadata.
+
+The bucket's expire-generated-documents rule deletes Documents/ objects
+LIFECYCLE_DAYS after they were written, whatever the manifest says, and
+the manifest itself is rewritten by other slots, so it can outlive an
+artifact. An entry is therefore only trusted while it is younger than
+RETENTION_DAYS, which is kept at least a day under the rule; an older one
+is stale and gets re-rendered.
+
+After an upload, record() adds the artifact and applies retention in the
+same write: other keys in its slot are superseded, and entries older than
+EXPORT_RETENTION_DAYS (default, and at most, LIFECYCLE_DAYS - 1) have
+expired. The
+manifest is written first, then those objects go in one DeleteObjects
+request, so nothing is listed and an entry never points at a deleted
+object. The 2404 and inventory exports run in parallel, so the write is
+conditional on the ETag that was read (If-None-Match when there was no
+manifest) and is retried against a fresh copy on a conflict. Objects the
+manifest never recorded (inventory forms, checkpoints) are left alone.
+"""
+import json
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+
+from botocore.exceptions import ClientError
+
+from .tracing import NULL_TRACE
+from .versioning import is_fresh
+
+# expire-generated-documents in lib/s3-stack.ts.
+LIFECYCLE_DAYS = 30
+# 0 used to mean "keep everything"; the lifecycle rule bounds that anyway.
+RETENTION_DAYS = min(float(os.environ.get("EXPORT_RETENTION_DAYS", "0") or 0) or LIFECYCLE_DAYS - 1,
+                     LIFECYCLE_DAYS - 1)
+MAX_ATTEMPTS = 5
+# DeleteObjects takes up to 1,000 keys per request.
+DELETE_BATCH = 1000
+
+_CONFLICT = ("PreconditionFailed", "ConditionalRequestConflict")
+
+
+def manifest_key(team_id):
+    return f"Documents/{team_id}/manifest.json"
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+def _iso(ts):
+    return ts.isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+
+def _parse(value):
+    try:
+        return datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+
+
+class Manifest:
+    def __init__(self, s3, bucket, team_id, artifacts=None, etag=None):
+        self.s3 = s3
+        self.bucket = bucket
+        self.team_id = team_id
+        self.artifacts = artifacts or {}
+        self.etag = etag
+
+    @classmethod
+    def load(cls, s3, bucket, team_id):
+        """The team's manifest; an empty one when there is none or it can't be read."""
+        try:
+            resp = s3.get_object(Bucket=bucket, Key=manifest_key(team_id))
+        except Exception:
+            return cls(s3, bucket, team_id)
+        try:
+            artifacts = json.loads(resp["Body"].read()).get("artifacts") or {}
+        except ValueError:
+            # Overwritten (conditionally, against this ETag) on the next record().
+            artifacts = {}
+        return cls(s3, bucket, team_id, artifacts, resp.get("ETag"))
+
+    def is_fresh(self, key, token):
+        entry = self.artifacts.get(key)
+        created = _parse(entry.get("createdAt")) if entry else None
+        if created is None:
+            # Unknown key, or an entry without a usable date: ask the object.
+            return is_fresh(self.s3, self.bucket, key, token)
+        if created < _now() - timedelta(days=RETENTION_DAYS):
+            # Expired, or about to be by the lifecycle rule.
+            return False
+        return bool(token) and entry.get("token") == token
+
+    def _retire(self, key, slot, now):
+        cutoff = now - timedelta(days=RETENTION_DAYS)
+        retired = []
+        for other, entry in self.artifacts.items():
+            if other == key:
+                continue
+            created = _parse(entry.get("createdAt"))
+            if entry.get("slot") == slot or (created and created < cutoff):
+                retired.append(other)
+        return retired
+
+    def _put(self):
+        params = {
+            "Bucket": self.bucket,
+            "Key": manifest_key(self.team_id),
+            "Body": json.dumps({"artifacts": self.artifacts}, sort_keys=True).encode("utf-8"),
+            "ContentType": "application/json",
+        }
+        if self.etag:
+            params["IfMatch"] = self.etag
+        else:
+            params["IfNoneMatch"] = "*"
+        kms = os.environ.get("KMS_KEY_ARN", "").strip()
+        if kms:
+            params["ServerSideEncryption"] = "aws:kms"
+            params["SSEKMSKeyId"] = kms
+        self.etag = self.s3.put_object(**params).get("ETag")
+
+    def record(self, key, slot, token, size, trace=NULL_TRACE):
+        """
+        Adds an uploaded artifact, retires superseded and expired ones and
+        deletes their objects. Returns the deleted keys. Never raises: a
+        failed update only leaves the old objects in place until the next one.
+        """
+        for attempt in range(MAX_ATTEMPTS):
+            now = _now()
+            retired = self._retire(key, slot, now)
+            previous = dict(self.artifacts)
+            for other in retired:
+                del self.artifacts[other]
+            self.artifacts[key] = {"slot": slot, "token": token, "createdAt": _iso(now), "bytes": size}
+            try:
+                self._put()
+                break
+            except ClientError as e:
+                if e.response.get("Error", {}).get("Code") not in _CONFLICT:
+                    sys.stderr.write(f"manifest for {self.team_id} not written: {e}\n")
+                    self.artifacts = previous
+                    return []
+                trace.count("manifest_conflicts")
+                fresh = Manifest.load(self.s3, self.bucket, self.team_id)
+                self.artifacts, self.etag = fresh.artifacts, fresh.etag
+            except Exception as e:
+                sys.stderr.write(f"manifest for {self.team_id} not written: {e}\n")
+                self.artifacts = previous
+                return []
+        else:
+            sys.stderr.write(f"manifest for {self.team_id} not written after {MAX_ATTEMPTS} attempts\n")
+            return []
+
+        deleted = []
+        for i in range(0, len(retired), DELETE_BATCH):
+            batch = retired[i:i + DELETE_BATCH]
+            try:
+                resp = self.s3.delete_objects(
+                    Bucket=self.bucket, Delete={"Objects": [{"Key": k} for k in batch], "Quiet": True})
+            except Exception as e:
+                sys.stderr.write(f"retention delete for {self.team_id} failed: {e}\n")
+                continue
+            failed = {err.get("Key") for err in resp.get("Errors") or []}
+            deleted += [k for k in batch if k not in failed]
+        trace.count("retention_deleted", len(deleted))
+        return deleted
@@ -0,0 +1,103 @@
+"""
+Memory budget for exports that build large artifacts.
+
+The 2404 export renders damaged items in chunks and flushes each chunk to
+a part file in /tmp before starting the next one. ChunkPlanner sizes each
+chunk from the container's current RSS and the growth measured on the
+chunks rendered so far, so the export stays under the budget instead of
+needing a bigger function:
+
+  EXPORT_RSS_BUDGET_MB        explicit budget (MB)
+  (otherwise)                 MEMORY_FRACTION of the function's memorySize
+                              (AWS_LAMBDA_FUNCTION_MEMORY_SIZE), or
+                              DEFAULT_BUDGET_MB outside Lambda
+
+RSS does not shrink much when Python frees a chunk, so the estimate errs
+toward smaller chunks; the floor is one item per chunk.
+"""
+import os
+import resource
+
+DEFAULT_BUDGET_MB = 1024.0
+MEMORY_FRACTION = 0.6
+
+
+def rss_mb():
+    """Current resident set size (MB); peak RSS where /proc is unavailable."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1048576.0
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def budget_mb():
+    explicit = os.environ.get("EXPORT_RSS_BUDGET_MB", "").strip()
+    if explicit:
+        return float(explicit)
+    function_mb = os.environ.get("AWS_LAMBDA_FUNCTION_MEMORY_SIZE", "").strip()
+    if function_mb:
+        return float(function_mb) * MEMORY_FRACTION
+    return DEFAULT_BUDGET_MB
+
+
+class ChunkPlanner:
+    """
+    Split `total` units of work into chunks that fit the memory budget.
+
+        planner = ChunkPlanner(len(items))
+        for start, end in planner:
+            ...render items[start:end] and flush...
+            planner.observe()
+
+    `limit`, if given, is called before each chunk and caps its size (e.g.
+    by the time left in the invocation); a cap of 0 ends the iteration
+    early, with planner.done units processed.
+    """
+
+    def __init__(self, total, budget=None, first=8, min_chunk=1, max_chunk=200, unit_mb=2.0, limit=None):
+        self.total = total
+        self.budget = budget if budget is not None else budget_mb()
+        self.first = first
+        self.min_chunk = min_chunk
+        self.max_chunk = max_chunk
+        # Prior for the per-unit cost until a chunk has been measured.
+        self.unit_mb = unit_mb
+        self.limit = limit
+        self.chunks = 0
+        self.done = 0
+        self.peak = rss_mb()
+        self._start_rss = None
+        self._size = 0
+
+    def next_size(self):
+        if not self.chunks:
+            return max(self.min_chunk, min(self.first, self.max_chunk))
+        room = self.budget - rss_mb()
+        size = int(room / self.unit_mb) if self.unit_mb > 0 else self.max_chunk
+        return max(self.min_chunk, min(size, self.max_chunk))
+
+    def observe(self, rss=None):
+        """Record RSS at the end of the current chunk (before it is freed)."""
+        rss = rss_mb() if rss is None else rss
+        self.peak = max(self.peak, rss)
+        if self._size and rss > self._start_rss:
+            # Keep the largest per-unit growth seen: chunks differ in report length.
+            self.unit_mb = max(self.unit_mb if self.chunks else 0.0,
+                               (rss - self._start_rss) / self._size)
+
+    def __iter__(self):
+        start = 0
+        while start < self.total:
+            self._size = min(self.next_size(), self.total - start)
+            if self.limit is not None:
+                cap = self.limit()
+                if cap is not None:
+                    self._size = min(self._size, cap)
+                    if self._size <= 0:
+                        return
+            self._start_rss = rss_mb()
+            end = start + self._size
+            yield start, end
+            self.chunks += 1
+            self.done = start = end
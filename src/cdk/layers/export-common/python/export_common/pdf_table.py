@@ -0,0 +1,144 @@
+"""
+A reportlab flowable for tables whose column widths and single-line row
+height are known up front.
+
+platypus.Table measures every cell to size its columns and rows (_calc,
+_calcPreliminaryWidths). On every page break it also rebuilds cell and
+style lists for both halves (_splitRows). Both dominate layout time on
+tables with tens of thousands of rows. FixedTable takes the widths and
+row height instead:
+
+  - its height is rows x row_h;
+  - a page break falls after floor(available / row_h) rows;
+  - a split is two views onto the same row list, so nothing is copied;
+  - each page is drawn as one fill, one grid path and one text object.
+
+No cell is ever wrapped. Text longer than its column is clipped with an
+ellipsis. The optional header row is repeated at the top of every split.
+Only reportlab is needed, so import this module from a function that
+ships the PDF layer.
+"""
+from functools import lru_cache
+
+from reportlab.lib import colors
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.platypus.flowables import Flowable
+
+ELLIPSIS = "…"
+
+
+@lru_cache(maxsize=65536)
+def clip(text, width, font, size):
+    """`text` cut (with an ellipsis) to fit `width` points."""
+    if stringWidth(text, font, size) <= width:
+        return text
+    lo, hi = 0, len(text)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if stringWidth(text[:mid] + ELLIPSIS, font, size) <= width:
+            lo = mid
+        else:
+            hi = mid - 1
+    return text[:lo] + ELLIPSIS
+
+
+class FixedTable(Flowable):
+    def __init__(self, rows, col_widths, row_h, header=None, align=None, font="Helvetica",
+                 bold="Helvetica-Bold", size=8, padding=3, grid_width=0.25, grid_color=colors.grey,
+                 header_bg=colors.HexColor("#e6e6e6"), start=0, end=None):
+        Flowable.__init__(self)
+        self.rows = rows
+        self.col_widths = tuple(col_widths)
+        self.row_h = row_h
+        self.header = header
+        self.align = tuple(align or ("LEFT",) * len(self.col_widths))
+        self.font = font
+        self.bold = bold
+        self.size = size
+        self.padding = padding
+        self.grid_width = grid_width
+        self.grid_color = grid_color
+        self.header_bg = header_bg
+        self.start = start
+        self.end = len(rows) if end is None else end
+        self.hAlign = "LEFT"
+
+    def _view(self, start, end):
+        # A fresh instance: platypus leaves per-attempt state (_postponed, canv) on the original.
+        return FixedTable(self.rows, self.col_widths, self.row_h, self.header, self.align, self.font,
+                          self.bold, self.size, self.padding, self.grid_width, self.grid_color,
+                          self.header_bg, start, end)
+
+    def _lines(self):
+        return self.end - self.start + (1 if self.header else 0)
+
+    def wrap(self, availWidth, availHeight):
+        self.width = sum(self.col_widths)
+        self.height = self._lines() * self.row_h
+        return self.width, self.height
+
+    def split(self, availWidth, availHeight):
+        fit = int(availHeight // self.row_h) - (1 if self.header else 0)
+        if fit <= 0 or self.start + fit >= self.end:
+            return []
+        return [self._view(self.start, self.start + fit), self._view(self.start + fit, self.end)]
+
+    def _cells(self, t, row, top, font, ops):
+        # Like Paragraph's "cheap textOut": operators go straight onto the text
+        # object, so nothing is measured twice. `ops` keeps each distinct cell's
+        # (x offset, Tj operator) for the page; inventory columns repeat a lot.
+        code = t._code
+        pad, size = self.padding, self.size
+        # Baseline roughly centred for a cap-height of ~0.7em.
+        y = top - (self.row_h + 0.7 * size) / 2
+        x = 0.0
+        for value, width, align in zip(row, self.col_widths, self.align):
+            if value is not None and value != "":
+                key = (value, width, align, font)
+                op = ops.get(key)
+                if op is None:
+                    text = clip(str(value), width - 2 * pad, font, size)
+                    if align == "LEFT":
+                        dx = pad
+                    else:
+                        w = stringWidth(text, font, size)
+                        dx = width - pad - w if align == "RIGHT" else (width - w) / 2
+                    op = ops[key] = (dx, t._formatText(text))
+                code.append("1 0 0 1 %.2f %.2f Tm %s" % (x + op[0], y, op[1]))
+            x += width
+
+    def draw(self):
+        canv = self.canv
+        width, height, row_h = sum(self.col_widths), self._lines() * self.row_h, self.row_h
+        top = height
+
+        canv.saveState()
+        t = canv.beginText()
+        ops = {}
+        if self.header:
+            canv.setFillColor(self.header_bg)
+            canv.rect(0, top - row_h, width, row_h, stroke=0, fill=1)
+            t.setFont(self.bold, self.size)
+            self._cells(t, self.header, top, self.bold, ops)
+            top -= row_h
+        t.setFont(self.font, self.size)
+        for i in range(self.start, self.end):
+            self._cells(t, self.rows[i], top, self.font, ops)
+            top -= row_h
+
+        path = canv.beginPath()
+        for i in range(self._lines() + 1):
+            path.moveTo(0, i * row_h)
+            path.lineTo(width, i * row_h)
+        x = 0.0
+        for w in (0,) + self.col_widths:
+            x += w
+            path.moveTo(x, 0)
+            path.lineTo(x, height)
+        canv.setLineWidth(self.grid_width)
+        canv.setStrokeColor(self.grid_color)
+        canv.drawPath(path, stroke=1, fill=0)
+
+        canv.setFillColor(colors.black)
+        canv.drawText(t)
+        canv.restoreState()
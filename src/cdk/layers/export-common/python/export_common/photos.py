@@ -0,0 +1,143 @@
+"""
+Item photos prepared for print, for exports that embed them.
+
+fetch(s3, bucket, items, max_px) downloads the photo of each item that
+has one, on up to EXPORT_MAX_WORKERS threads. It prefers the 1024 px
+mediumKey rendition from the images function and otherwise uses the
+original imageKey. It returns {itemId: Photo}. Each photo is scaled to
+fit max_px (the print box at PRINT_DPI) and re-encoded as a baseline
+JPEG, which reportlab embeds as-is (DCTDecode) rather than re-compressing
+the pixels.
+
+Prepared photos stay in a per-container LRU (PHOTO_CACHE_BYTES, default
+64 MB). Renditions are content-addressed, so their key is the cache key.
+The API overwrites originals in place, so those are keyed by imageKey and
+the object's ETag: the imageEtag the API records on upload, or a HEAD for
+items written before it did. Items that share a photo get the same Photo
+object, and drawing it on one canvas embeds it once.
+"""
+import io
+import os
+import sys
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from . import clients
+from .tracing import NULL_TRACE
+
+PRINT_DPI = int(os.environ.get("PHOTO_PRINT_DPI", "150") or 150)
+JPEG_QUALITY = int(os.environ.get("PHOTO_JPEG_QUALITY", "75") or 75)
+
+Photo = namedtuple("Photo", "jpeg width height")
+
+_CACHE = OrderedDict()
+_CACHE_MAX_BYTES = int(os.environ.get("PHOTO_CACHE_BYTES", str(64 * 1024 * 1024)))
+_cache_bytes = 0
+
+
+def max_pixels(box_w_pt, box_h_pt, dpi=PRINT_DPI):
+    """Longest side, in pixels, a photo needs to fill a box of points at dpi."""
+    return int(max(box_w_pt, box_h_pt) * dpi / 72.0)
+
+
+def source(itm):
+    """(S3 key, cache key) for an item's photo, or None. An original without imageEtag has (key, None)."""
+    medium = itm.get("mediumKey")
+    if medium:
+        return medium, medium
+    original = itm.get("imageKey")
+    if original:
+        return original, (original, itm.get("imageEtag"))
+    return None
+
+
+def _resolve_etags(s3, bucket, keys):
+    """{key: ETag} for originals with no recorded imageEtag; unreadable ones map to None."""
+    def head(key):
+        try:
+            return s3.head_object(Bucket=bucket, Key=key).get("ETag")
+        except Exception as e:
+            sys.stderr.write(f"photo {key} head failed: {e}\n")
+            return None
+
+    with ThreadPoolExecutor(max_workers=min(clients.MAX_WORKERS, len(keys))) as pool:
+        return dict(zip(keys, pool.map(head, keys)))
+
+
+def prepare(data, max_px):
+    from PIL import Image, ImageOps
+
+    img = Image.open(io.BytesIO(data))
+    img.draft("RGB", (max_px, max_px))
+    img = ImageOps.exif_transpose(img)
+    if img.mode in ("RGBA", "LA", "PA") or "transparency" in img.info:
+        # JPEG has no alpha; flatten onto the white page.
+        img = img.convert("RGBA")
+        flat = Image.new("RGB", img.size, (255, 255, 255))
+        flat.paste(img, mask=img.getchannel("A"))
+        img = flat
+    elif img.mode != "RGB":
+        img = img.convert("RGB")
+    img.thumbnail((max_px, max_px), Image.Resampling.LANCZOS, reducing_gap=3.0)
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=JPEG_QUALITY, optimize=True)
+    return Photo(buf.getvalue(), img.size[0], img.size[1])
+
+
+def _cache_put(key, photo):
+    global _cache_bytes
+    old = _CACHE.pop(key, None)
+    if old is not None:
+        _cache_bytes -= len(old.jpeg)
+    _CACHE[key] = photo
+    _cache_bytes += len(photo.jpeg)
+    while _cache_bytes > _CACHE_MAX_BYTES and _CACHE:
+        _, old = _CACHE.popitem(last=False)
+        _cache_bytes -= len(old.jpeg)
+
+
+def fetch(s3, bucket, items, max_px, trace=NULL_TRACE):
+    found = [(itm, src) for itm in items for src in (source(itm),) if src]
+    unknown = sorted({key for _, (key, ck) in found if isinstance(ck, tuple) and ck[1] is None})
+    etags = _resolve_etags(s3, bucket, unknown) if unknown else {}
+    if unknown:
+        trace.count("photo_heads", len(unknown))
+
+    wanted = {}
+    for itm, (key, ck) in found:
+        if isinstance(ck, tuple) and ck[1] is None:
+            ck = (key, etags.get(key))
+        wanted.setdefault((ck, max_px), (key, []))[1].append(itm.get("itemId"))
+
+    photos, misses = {}, []
+    for ck, (key, item_ids) in wanted.items():
+        photo = _CACHE.get(ck)
+        if photo is None:
+            misses.append((ck, key))
+            continue
+        _CACHE.move_to_end(ck)
+        trace.count("photo_cache_hits")
+        for item_id in item_ids:
+            photos[item_id] = photo
+
+    def load(key):
+        data = s3.get_object(Bucket=bucket, Key=key)["Body"].read()
+        return len(data), prepare(data, max_px)
+
+    if misses:
+        with ThreadPoolExecutor(max_workers=min(clients.MAX_WORKERS, len(misses))) as pool:
+            futures = [(ck, key, pool.submit(load, key)) for ck, key in misses]
+            for ck, key, fut in futures:
+                try:
+                    size, photo = fut.result()
+                except Exception as e:
+                    # A missing or unreadable photo only drops its evidence page.
+                    sys.stderr.write(f"photo {key} skipped: {e}\n")
+                    trace.count("photo_failures")
+                    continue
+                trace.count("photo_fetches")
+                trace.count("photo_source_bytes", size)
+                _cache_put(ck, photo)
+                for item_id in wanted[ck][1]:
+                    photos[item_id] = photo
+    return photos
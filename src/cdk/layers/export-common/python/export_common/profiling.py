@@ -0,0 +1,148 @@
+"""
+On-demand cProfile / tracemalloc capture for an export invocation.
+
+A run is profiled when the request asks for it (`"profile": true`, or
+`"profile": "memory"` to add tracemalloc) or when EXPORT_PROFILE is set
+("cpu" or "memory") and the invocation is sampled at EXPORT_PROFILE_RATE.
+Either way a container captures at most one profile per
+EXPORT_PROFILE_INTERVAL seconds, so the setting can stay on in prod.
+
+Reports are written to /tmp/profiles; with EXPORT_PROFILE_UPLOAD (or
+`"profileUpload": true`) they are also copied to
+ops/profiles/<teamId>/ in the uploads bucket.
+"""
+import io
+import json
+import os
+import random
+import time
+
+PROFILE_DIR = "/tmp/profiles"
+S3_PREFIX = "ops/profiles"
+
+MODE = os.environ.get("EXPORT_PROFILE", "").strip().lower()
+RATE = float(os.environ.get("EXPORT_PROFILE_RATE", "0.05") or 0)
+INTERVAL_S = float(os.environ.get("EXPORT_PROFILE_INTERVAL", "600") or 0)
+UPLOAD = os.environ.get("EXPORT_PROFILE_UPLOAD", "").strip().lower() in ("1", "true", "yes")
+
+TOP_FUNCTIONS = 40
+TOP_ALLOCATIONS = 30
+
+_last_capture = None
+
+
+def _mode_of(value):
+    if value is True:
+        return "cpu"
+    if isinstance(value, str) and value.strip().lower() in ("cpu", "memory"):
+        return value.strip().lower()
+    return None
+
+
+def requested_mode(payload):
+    """"cpu", "memory" or None for this invocation, after rate limiting."""
+    global _last_capture
+    mode = _mode_of((payload or {}).get("profile"))
+    if mode is None and MODE in ("cpu", "memory") and random.random() < RATE:
+        mode = MODE
+    if mode is None:
+        return None
+    now = time.monotonic()
+    if _last_capture is not None and now - _last_capture < INTERVAL_S:
+        return None
+    _last_capture = now
+    return mode
+
+
+def _stamp():
+    return time.strftime("%Y%m%dT%H%M%SZ", time.gmtime()) + f"-{os.getpid()}"
+
+
+def run(fn, mode, label, out_dir=PROFILE_DIR):
+    """
+    Call fn() under cProfile (plus tracemalloc for mode "memory").
+    Returns (result, paths) where paths are the report files written.
+    """
+    import cProfile
+    import pstats
+    import tracemalloc
+
+    os.makedirs(out_dir, exist_ok=True)
+    base = os.path.join(out_dir, f"{label}-{_stamp()}")
+    memory = mode == "memory"
+    if memory:
+        tracemalloc.start(25)
+    prof = cProfile.Profile()
+    prof.enable()
+    try:
+        result = fn()
+    finally:
+        prof.disable()
+        if memory:
+            snap = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        paths = [base + ".pstats", base + ".txt"]
+        prof.dump_stats(paths[0])
+        out = io.StringIO()
+        pstats.Stats(prof, stream=out).sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+        with open(paths[1], "w") as f:
+            f.write(out.getvalue())
+        if memory:
+            # Blocks still alive when the handler returned (caches, module state);
+            # the peak line covers the transient working set.
+            paths.append(base + ".alloc.txt")
+            with open(paths[2], "w") as f:
+                f.write(f"current {current / 1048576:.1f} MiB, peak {peak / 1048576:.1f} MiB\n\n")
+                for stat in snap.statistics("traceback")[:TOP_ALLOCATIONS]:
+                    f.write(f"{stat.size / 1024:.1f} KiB in {stat.count} blocks\n")
+                    for line in stat.traceback.format(limit=8):
+                        f.write(f"  {line}\n")
+                    f.write("\n")
+    return result, paths
+
+
+def upload(s3, bucket, team_id, paths):
+    """Copy report files to ops/profiles/<teamId>/ and return their keys."""
+    keys = []
+    for path in paths:
+        key = f"{S3_PREFIX}/{team_id}/{os.path.basename(path)}"
+        with open(path, "rb") as f:
+            s3.put_object(Bucket=bucket, Key=key, Body=f.read(),
+                          ContentType="application/octet-stream")
+        keys.append(key)
+    return keys
+
+
+def attach(resp, info):
+    """Add `info` to a JSON response body, or as a header for binary bodies."""
+    if resp.get("isBase64Encoded"):
+        resp["headers"] = dict(resp.get("headers") or {}, **{"X-Export-Profile": json.dumps(info)})
+        return resp
+    try:
+        body = json.loads(resp.get("body") or "{}")
+    except ValueError:
+        return resp
+    if isinstance(body, dict):
+        body["profile"] = info
+        resp["body"] = json.dumps(body)
+    return resp
+
+
+def capture(fn, payload, team_id, label, s3=None, bucket=None):
+    """
+    Run fn() (which returns a handler response), profiling it when
+    requested_mode() says so, and report where the files went.
+    `s3` is a zero-argument client factory used for the optional upload.
+    """
+    mode = requested_mode(payload)
+    if mode is None:
+        return fn()
+    resp, paths = run(fn, mode, label)
+    info = {"mode": mode, "files": paths}
+    if bucket and s3 and (UPLOAD or (payload or {}).get("profileUpload")):
+        try:
+            info["keys"] = upload(s3(), bucket, team_id, paths)
+        except Exception as e:
+            info["uploadError"] = str(e)
+    return attach(resp, info)
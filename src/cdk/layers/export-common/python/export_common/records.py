@@ -0,0 +1,102 @@
+"""
+Schema-aware decoding of raw DynamoDB AttributeValue rows.
+
+The exporters only read a handful of attributes, so rows are mapped straight
+from the wire format into slotted records instead of going through
+TypeDeserializer (which builds a Decimal for every number and keeps every
+attribute, including updateLog).
+"""
+
+
+def _str(av):
+    v = av.get("S")
+    if v is not None:
+        return v
+    return av.get("N")
+
+
+def _int(av):
+    n = av.get("N")
+    if n is None:
+        s = av.get("S")
+        if s is None:
+            return None
+        n = s.strip()
+    try:
+        return int(n)
+    except ValueError:
+        try:
+            return float(n)
+        except ValueError:
+            return None
+
+
+def _str_list(av):
+    lst = av.get("L")
+    if lst is not None:
+        return [v["S"] for v in lst if "S" in v]
+    return av.get("S")
+
+
+ITEM_FIELDS = (
+    ("itemId", _str),
+    ("parent", _str),
+    ("status", _str),
+    ("name", _str),
+    ("actualName", _str),
+    ("description", _str),
+    ("nsn", _str),
+    ("serialNumber", _str),
+    ("authQuantity", _int),
+    ("ohQuantity", _int),
+    ("endItemNiin", _str),
+    ("liin", _str),
+    ("damageReports", _str_list),
+    ("imageKey", _str),
+    ("mediumKey", _str),
+    ("imageEtag", _str),
+    ("updatedAt", _str),
+)
+
+
+class ItemRecord:
+    """Exportable item fields. Supports dict-style .get() so callers can stay generic."""
+
+    __slots__ = tuple(name for name, _ in ITEM_FIELDS)
+
+    def get(self, key, default=None):
+        v = getattr(self, key, None)
+        return default if v is None else v
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self):
+        return f"ItemRecord({self.itemId!r}, {self.name!r})"
+
+
+_SET = object.__setattr__
+
+
+def decode_item(raw):
+    rec = ItemRecord.__new__(ItemRecord)
+    for name, fn in ITEM_FIELDS:
+        av = raw.get(name)
+        _SET(rec, name, fn(av) if av is not None else None)
+    return rec
+
+
+def decode_items(raws):
+    return [decode_item(r) for r in raws]
+
+
+def decode_team(raw):
+    """Team METADATA row -> plain dict of its string attributes."""
+    if not raw:
+        return {}
+    out = {}
+    for k, av in raw.items():
+        v = _str(av)
+        if v is not None:
+            out[k] = v
+    return out
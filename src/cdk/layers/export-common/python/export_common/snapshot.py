@@ -0,0 +1,174 @@
+"""
+Persistent per-team snapshot of exportable item records.
+
+A snapshot is a zlib-compressed, marshal-encoded columnar file (one column
+per ItemRecord field), so loading it is a decompress plus a zip over the
+columns rather than a DynamoDB query and per-row decode. Snapshots live in
+S3 under SNAPSHOT_PREFIX with a copy in /tmp for warm containers.
+
+A loaded snapshot is reconciled against DynamoDB before use: a keys-only
+query lists live items with their updatedAt, only new or changed rows are
+re-read with BatchGetItem, and deleted rows are dropped.
+"""
+import marshal
+import os
+import zlib
+
+from .records import ITEM_FIELDS, ItemRecord, decode_item, decode_items
+from .dynamo import batch_get_items, query_team_items
+from .tracing import NULL_TRACE
+
+FORMAT_VERSION = 1
+FIELDS = tuple(name for name, _ in ITEM_FIELDS)
+
+# Above this share of changed rows a full query is cheaper than BatchGetItem.
+FULL_RELOAD_RATIO = 0.5
+
+_SET = object.__setattr__
+
+
+def version_token(records):
+    """Token identifying a set of rows: max updatedAt plus row count."""
+    latest = max((r.updatedAt or "" for r in records), default="")
+    return f"{latest}|{len(records)}"
+
+
+def encode_snapshot(team_id, records):
+    columns = [[getattr(r, name) for r in records] for name in FIELDS]
+    header = {
+        "v": FORMAT_VERSION,
+        "teamId": team_id,
+        "token": version_token(records),
+        "fields": FIELDS,
+        "count": len(records),
+    }
+    return zlib.compress(marshal.dumps((header, columns)), 6)
+
+
+def decode_snapshot(blob):
+    header, columns = marshal.loads(zlib.decompress(blob))
+    if header.get("v") != FORMAT_VERSION or tuple(header.get("fields") or ()) != FIELDS:
+        raise ValueError("snapshot format mismatch")
+    records = []
+    new = ItemRecord.__new__
+    for row in zip(*columns):
+        rec = new(ItemRecord)
+        for name, value in zip(FIELDS, row):
+            _SET(rec, name, value)
+        records.append(rec)
+    return header, records
+
+
+class SnapshotStore:
+    def __init__(self, s3, bucket, prefix, tmp_dir="/tmp/snapshots"):
+        self.s3 = s3
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+        self.tmp_dir = tmp_dir
+
+    def key(self, team_id):
+        return f"{self.prefix}/{team_id}/items.snap"
+
+    def _tmp_path(self, team_id):
+        return os.path.join(self.tmp_dir, f"{team_id}.snap")
+
+    def load(self, team_id):
+        """Return (header, records) or None. /tmp first, then S3."""
+        path = self._tmp_path(team_id)
+        try:
+            with open(path, "rb") as f:
+                return decode_snapshot(f.read())
+        except Exception:
+            pass
+        try:
+            blob = self.s3.get_object(Bucket=self.bucket, Key=self.key(team_id))["Body"].read()
+            snap = decode_snapshot(blob)
+        except Exception:
+            return None
+        self._write_tmp(team_id, blob)
+        return snap
+
+    def save(self, team_id, records):
+        blob = encode_snapshot(team_id, records)
+        self._write_tmp(team_id, blob)
+        self.s3.put_object(
+            Bucket=self.bucket,
+            Key=self.key(team_id),
+            Body=blob,
+            ContentType="application/octet-stream",
+            Metadata={"snapshot-token": version_token(records)},
+        )
+        return blob
+
+    def _write_tmp(self, team_id, blob):
+        try:
+            os.makedirs(self.tmp_dir, exist_ok=True)
+            tmp = self._tmp_path(team_id) + ".part"
+            with open(tmp, "wb") as f:
+                f.write(blob)
+            os.replace(tmp, self._tmp_path(team_id))
+        except OSError:
+            pass
+
+
+def refresh(records, client, table_name, team_id):
+    """
+    Reconcile snapshot records with the table. Returns (records, changed),
+    where changed is False when the snapshot was already current.
+    """
+    by_id = {r.itemId: r for r in records if r.itemId}
+    live = []
+    stale = []
+    for raw in query_team_items(
+        client, table_name, team_id,
+        ProjectionExpression="SK, itemId, updatedAt",
+    ):
+        iid = (raw.get("itemId") or {}).get("S")
+        upd = (raw.get("updatedAt") or {}).get("S")
+        live.append(iid)
+        cur = by_id.get(iid)
+        if cur is None or (upd or "") > (cur.updatedAt or ""):
+            stale.append(raw["SK"]["S"])
+
+    if not stale and len(live) == len(by_id):
+        return records, False
+
+    if live and len(stale) > FULL_RELOAD_RATIO * len(live):
+        return decode_items(query_team_items(client, table_name, team_id)), True
+
+    keys = [{"PK": {"S": f"TEAM#{team_id}"}, "SK": {"S": sk}} for sk in stale]
+    for raw in batch_get_items(client, table_name, keys):
+        rec = decode_item(raw)
+        by_id[rec.itemId] = rec
+    return [by_id[iid] for iid in live if iid in by_id], True
+
+
+def _query_records(client, table_name, team_id, trace):
+    pages = query_team_items(
+        client, table_name, team_id,
+        on_page=lambda resp: trace.count("ddb_pages"),
+    )
+    with trace.phase("deserialize", exclude=("ddb_query",)):
+        return decode_items(trace.iter("ddb_query", pages))
+
+
+def load_team_items(store, client, table_name, team_id, trace=NULL_TRACE):
+    """All ITEM# records for a team, served from the snapshot when possible."""
+    snap = None
+    if store:
+        with trace.phase("snapshot_load"):
+            snap = store.load(team_id)
+    if snap is None:
+        records = _query_records(client, table_name, team_id, trace)
+        changed = True
+    else:
+        with trace.phase("snapshot_refresh"):
+            records, changed = refresh(snap[1], client, table_name, team_id)
+    if store and changed:
+        try:
+            with trace.phase("snapshot_save"):
+                store.save(team_id, records)
+        except Exception:
+            pass
+    trace.count("items_loaded", len(records))
+    return records
@@ -0,0 +1,172 @@
+"""
+Per-invocation phase timing for the export handlers.
+
+    trace = tracing.start("export-2404", teamId=team_id)
+    with trace.phase("template_fetch"):
+        ...
+    trace.count("items", len(items))
+    trace.emit()
+
+When EXPORT_TRACE is off, start() returns NULL_TRACE, whose methods are
+no-ops, so instrumented code costs a couple of attribute lookups.
+emit() writes one CloudWatch embedded-metric-format (EMF) JSON line with
+phase durations (ms), counters, peak RSS and cold/warm status.
+"""
+import json
+import os
+import resource
+import sys
+import time
+from collections import defaultdict
+
+NAMESPACE = os.environ.get("EXPORT_METRICS_NAMESPACE", "MNG/Exports")
+
+_cold = True
+
+
+def enabled():
+    return os.environ.get("EXPORT_TRACE", "").strip().lower() in ("1", "true", "yes")
+
+
+def peak_rss_mb():
+    # ru_maxrss is KiB on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+class _Phase:
+    __slots__ = ("trace", "name", "exclude", "t0", "excluded0")
+
+    def __init__(self, trace, name, exclude):
+        self.trace = trace
+        self.name = name
+        self.exclude = exclude
+
+    def __enter__(self):
+        d = self.trace.durations
+        self.excluded0 = sum(d[n] for n in self.exclude)
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.t0
+        d = self.trace.durations
+        if self.exclude:
+            elapsed -= sum(d[n] for n in self.exclude) - self.excluded0
+        d[self.name] += elapsed
+        return False
+
+
+class Trace:
+    def __init__(self, service, stream=None, **dims):
+        global _cold
+        self.service = service
+        self.stream = stream or sys.stdout
+        self.props = dict(dims)
+        self.durations = defaultdict(float)
+        self.counters = defaultdict(int)
+        self.cold = _cold
+        _cold = False
+        self.t0 = time.perf_counter()
+
+    def phase(self, name, exclude=()):
+        """Context manager adding its wall time to `name`, minus time spent in `exclude` phases."""
+        return _Phase(self, name, exclude)
+
+    def iter(self, name, iterable):
+        """Wrap an iterator so time spent producing each element is added to `name`."""
+        it = iter(iterable)
+        d = self.durations
+        while True:
+            t0 = time.perf_counter()
+            try:
+                value = next(it)
+            except StopIteration:
+                d[name] += time.perf_counter() - t0
+                return
+            d[name] += time.perf_counter() - t0
+            yield value
+
+    def count(self, name, n=1):
+        self.counters[name] += n
+
+    def set(self, **props):
+        self.props.update(props)
+
+    def count_all(self, counters):
+        for name, n in counters.items():
+            self.counters[name] += n
+
+    def record(self):
+        total = time.perf_counter() - self.t0
+        out = {
+            "Service": self.service,
+            "cold_start": self.cold,
+            "total_ms": round(total * 1000, 3),
+            "peak_rss_mb": round(peak_rss_mb(), 1),
+        }
+        for name, secs in self.durations.items():
+            out[f"{name}_ms"] = round(secs * 1000, 3)
+        out.update(self.counters)
+        out.update(self.props)
+        metrics = [{"Name": k, "Unit": "Milliseconds"} for k in out if k.endswith("_ms")]
+        metrics += [{"Name": k, "Unit": "Count"} for k in self.counters]
+        metrics.append({"Name": "peak_rss_mb", "Unit": "Megabytes"})
+        out["_aws"] = {
+            "Timestamp": int(time.time() * 1000),
+            "CloudWatchMetrics": [{
+                "Namespace": NAMESPACE,
+                "Dimensions": [["Service"]],
+                "Metrics": metrics,
+            }],
+        }
+        return out
+
+    def emit(self):
+        self.stream.write(json.dumps(self.record(), default=str) + "\n")
+        self.stream.flush()
+
+
+class _NullPhase:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_PHASE = _NullPhase()
+
+
+class _NullTrace:
+    """Stand-in used when tracing is disabled."""
+
+    __slots__ = ()
+    cold = False
+
+    def phase(self, name, exclude=()):
+        return _NULL_PHASE
+
+    def iter(self, name, iterable):
+        return iterable
+
+    def count(self, name, n=1):
+        pass
+
+    def set(self, **props):
+        pass
+
+    def count_all(self, counters):
+        pass
+
+    def emit(self):
+        pass
+
+
+NULL_TRACE = _NullTrace()
+
+
+def start(service, stream=None, force=None, **dims):
+    on = enabled() if force is None else force
+    return Trace(service, stream=stream, **dims) if on else NULL_TRACE
@@ -0,0 +1,71 @@
+"""
+Skip re-rendering exports when nothing changed.
+
+The API bumps `itemsVersion` on the team METADATA item whenever one of the
+team's items is created, updated, deleted or reset. Each export artifact is
+written with an `export-token` S3 metadata entry derived from that version
+plus anything else that shapes the output (team name, overrides, date). If
+the token on the existing object matches, the handler can presign it as-is
+after a single GetItem + HeadObject. Lambdas that write items themselves
+bump it with bump_items_version().
+"""
+import hashlib
+import json
+import sys
+import time
+
+TOKEN_METADATA_KEY = "export-token"
+BUMP_ATTEMPTS = 3
+
+
+def team_version(meta_raw):
+    """itemsVersion from a raw METADATA row, or None if the team has never been bumped."""
+    n = ((meta_raw or {}).get("itemsVersion") or {}).get("N")
+    return int(n) if n is not None else None
+
+
+def bump_items_version(client, table_name, team_id, attempts=BUMP_ATTEMPTS):
+    """
+    The API's bumpItemsVersion: ADD 1, only on an existing METADATA row.
+    Retried, then raised: without it the exports keep serving old artifacts.
+    """
+    for attempt in range(attempts):
+        try:
+            client.update_item(
+                TableName=table_name,
+                Key={"PK": {"S": f"TEAM#{team_id}"}, "SK": {"S": "METADATA"}},
+                UpdateExpression="ADD itemsVersion :one",
+                ConditionExpression="attribute_exists(PK)",
+                ExpressionAttributeValues={":one": {"N": "1"}},
+            )
+            return
+        except Exception as e:
+            code = getattr(e, "response", {}).get("Error", {}).get("Code")
+            sys.stderr.write(f"itemsVersion bump for {team_id} failed: {e}\n")
+            if code == "ConditionalCheckFailedException" or attempt == attempts - 1:
+                raise
+            time.sleep(0.1 * (2 ** attempt))
+
+
+def artifact_token(version, *inputs):
+    if version is None:
+        return None
+    digest = hashlib.sha1(
+        json.dumps(inputs, sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()[:16]
+    return f"v{version}-{digest}"
+
+
+def is_fresh(s3, bucket, key, token):
+    """True when the object at key was written for this exact token."""
+    if not token:
+        return False
+    try:
+        head = s3.head_object(Bucket=bucket, Key=key)
+    except Exception:
+        return False
+    return (head.get("Metadata") or {}).get(TOKEN_METADATA_KEY) == token
+
+
+def token_metadata(token):
+    return {TOKEN_METADATA_KEY: token} if token else {}
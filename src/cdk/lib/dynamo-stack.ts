@@ -80,6 +80,31 @@ export class DynamoStack extends Stack {
       projectionType: dynamodb.ProjectionType.ALL,
     });
 
+    // Sparse index of team rows by last update, used by delta exports.
+    // Only rows carrying both teamId and updatedAt (items + team METADATA) land here.
+    this.table.addGlobalSecondaryIndex({
+      indexName: 'GSI_TeamItemsByUpdatedAt',
+      partitionKey: { name: 'teamId', type: dynamodb.AttributeType.STRING },
+      sortKey: { name: 'updatedAt', type: dynamodb.AttributeType.STRING },
+      projectionType: dynamodb.ProjectionType.INCLUDE,
+      nonKeyAttributes: [
+        'itemId',
+        'parent',
+        'status',
+        'name',
+        'actualName',
+        'description',
+        'nsn',
+        'serialNumber',
+        'authQuantity',
+        'ohQuantity',
+        'endItemNiin',
+        'liin',
+        'damageReports',
+        'imageKey',
+      ],
+    });
+
     /* ============================================================
        DEFAULT ROLE SEEDER
     ============================================================ */
@@ -16,9 +16,14 @@ export interface ExportLambdaStackProps extends StackProps {
   region?: string;
 }
 
+// pytest modules that sit next to the handlers.
+const TEST_FILES = ['test_*.py', '__pycache__'];
+
 export class ExportLambdaStack extends Stack {
   public readonly pdf2404Function: lambda.Function;
   public readonly inventoryFunction: lambda.Function;
+  public readonly imagesFunction: lambda.Function;
+  public readonly importFunction: lambda.Function;
 
   constructor(scope: Construct, id: string, props: ExportLambdaStackProps) {
     super(scope, id, props);
@@ -27,12 +32,16 @@ export class ExportLambdaStack extends Stack {
     const stage = props.stage.toLowerCase();
     const { ddbTable, uploadsBucket, kmsKey, region = 'us-east-1' } = props;
 
+    const exportTimeout = Duration.seconds(60);
+
     const commonEnv = {
       TABLE_NAME: ddbTable.tableName,
       UPLOADS_BUCKET: uploadsBucket.bucketName,
       KMS_KEY_ARN: kmsKey.keyArn,
       REGION: region,
       TEMPLATE_PATH: 'templates/2404-template.pdf',
+      // Client connect/read timeouts are derived from this (export_common/clients.py).
+      EXPORT_TIMEOUT_S: String(exportTimeout.toSeconds()),
     };
 
     const pdfLayer = new lambda.LayerVersion(this, 'PdfDepsLayer', {
@@ -41,15 +50,35 @@ export class ExportLambdaStack extends Stack {
       description: 'PDF processing dependencies (pypdf, pillow, reportlab, etc)',
     });
 
+    const exportCommonLayer = new lambda.LayerVersion(this, 'ExportCommonLayer', {
+      code: lambda.Code.fromAsset(path.join(__dirname, '../layers/export-common')),
+      compatibleRuntimes: [lambda.Runtime.PYTHON_3_11],
+      description: 'Shared export helpers (DynamoDB record decoding, queries)',
+    });
+
+    // Ships the 2404 template with the function (/opt/2404-template.pdf) so it
+    // can be loaded during init instead of fetched from S3 per request.
+    const templateLayer = new lambda.LayerVersion(this, 'Template2404Layer', {
+      code: lambda.Code.fromAsset(path.join(__dirname, '../templates'), {
+        exclude: ['**', '!2404-template.pdf'],
+      }),
+      compatibleRuntimes: [lambda.Runtime.PYTHON_3_11],
+      description: 'DA Form 2404 template PDF',
+    });
+
     this.pdf2404Function = new lambda.Function(this, 'Export2404Handler', {
       functionName: `${service}-export-2404-handler-${stage}`,
       runtime: lambda.Runtime.PYTHON_3_11,
       handler: '2404_handler.lambda_handler',
-      code: lambda.Code.fromAsset(path.join(__dirname, '../python_2404')),
-      environment: commonEnv,
-      timeout: Duration.seconds(60),
+      code: lambda.Code.fromAsset(path.join(__dirname, '../python_2404'), { exclude: TEST_FILES }),
+      environment: {
+        ...commonEnv,
+        BUNDLED_TEMPLATE_PATH: '/opt/2404-template.pdf',
+        PRIME_ON_INIT: 'true',
+      },
+      timeout: exportTimeout,
       memorySize: 512,
-      layers: [pdfLayer],
+      layers: [pdfLayer, exportCommonLayer, templateLayer],
       description: 'Generates DA Form 2404 PDFs for inventory items',
     });
 
@@ -57,19 +86,58 @@ export class ExportLambdaStack extends Stack {
       functionName: `${service}-export-inventory-handler-${stage}`,
       runtime: lambda.Runtime.PYTHON_3_11,
       handler: 'inventory_handler.lambda_handler',
-      code: lambda.Code.fromAsset(path.join(__dirname, '../python_inventory')),
+      code: lambda.Code.fromAsset(path.join(__dirname, '../python_inventory'), { exclude: TEST_FILES }),
       environment: commonEnv,
-      timeout: Duration.seconds(60),
+      timeout: exportTimeout,
       memorySize: 512,
-      layers: [pdfLayer],
-      description: 'Generates inventory CSV reports',
+      // pdfLayer for the printable (format: 'pdf') report.
+      layers: [pdfLayer, exportCommonLayer],
+      description: 'Generates inventory CSV and PDF reports',
+    });
+
+    // Invoked asynchronously by the API after an item photo is uploaded.
+    this.imagesFunction = new lambda.Function(this, 'ItemImagesHandler', {
+      functionName: `${service}-item-images-handler-${stage}`,
+      runtime: lambda.Runtime.PYTHON_3_11,
+      handler: 'images_handler.lambda_handler',
+      code: lambda.Code.fromAsset(path.join(__dirname, '../python_images')),
+      environment: {
+        ...commonEnv,
+        RENDITION_PREFIX: 'renditions',
+        IMAGE_FORMAT: 'webp',
+      },
+      timeout: Duration.seconds(30),
+      memorySize: 1024,
+      layers: [pdfLayer, exportCommonLayer],
+      description: 'Generates thumbnail and medium renditions of item photos',
+    });
+
+    // Bulk CSV import (the inventory export's layout) with batched writes,
+    // and candidate extraction from legacy PDF hand receipts (pdfLayer for pypdf).
+    this.importFunction = new lambda.Function(this, 'InventoryImportHandler', {
+      functionName: `${service}-inventory-import-handler-${stage}`,
+      runtime: lambda.Runtime.PYTHON_3_11,
+      handler: 'import_handler.lambda_handler',
+      code: lambda.Code.fromAsset(path.join(__dirname, '../python_import')),
+      environment: commonEnv,
+      timeout: exportTimeout,
+      // Two vCPUs, one per PDF extraction worker.
+      memorySize: 3584,
+      layers: [pdfLayer, exportCommonLayer],
+      description: 'Imports inventory CSVs and PDF hand receipts into a team',
     });
 
     ddbTable.grantReadData(this.pdf2404Function);
     ddbTable.grantReadData(this.inventoryFunction);
+    ddbTable.grantReadWriteData(this.imagesFunction);
+    ddbTable.grantReadWriteData(this.importFunction);
 
     uploadsBucket.grantReadWrite(this.pdf2404Function);
     uploadsBucket.grantReadWrite(this.inventoryFunction);
+    uploadsBucket.grantReadWrite(this.imagesFunction);
+    uploadsBucket.grantRead(this.importFunction);
+    // Extracted page text is cached under imports/<teamId>/.cache/.
+    uploadsBucket.grantWrite(this.importFunction, 'imports/*');
 
     this.pdf2404Function.addToRolePolicy(
       new iam.PolicyStatement({
@@ -86,10 +154,20 @@ export class ExportLambdaStack extends Stack {
     new CfnOutput(this, 'InventoryFunctionArn', {
       value: this.inventoryFunction.functionArn,
     });
+
+    new CfnOutput(this, 'ItemImagesFunctionArn', {
+      value: this.imagesFunction.functionArn,
+    });
+
+    new CfnOutput(this, 'InventoryImportFunctionArn', {
+      value: this.importFunction.functionArn,
+    });
   }
 
   public grantInvoke(grantee: iam.IGrantable) {
     this.pdf2404Function.grantInvoke(grantee);
     this.inventoryFunction.grantInvoke(grantee);
+    this.imagesFunction.grantInvoke(grantee);
+    this.importFunction.grantInvoke(grantee);
   }
 }
@@ -59,6 +59,22 @@ export class S3UploadsStack extends Stack {
           expiration: Duration.days(30),
           enabled: true,
         },
+        {
+          // Parts of exports that ran out of time and were never resumed.
+          id: 'expire-export-checkpoints',
+          prefix: 'ops/exports/',
+          expiration: Duration.days(1),
+          noncurrentVersionExpiration: Duration.days(1),
+          enabled: true,
+        },
+        {
+          // Import uploads and the PDF review's page text cache.
+          id: 'expire-imports',
+          prefix: 'imports/',
+          expiration: Duration.days(30),
+          noncurrentVersionExpiration: Duration.days(1),
+          enabled: true,
+        },
         {
           id: 'cleanup-temp',
           prefix: 'temp/',
@@ -3,16 +3,32 @@ import io
 import json
 import base64
 from datetime import datetime, timezone
-
-from pypdf import PdfReader, PdfWriter
-from reportlab.pdfgen import canvas
-from reportlab.pdfbase import pdfmetrics
-import boto3
 import sys
+import tempfile
+import time
+
+# pypdf, reportlab and boto3 are imported on first use so GET health checks
+# and OPTIONS preflights don't pay for loading them on a cold start.
+
+from export_common.records import decode_team
+from export_common.dynamo import get_team_metadata
+from export_common.snapshot import SnapshotStore, load_team_items
+from export_common.manifest import Manifest
+from export_common.versioning import artifact_token, team_version, token_metadata
+from export_common import checkpoint, clients, memory, photos, profiling, tracing
 
 TEMPLATE_PATH  = os.environ.get("TEMPLATE_PATH", "").strip()
 TABLE_NAME     = os.environ.get("TABLE_NAME", "").strip()
 UPLOADS_BUCKET = os.environ.get("UPLOADS_BUCKET", "").strip()
+SNAPSHOT_PREFIX = os.environ.get("SNAPSHOT_PREFIX", "").strip()
+# Template shipped with the function (template layer); S3 is the fallback.
+BUNDLED_TEMPLATE_PATH = os.environ.get("BUNDLED_TEMPLATE_PATH", "/opt/2404-template.pdf").strip()
+PRIME_ON_INIT = os.environ.get("PRIME_ON_INIT", "").strip().lower() in ("1", "true", "yes")
+# Append a photo page after each damaged item's form; a request's "evidence" flag overrides.
+EVIDENCE_PAGES = os.environ.get("EVIDENCE_PAGES", "").strip().lower() in ("1", "true", "yes")
+# "overlay" draws each item's values on a reportlab canvas and merges it into the page;
+# "form" writes them as flattened form fields straight into the page content.
+FILL_MODE = os.environ.get("EXPORT_2404_FILL", "overlay").strip().lower() or "overlay"
 
 CORS = {
     "Access-Control-Allow-Origin": "*",
@@ -20,21 +36,11 @@ CORS = {
     "Access-Control-Allow-Methods": "POST,OPTIONS,GET"
 }
 
-_ddb_cli = None
-_s3 = None
-
 def ddb_client():
-    global _ddb_cli
-    if _ddb_cli is None:
-        _ddb_cli = boto3.client("dynamodb")
-    return _ddb_cli
+    return clients.ddb()
 
 def s3_client():
-    global _s3
-    if _s3 is None:
-        from botocore.config import Config
-        _s3 = boto3.client("s3", config=Config(signature_version='s3v4'))
-    return _s3
+    return clients.s3()
 
 FIELD_COORDS = {
     "ORGANIZATION": (90, 720),
@@ -54,7 +60,35 @@ REMARKS_TABLE = {
     "wrap_gap": 10,
 }
 
+# Form mode: AcroForm field name -> value key. Fields missing from the
+# template (the bundled one has no AcroForm) sit where the overlay draws them.
+FORM_FIELDS = {
+    "ORGANIZATION": "ORGANIZATION",
+    "NOMENCLATURE": "NOMENCLATURE",
+    "SERIAL_NUMBER": "SERIAL_NUMBER",
+    "DATE": "DATE",
+    "REMARKS": "REMARKS_LIST",
+}
+FIELD_FONT = ("Helvetica", 9)
+# /DA font names from common form tools -> standard 14 fonts.
+DA_FONTS = {"/Helv": "Helvetica", "/HeBo": "Helvetica-Bold", "/Cour": "Courier", "/TiRo": "Times-Roman"}
+
+EVIDENCE_PAGE = {
+    "margin": 54,
+    "font": "Helvetica",
+    "title_font": "Helvetica-Bold",
+    "title_size": 14,
+    "size": 10,
+    "line_gap": 14,
+    "max_report_lines": 8,
+    # Photo box under the text, in points; photos are downscaled to fill it at photos.PRINT_DPI.
+    "photo_w": 504,
+    "photo_h": 468,
+}
+EVIDENCE_PX = photos.max_pixels(EVIDENCE_PAGE["photo_w"], EVIDENCE_PAGE["photo_h"])
+
 def _wrap_to_width(text, max_width, font, size):
+    from reportlab.pdfbase import pdfmetrics
     words = (text or "").split()
     lines, cur = [], ""
     for w in words:
@@ -69,21 +103,21 @@ def _wrap_to_width(text, max_width, font, size):
         lines.append(cur)
     return lines
 
-def _draw_remarks_list(c, values):
+def _remarks_lines(values, x=None, y=None):
+    """(x, y, text) per remarks line, wrapped and clipped to the table's rows."""
+    from reportlab.pdfbase import pdfmetrics
     rows = values.get("REMARKS_LIST") or []
     if not rows:
         rows = ["N/A"]
 
-    x = REMARKS_TABLE["x"]
-    y = REMARKS_TABLE["y_start"]
+    x = REMARKS_TABLE["x"] if x is None else x
+    y = REMARKS_TABLE["y_start"] if y is None else y
     gap = REMARKS_TABLE["row_gap"]
     wrap_gap = REMARKS_TABLE["wrap_gap"]
     max_w = REMARKS_TABLE["max_width"]
     font = REMARKS_TABLE["font"]
     size = REMARKS_TABLE["size"]
 
-    c.setFont(font, size)
-
     for raw in rows[:REMARKS_TABLE["max_rows"]]:
         group_y = y
         wrapped = _wrap_to_width(str(raw), max_w, font, size)
@@ -97,13 +131,22 @@ def _draw_remarks_list(c, values):
             wrapped[-1] = last + ell
 
         for i, wl in enumerate(wrapped):
-            c.drawString(x, int(group_y - i * wrap_gap), wl)
+            yield x, int(group_y - i * wrap_gap), wl
 
         y = group_y - gap
 
+def _draw_remarks_list(c, values):
+    c.setFont(REMARKS_TABLE["font"], REMARKS_TABLE["size"])
+    for x, y, text in _remarks_lines(values):
+        c.drawString(x, y, text)
+
 def make_overlay(w, h, values):
+    from pypdf import PdfReader
+    from reportlab.pdfgen import canvas
     buf = io.BytesIO()
-    c = canvas.Canvas(buf, pagesize=(w, h))
+    # Uncompressed: the overlay is merged (decoded) right away and the
+    # stamped page is compressed once afterwards.
+    c = canvas.Canvas(buf, pagesize=(w, h), pageCompression=0)
     c.setFont("Helvetica", 9)
 
     _draw_remarks_list(c, values)
@@ -117,69 +160,266 @@ def make_overlay(w, h, values):
     buf.seek(0)
     return PdfReader(buf)
 
-def stamp(template_bytes, values):
-    tmpl = PdfReader(io.BytesIO(template_bytes))
-    writer = PdfWriter()
-    mb = tmpl.pages[0].mediabox
-    w, h = float(mb.width), float(mb.height)
-
-    overlay = make_overlay(w, h, values)
+def make_evidence(w, h, entries):
+    """
+    One evidence page per (values, Photo) entry, all drawn on a single
+    canvas so a photo shared by several items is embedded once.
+    """
+    from pypdf import PdfReader
+    from reportlab.lib.utils import ImageReader
+    from reportlab.pdfgen import canvas
+    ev = EVIDENCE_PAGE
+    buf = io.BytesIO()
+    c = canvas.Canvas(buf, pagesize=(w, h))
+    readers = {}
+    left, top = ev["margin"], h - ev["margin"]
+    text_w = w - 2 * ev["margin"]
+    for values, photo in entries:
+        c.setFont(ev["title_font"], ev["title_size"])
+        c.drawString(left, top, "Damage evidence")
+        y = top - ev["title_size"] - ev["line_gap"]
+        c.setFont(ev["font"], ev["size"])
+        for label, field in (("Item", "NOMENCLATURE"), ("Serial / NSN", "SERIAL_NUMBER"), ("Date", "DATE")):
+            c.drawString(left, y, f"{label}: {values.get(field) or 'N/A'}")
+            y -= ev["line_gap"]
+        lines = []
+        for report in values.get("REMARKS_LIST") or []:
+            lines += _wrap_to_width("- " + str(report), text_w, ev["font"], ev["size"])
+        for line in lines[:ev["max_report_lines"]]:
+            c.drawString(left, y, line)
+            y -= ev["line_gap"]
+
+        # Fit the photo in the box below the text, keeping its aspect ratio.
+        box_w = min(ev["photo_w"], text_w)
+        box_h = min(ev["photo_h"], y - ev["margin"])
+        scale = min(box_w / photo.width, box_h / photo.height)
+        dw, dh = photo.width * scale, photo.height * scale
+        # Reusing the reader skips re-hashing the pixels for a repeated photo.
+        img = readers.get(id(photo))
+        if img is None:
+            img = readers[id(photo)] = ImageReader(io.BytesIO(photo.jpeg))
+        c.drawImage(img, left + (box_w - dw) / 2, y - ev["line_gap"] - dh, dw, dh)
+        c.showPage()
+    c.save()
+    buf.seek(0)
+    return PdfReader(buf)
 
-    for i, page in enumerate(tmpl.pages):
+def template_forms(writer, template_bytes):
+    """
+    Add each template page to `writer` once, as a Form XObject.
+
+    Stamped pages draw the form and then the overlay, so every item in an
+    export shares one copy of the template's content (~1.5 MB decoded)
+    instead of merging its own copy of it into page 1.
+    Returns [(form_ref, width, height)] per template page.
+    """
+    return [(writer._add_object(form.clone(writer)), w, h) for form, w, h in _template_xobjects(template_bytes)]
+
+_template_cache = (None, None)
+
+def _template_xobjects(template_bytes):
+    # Decoding and re-compressing the template is done once per container;
+    # writers get clones of the compressed streams.
+    global _template_cache
+    if _template_cache[0] is not template_bytes:
+        from pypdf import PdfReader
+        from pypdf.generic import ArrayObject, DecodedStreamObject, DictionaryObject, FloatObject, NameObject
+        forms = []
+        for page in PdfReader(io.BytesIO(template_bytes)).pages:
+            mb = page.mediabox
+            form = DecodedStreamObject()
+            contents = page.get_contents()
+            form.set_data(contents.get_data() if contents is not None else b"")
+            form.update({
+                NameObject("/Type"): NameObject("/XObject"),
+                NameObject("/Subtype"): NameObject("/Form"),
+                NameObject("/BBox"): ArrayObject(FloatObject(v) for v in (mb.left, mb.bottom, mb.right, mb.top)),
+                NameObject("/Resources"): page.get("/Resources", DictionaryObject()),
+            })
+            forms.append((form.flate_encode(), float(mb.width), float(mb.height)))
+        _template_cache = (template_bytes, forms)
+    return _template_cache[1]
+
+def stamp_into(writer, forms, values):
+    """Append one filled-in form (all template pages) to `writer`; returns the page count."""
+    from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject
+    for i, (ref, w, h) in enumerate(forms):
+        page = writer.add_blank_page(w, h)
+        page[NameObject("/Resources")] = DictionaryObject({
+            NameObject("/XObject"): DictionaryObject({NameObject("/Tpl"): ref}),
+        })
+        content = DecodedStreamObject()
+        content.set_data(b"q /Tpl Do Q")
+        page[NameObject("/Contents")] = writer._add_object(content)
         if i == 0:
-            page.merge_page(overlay.pages[0])
-        writer.add_page(page)
+            page.merge_page(make_overlay(w, h, values).pages[0])
+        page.compress_content_streams()
+    return len(forms)
 
+def stamp(template_bytes, values, fill=None):
+    from pypdf import PdfWriter
+    writer = PdfWriter()
+    if (fill or FILL_MODE) == "form":
+        fill_into(writer, fill_kit(writer, template_bytes), values)
+    else:
+        stamp_into(writer, template_forms(writer, template_bytes), values)
     out = io.BytesIO()
     writer.write(out)
-    out.seek(0)
     return out.getvalue()
 
+_fields_cache = (None, None)
+
+def form_fields(template_bytes):
+    """
+    {value key: (x, y, font, size)} for FORM_FIELDS: the first baseline of
+    each field. Fields the template's AcroForm has are placed by their
+    /Rect and /DA; the rest fall back to FIELD_COORDS and REMARKS_TABLE.
+    """
+    global _fields_cache
+    if _fields_cache[0] is not template_bytes:
+        from pypdf import PdfReader
+        fields = {key: (x, y) + FIELD_FONT for key, (x, y) in FIELD_COORDS.items()}
+        fields["REMARKS_LIST"] = (REMARKS_TABLE["x"], REMARKS_TABLE["y_start"], REMARKS_TABLE["font"], REMARKS_TABLE["size"])
+        for annot in PdfReader(io.BytesIO(template_bytes)).pages[0].get("/Annots") or []:
+            annot = annot.get_object()
+            key = FORM_FIELDS.get(annot.get("/T") or (annot.get("/Parent") or {}).get("/T"))
+            if key is None or "/Rect" not in annot:
+                continue
+            rect = [float(v) for v in annot["/Rect"]]
+            (x0, x1), (y0, y1) = sorted(rect[::2]), sorted(rect[1::2])
+            da = str(annot.get("/DA") or "").split()
+            font, size = fields[key][2:]
+            if "Tf" in da:
+                i = da.index("Tf")
+                font = DA_FONTS.get(da[i - 2], font)
+                size = float(da[i - 1]) or size
+            if key == "REMARKS_LIST":
+                fields[key] = (x0 + 2, y1 - 2 - size, font, size)
+            else:
+                fields[key] = (x0 + 2, y0 + (y1 - y0 - 0.7 * size) / 2, font, size)
+        _fields_cache = (template_bytes, fields)
+    return _fields_cache[1]
+
+def _pdf_string(text):
+    # Standard 14 fonts with WinAnsiEncoding, like reportlab's own text.
+    raw = text.encode("cp1252", "replace")
+    return b"(" + raw.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)").replace(b"\r", b"\\r") + b")"
+
+def fill_kit(writer, template_bytes):
+    """
+    The template forms plus what every filled page in `writer` shares: one
+    /Resources dictionary naming the template form, one font object per
+    field font and one Tf operator per (font, size). Returns
+    (forms, resources_ref, {value key: (x, y, Tf operator)}).
+    """
+    from pypdf.generic import DictionaryObject, NameObject
+    forms = template_forms(writer, template_bytes)
+    fields = form_fields(template_bytes)
+    fonts = DictionaryObject()
+    names, ops = {}, {}
+    for _, _, font, size in fields.values():
+        if font not in names:
+            names[font] = f"/FF{len(names) + 1}"
+            fonts[NameObject(names[font])] = writer._add_object(DictionaryObject({
+                NameObject("/Type"): NameObject("/Font"),
+                NameObject("/Subtype"): NameObject("/Type1"),
+                NameObject("/BaseFont"): NameObject("/" + font),
+                NameObject("/Encoding"): NameObject("/WinAnsiEncoding"),
+            }))
+        ops.setdefault((font, size), f"{names[font]} {size:g} Tf".encode())
+    resources = writer._add_object(DictionaryObject({
+        NameObject("/XObject"): DictionaryObject({NameObject("/Tpl"): forms[0][0]}),
+        NameObject("/Font"): fonts,
+    }))
+    return forms, resources, {key: (x, y, ops[(font, size)]) for key, (x, y, font, size) in fields.items()}
+
+def fill_into(writer, kit, values):
+    """
+    Form-mode stamp_into: each field's text is written into the first page's
+    content as a flattened field, so no overlay canvas is drawn, parsed or
+    merged. Returns the page count.
+    """
+    from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject
+    forms, resources, fields = kit
+    for i, (ref, w, h) in enumerate(forms):
+        page = writer.add_blank_page(w, h)
+        if i:
+            page[NameObject("/Resources")] = DictionaryObject({
+                NameObject("/XObject"): DictionaryObject({NameObject("/Tpl"): ref}),
+            })
+            data = b"q /Tpl Do Q"
+        else:
+            page[NameObject("/Resources")] = resources
+            out = [b"q /Tpl Do Q BT 0 g"]
+            for key, (x, y, tf) in fields.items():
+                if key == "REMARKS_LIST":
+                    lines = _remarks_lines(values, x, y)
+                else:
+                    v = (values.get(key) or "").strip()
+                    lines = [(x, y, v)] if v else []
+                for lx, ly, text in lines:
+                    if tf:
+                        out.append(tf)
+                        tf = None
+                    out.append(b"1 0 0 1 %.2f %.2f Tm %s Tj" % (lx, ly, _pdf_string(text)))
+            out.append(b"ET")
+            data = b" ".join(out)
+        content = DecodedStreamObject()
+        content.set_data(data)
+        page[NameObject("/Contents")] = writer._add_object(content.flate_encode())
+    return len(forms)
+
+_template = None
+
 def read_template_bytes():
-    key = TEMPLATE_PATH or "templates/2404-template.pdf"
-    obj = s3_client().get_object(Bucket=UPLOADS_BUCKET, Key=key)
-    return obj["Body"].read()
-
-def ddb_query_team_items(team_id):
-    from boto3.dynamodb.types import TypeDeserializer
-    deser = TypeDeserializer()
-
-    resp = ddb_client().query(
-        TableName=TABLE_NAME,
-        KeyConditionExpression="PK = :pk AND begins_with(SK, :sk)",
-        ExpressionAttributeValues={
-            ":pk": {"S": f"TEAM#{team_id}"},
-            ":sk": {"S": "ITEM#"}
-        }
-    )
-    return [{k: deser.deserialize(v) for k, v in raw.items()} for raw in resp.get("Items", [])]
+    global _template
+    if _template is None:
+        if BUNDLED_TEMPLATE_PATH and os.path.isfile(BUNDLED_TEMPLATE_PATH):
+            with open(BUNDLED_TEMPLATE_PATH, "rb") as f:
+                _template = f.read()
+        else:
+            key = TEMPLATE_PATH or "templates/2404-template.pdf"
+            obj = s3_client().get_object(Bucket=UPLOADS_BUCKET, Key=key)
+            _template = obj["Body"].read()
+    return _template
 
-def ddb_get_team(team_id):
-    from boto3.dynamodb.types import TypeDeserializer
-    deser = TypeDeserializer()
+def ddb_query_team_items(team_id, trace=tracing.NULL_TRACE):
+    store = None
+    if SNAPSHOT_PREFIX and UPLOADS_BUCKET:
+        store = SnapshotStore(s3_client(), UPLOADS_BUCKET, SNAPSHOT_PREFIX)
+    return load_team_items(store, ddb_client(), TABLE_NAME, team_id, trace=trace)
 
-    resp = ddb_client().get_item(
-        TableName=TABLE_NAME,
-        Key={"PK": {"S": f"TEAM#{team_id}"}, "SK": {"S": "METADATA"}},
-        ConsistentRead=True,
-    )
-    item = resp.get("Item")
-    return {k: deser.deserialize(v) for k, v in item.items()} if item else {}
+def ddb_get_team_raw(team_id):
+    return get_team_metadata(ddb_client(), TABLE_NAME, team_id)
 
+def ddb_get_team(team_id):
+    return decode_team(ddb_get_team_raw(team_id))
 
-def s3_put_pdf(bucket, key, body):
+
+def s3_put_pdf(bucket, key, body, token=None):
     kms = os.environ.get("KMS_KEY_ARN", "").strip()
     params = {
         "Bucket": bucket,
         "Key": key,
         "Body": body,
-        "ContentType": "application/pdf"
+        "ContentType": "application/pdf",
+        "Metadata": token_metadata(token),
     }
     if kms:
         params["ServerSideEncryption"] = "aws:kms"
         params["SSEKMSKeyId"] = kms
     s3_client().put_object(**params)
 
+def presign(key):
+    return s3_client().generate_presigned_url(
+        "get_object",
+        Params={"Bucket": UPLOADS_BUCKET, "Key": key},
+        ExpiresIn=3600
+    )
+
+def _today():
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d")
+
 def to_pdf_values(payload):
     reports = payload.get("damageReports") or []
     if isinstance(reports, str):
@@ -191,7 +431,7 @@ def to_pdf_values(payload):
         "ORGANIZATION": payload.get("name") or "N/A",
         "NOMENCLATURE": (payload.get("actualName") or "").strip(),
         "SERIAL_NUMBER": payload.get("serialNumber") or payload.get("nsn") or "N/A",
-        "DATE": datetime.now(timezone.utc).strftime("%Y-%m-%d"),
+        "DATE": _today(),
         "REMARKS_LIST": reports,
     }
 
@@ -202,13 +442,22 @@ def _resp(code, body=None):
         "body": json.dumps(body or {})
     }
 
+def _get_http_method(event):
+    m = (event.get("requestContext") or {}).get("http", {}).get("method") or event.get("httpMethod")
+    return m.upper() if isinstance(m, str) else ""
+
 def lambda_handler(event, context):
-  
+
     if isinstance(event, dict) and "teamId" in event:
         payload = event
         method = "POST"
     else:
-        method = (event.get("httpMethod") or "").upper()
+        method = _get_http_method(event)
+        # Preflight / health check: answer before touching any dependency.
+        if method == "OPTIONS":
+            return _resp(200, {})
+        if method == "GET":
+            return _resp(200, {"ok": True})
         if method == "POST":
             raw = event.get("body") or "{}"
             if event.get("isBase64Encoded"):
@@ -217,10 +466,6 @@ def lambda_handler(event, context):
         else:
             payload = {}
 
-    if method == "OPTIONS":
-        return _resp(200, {})
-    if method == "GET":
-        return _resp(200, {"ok": True})
     if method != "POST":
         return _resp(405, {"error": "Method not allowed"})
 
@@ -228,52 +473,249 @@ def lambda_handler(event, context):
     if not team_id:
         return _resp(400, {"error": "teamId is required"})
 
-    tmpl = read_template_bytes()
-    items = ddb_query_team_items(team_id)
-    team = ddb_get_team(team_id)
-
-    root_name = team.get("name") or "N/A"
-
-    damaged = []
-    for itm in items:
-        status = (itm.get("status") or "").strip().lower()
-        if status == "damaged":
-            damaged.append(itm)
-
-
-    if not damaged:
-        return _resp(200, {"ok": True, "message": "No damaged items"})
-
+    trace = tracing.start("export-2404", teamId=team_id)
+    calls_before = dict(clients.stats)
+    try:
+        return profiling.capture(
+            lambda: export_2404(team_id, payload, trace, context),
+            payload, team_id, "export-2404", s3=s3_client, bucket=UPLOADS_BUCKET,
+        )
+    finally:
+        trace.count_all(clients.stats_delta(calls_before))
+        trace.emit()
+
+def _item_values(itm, root_name):
+    return to_pdf_values({
+        "name": root_name,
+        "actualName": itm.get("actualName") or itm.get("name"),
+        "serialNumber": itm.get("serialNumber"),
+        "damageReports": itm.get("damageReports")
+    })
+
+def render_parts(tmpl, damaged, root_name, out_dir, trace=tracing.NULL_TRACE, deadline=None, evidence=False,
+                 fill=None):
+    """
+    Stamp one form per damaged item, in chunks sized by ChunkPlanner, and
+    write each chunk to its own part file under out_dir so only one chunk's
+    writer is in memory at a time. With a `deadline`, chunks are also capped
+    to the time left and rendering stops early when none fits; planner.done
+    says how many items were rendered. With `evidence`, each item that has a
+    photo is followed by its evidence page; photos are fetched per chunk.
+    `fill` picks overlay stamping or form filling (default FILL_MODE).
+    Returns (part paths, pages, planner).
+    """
+    from pypdf import PdfWriter
+    t0 = time.perf_counter()
+
+    def time_limit():
+        # No estimate before the first chunk; it always runs, so resumes make progress.
+        if deadline is None or not planner.done:
+            return None
+        return deadline.units_left((time.perf_counter() - t0) * 1000 / planner.done)
+
+    planner = memory.ChunkPlanner(len(damaged), limit=time_limit)
+    form_fill = (fill or FILL_MODE) == "form"
+    parts, pages = [], 0
+    for start, end in planner:
+        chunk = damaged[start:end]
+        writer = PdfWriter()
+        kit = fill_kit(writer, tmpl) if form_fill else None
+        forms = kit[0] if kit else template_forms(writer, tmpl)
+        values = [_item_values(itm, root_name) for itm in chunk]
+        evidence_pages = None
+        if evidence:
+            with trace.phase("photo_fetch"):
+                found = photos.fetch(s3_client(), UPLOADS_BUCKET, chunk, EVIDENCE_PX, trace)
+            entries = [(v, found[itm.get("itemId")]) for itm, v in zip(chunk, values) if itm.get("itemId") in found]
+            if entries:
+                with trace.phase("evidence_render"):
+                    evidence_pages = iter(make_evidence(forms[0][1], forms[0][2], entries).pages)
+        for itm, v in zip(chunk, values):
+            pages += fill_into(writer, kit, v) if kit else stamp_into(writer, forms, v)
+            if evidence_pages is not None and itm.get("itemId") in found:
+                writer.add_page(next(evidence_pages))
+                pages += 1
+        planner.observe()
+        path = os.path.join(out_dir, f"part-{len(parts):04d}.pdf")
+        with trace.phase("part_write"), open(path, "wb") as f:
+            writer.write(f)
+        parts.append(path)
+        del writer, forms, kit
+    return parts, pages, planner
+
+def concat_parts(parts, out_path):
+    """
+    Join part files into out_path (a lone part is used as is); returns the
+    path. Every part, whether from a memory chunk or a resumed invocation,
+    embeds its own template form and fonts (and maybe the same photo), so
+    identical objects are always merged across parts.
+    """
+    if len(parts) == 1:
+        return parts[0]
+    from pypdf import PdfWriter
     writer = PdfWriter()
+    for part in parts:
+        writer.append(part)
+    # The forms only compare equal once their fonts have been merged,
+    # hence two passes.
+    for _ in range(2):
+        writer.compress_identical_objects(remove_identicals=True, remove_orphans=True)
+    with open(out_path, "wb") as f:
+        writer.write(f)
+    return out_path
+
+def export_2404(team_id, payload, trace=tracing.NULL_TRACE, context=None):
+    # Started before the reads so the caller's budgetMs covers them too.
+    deadline = checkpoint.Deadline(context, budget_ms=payload.get("budgetMs"))
+    with trace.phase("team_get"):
+        team_raw = ddb_get_team_raw(team_id)
+    team = decode_team(team_raw)
 
-    for itm in damaged:
-        values = to_pdf_values({
-            "name": root_name,
-            "actualName": itm.get("actualName") or itm.get("name"),
-            "serialNumber": itm.get("serialNumber"),
-            "damageReports": itm.get("damageReports")
-        })
-        stamped = stamp(tmpl, values)
-        for p in PdfReader(io.BytesIO(stamped)).pages:
-            writer.add_page(p)
+    root_name = team.get("name") or "N/A"
 
-    out = io.BytesIO()
-    writer.write(out)
-    pdf_bytes = out.getvalue()
+    evidence = payload.get("evidence")
+    evidence = EVIDENCE_PAGES if evidence is None else bool(evidence)
+    trace.set(evidence=evidence, fill=FILL_MODE)
 
     safe_team_name = (root_name or "team").replace(" ", "_").replace("/", "_")
-    file = f"2404_{safe_team_name}.pdf"
-    key = f"Documents/{team_id}/2404/{file}"
+    # Kept apart from the text-only form so neither evicts the other's cached copy.
+    file = f"2404_{safe_team_name}{'_evidence' if evidence else ''}.pdf"
     key = f"Documents/{team_id}/2404/{file}"
 
-    s3_put_pdf(UPLOADS_BUCKET, key, pdf_bytes)
-
-    url = s3_client().generate_presigned_url(
-        "get_object",
-        Params={"Bucket": UPLOADS_BUCKET, "Key": key},
-        ExpiresIn=3600
-    )
+    # The form is stamped with today's date, so an artifact from an earlier
+    # day is stale even if no item changed.
+    token = artifact_token(team_version(team_raw), root_name, _today(), *(("evidence",) if evidence else ()))
+
+    run = None
+    if payload.get("continuation"):
+        try:
+            run = checkpoint.Checkpoint.load(s3_client(), UPLOADS_BUCKET, team_id, "2404", payload["continuation"])
+        except ValueError as e:
+            return _resp(400, {"error": str(e)})
+        if (run.state.get("key"), run.state.get("token")) != (key, token):
+            # Items changed since the run started; start over so the PDF is consistent.
+            run.discard()
+            run = None
+            trace.set(restarted=True)
+        else:
+            trace.set(resumed=True)
+
+    artifacts = None
+    if run is None:
+        with trace.phase("freshness_check"):
+            artifacts = Manifest.load(s3_client(), UPLOADS_BUCKET, team_id)
+            fresh = not payload.get("force") and artifacts.is_fresh(key, token)
+        if fresh:
+            trace.set(unchanged=True)
+            with trace.phase("presign"):
+                url = presign(key)
+            return _resp(200, {
+                "ok": True,
+                "url": url,
+                "s3Key": key,
+                "teamId": team_id,
+                "unchanged": True,
+            })
+
+    with trace.phase("template_fetch"):
+        tmpl = read_template_bytes()
+    items = ddb_query_team_items(team_id, trace)
+
+    with trace.phase("filter"):
+        damaged = []
+        for itm in items:
+            status = (itm.get("status") or "").strip().lower()
+            if status == "damaged":
+                damaged.append(itm)
+        # itemId order (the Query's SK order) so a resumed run can pick up after its cursor.
+        damaged.sort(key=lambda itm: itm.get("itemId") or "")
+        total = len(damaged)
+        if run and run.cursor:
+            damaged = [itm for itm in damaged if (itm.get("itemId") or "") > run.cursor]
+    trace.count("damaged_items", len(damaged))
+
+    if not damaged and not (run and run.parts):
+        return _resp(200, {"ok": True, "message": "No damaged items"})
 
-    return _resp(200, {"ok": True, "url": url, "s3Key": key, "teamId": team_id})
+    with tempfile.TemporaryDirectory(prefix="export-2404-") as tmp:
+        with trace.phase("render", exclude=("part_write", "photo_fetch")):
+            parts, pages, planner = render_parts(
+                tmpl, damaged, root_name, tmp, trace, deadline, evidence, FILL_MODE)
+        trace.count("render_chunks", planner.chunks)
+        trace.set(rss_budget_mb=round(planner.budget, 1), render_rss_mb=round(planner.peak, 1))
+
+        if planner.done < len(damaged):
+            # Out of time: park the finished parts and hand back a continuation.
+            with trace.phase("checkpoint"):
+                if run is None:
+                    run = checkpoint.Checkpoint.start(
+                        s3_client(), UPLOADS_BUCKET, team_id, "2404", key=key, token=token)
+                for part in parts:
+                    run.add_part(part, ".pdf", "application/pdf")
+                run.save(damaged[planner.done - 1].get("itemId"), items=planner.done, pages=pages)
+            trace.set(continued=True)
+            return _resp(202, {
+                "ok": True,
+                "done": False,
+                "continuation": run.run_id,
+                "teamId": team_id,
+                "progress": {"items": run.counts["items"], "total": total},
+            })
+
+        with trace.phase("pdf_write"):
+            saved = run.fetch_parts(tmp) if run else []
+            path = concat_parts(saved + parts, os.path.join(tmp, file))
+        trace.count("pdf_pages", pages + (run.counts.get("pages", 0) if run else 0))
+        trace.count("pdf_bytes", os.path.getsize(path))
+
+        with trace.phase("upload"):
+            with open(path, "rb") as body:
+                s3_put_pdf(UPLOADS_BUCKET, key, body, token)
+        size = os.path.getsize(path)
+    if run:
+        run.discard()
+    with trace.phase("manifest"):
+        artifacts = artifacts or Manifest.load(s3_client(), UPLOADS_BUCKET, team_id)
+        artifacts.record(key, "2404-evidence" if evidence else "2404", token, size, trace)
+    with trace.phase("presign"):
+        url = presign(key)
+
+    return _resp(200, {"ok": True, "url": url, "s3Key": key, "teamId": team_id, "unchanged": False})
 
 main = lambda_handler
+
+
+def prime():
+    """
+    Front-load the hot path's one-time costs into the Lambda init phase
+    (which runs with boosted CPU): heavy imports, Helvetica metrics, boto3
+    clients with their endpoint rules loaded, and one throwaway stamp of
+    the bundled template so pypdf/reportlab code paths are warm.
+    Each step is independent; a failure is logged and the rest still run.
+    """
+    def fonts():
+        from reportlab.pdfbase import pdfmetrics
+        font = pdfmetrics.getFont(REMARKS_TABLE["font"])
+        font.stringWidth("Prime", REMARKS_TABLE["size"])
+
+    def warm_clients():
+        ddb_client()
+        s3_client().generate_presigned_url(
+            "get_object",
+            Params={"Bucket": UPLOADS_BUCKET or "prime", "Key": "prime"},
+            ExpiresIn=60
+        )
+
+    def template():
+        if (BUNDLED_TEMPLATE_PATH and os.path.isfile(BUNDLED_TEMPLATE_PATH)) or UPLOADS_BUCKET:
+            stamp(read_template_bytes(), to_pdf_values({"name": "prime", "damageReports": ["prime"]}))
+
+    for step in (fonts, warm_clients, template):
+        try:
+            step()
+        except Exception as e:
+            sys.stderr.write(f"2404 init priming ({step.__name__}) failed: {e}\n")
+
+
+if PRIME_ON_INIT:
+    prime()
@@ -0,0 +1,120 @@
+"""
+Checkpoint/resume tests for the 2404 export, run against the in-memory
+backends:
+
+    cd src/cdk && python -m pytest -q python_2404
+
+Invocations get a context with no time left, so every one renders only the
+first render chunk and hands back a continuation.
+"""
+import importlib.util
+import io
+import json
+import os
+import sys
+
+import pytest
+
+CDK_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [
+    os.path.join(CDK_DIR, "layers", "export-common", "python"),
+    os.path.join(CDK_DIR, "layers", "pdf-deps", "python"),
+    os.path.join(CDK_DIR, "bench"),
+]
+os.environ.update(TABLE_NAME="test-table", UPLOADS_BUCKET="test-bucket", SNAPSHOT_PREFIX="", EXPORT_TRACE="",
+                  EXPORT_PROFILE="", PRIME_ON_INIT="",
+                  BUNDLED_TEMPLATE_PATH=os.path.join(CDK_DIR, "templates", "2404-template.pdf"))
+
+from export_common import clients  # noqa: E402
+from export_common.local_backend import FakeContext, MemoryDynamoDB, MemoryS3  # noqa: E402
+from synthetic import make_team  # noqa: E402
+
+_spec = importlib.util.spec_from_file_location(
+    "handler_2404", os.path.join(os.path.dirname(os.path.abspath(__file__)), "2404_handler.py"))
+handler_2404 = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(handler_2404)
+
+
+@pytest.fixture
+def team():
+    meta, rows = make_team(200, team_id="resume")
+    meta["itemsVersion"] = {"N": "1"}
+    ddb, s3 = MemoryDynamoDB().load([meta] + rows), MemoryS3()
+    clients.use(ddb=ddb, s3=s3)
+    return ddb, s3, rows
+
+
+def invoke(context=None, **payload):
+    resp = handler_2404.lambda_handler({"teamId": "resume", "force": True, **payload}, context)
+    return resp["statusCode"], json.loads(resp["body"])
+
+
+def pdf_of(s3, body):
+    return s3.objects[("test-bucket", body["s3Key"])][0]
+
+
+def export(s3):
+    code, body = invoke()
+    assert code == 200, body
+    return pdf_of(s3, body)
+
+
+def resume(s3, continuation=None, max_invocations=100):
+    """Follow continuations to the end; returns (PDF, invocations)."""
+    for n in range(1, max_invocations + 1):
+        code, body = invoke(FakeContext(0), **({"continuation": continuation} if continuation else {}))
+        if code == 202:
+            continuation = body["continuation"]
+            continue
+        assert code == 200, body
+        return pdf_of(s3, body), n
+    raise AssertionError("export did not finish")
+
+
+def pages(data):
+    from pypdf import PdfReader
+
+    return [page.get_contents().get_data() for page in PdfReader(io.BytesIO(data)).pages]
+
+
+def rewritten(data):
+    """The PDF with its reachable objects renumbered, so merged parts compare equal."""
+    from pypdf import PdfReader, PdfWriter
+
+    out = io.BytesIO()
+    PdfWriter(clone_from=PdfReader(io.BytesIO(data))).write(out)
+    return out.getvalue()
+
+
+def checkpoint_keys(s3):
+    return [key for (_, key) in s3.objects if key.startswith("ops/exports/")]
+
+
+def test_resumed_export_matches_single_pass(team):
+    _, s3, _ = team
+    whole = export(s3)
+    resumed, invocations = resume(s3)
+    assert invocations > 2
+    assert pages(resumed) == pages(whole)
+    assert rewritten(resumed) == rewritten(whole)
+    assert not checkpoint_keys(s3)
+
+
+def test_continuation_is_discarded_after_items_version_bump(team):
+    ddb, s3, rows = team
+    code, body = invoke(FakeContext(0))
+    assert code == 202
+    first = body["continuation"]
+
+    damaged = next(r for r in rows if r["status"]["S"] == "Damaged")
+    ddb.update_item(TableName="test-table", Key={"PK": damaged["PK"], "SK": damaged["SK"]},
+                    UpdateExpression="SET actualName = :name, updatedAt = :now",
+                    ExpressionAttributeValues={":name": {"S": "Renamed after start"},
+                                               ":now": {"S": "2025-03-01T00:00:00.000Z"}})
+    ddb.update_item(TableName="test-table", Key={"PK": {"S": "TEAM#resume"}, "SK": {"S": "METADATA"}},
+                    UpdateExpression="ADD itemsVersion :one", ExpressionAttributeValues={":one": {"N": "1"}})
+
+    resumed, _ = resume(s3, first)
+    assert any(b"Renamed after start" in page for page in pages(resumed))
+    assert pages(resumed) == pages(export(s3))
+    assert not checkpoint_keys(s3)
@@ -0,0 +1,226 @@
+"""
+Backfill renditions for item photos uploaded before the images function.
+
+    PYTHONPATH=layers/export-common/python:layers/pdf-deps/python \
+        python3 python_images/backfill.py [teamId ...] [--workers N] [--inflight N]
+            [--s3-root DIR] [--seed ITEMS.json] [--dry-run]
+
+Lists items/<teamId>/ (every team under items/ when no teamId is given)
+and skips originals whose items already record a thumbnailKey, or that no
+item references. The rest go through images_handler.build_renditions in a
+process pool, since decoding, resizing and WebP encoding are CPU-bound.
+That step still skips the render when the content-addressed renditions
+already exist.
+
+At most --inflight originals (default 2 x --workers) are in flight. Each
+worker streams its original into a temp file that spills to disk past
+IMAGE_SPOOL_MB, so memory stays bounded by the in-flight count rather than
+the team size. Workers only touch S3. The parent records the keys on the
+items with the same conditional update as the function, so a photo that
+was replaced mid-run is left alone, and bumps each changed team's
+itemsVersion once at the end.
+
+--s3-root points at a DirectoryS3 tree, and --seed at a MemoryDynamoDB JSON
+file (see "Running exports offline"). Run this from a workstation or a
+container, not from Lambda: Lambda has no /dev/shm, so multiprocessing
+cannot create its locks. --workers 1 runs in-process.
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+
+from export_common import clients, dynamo, tracing, versioning
+
+import images_handler
+
+
+def _pages(**params):
+    while True:
+        resp = clients.s3().list_objects_v2(**params)
+        yield resp
+        if not resp.get("IsTruncated"):
+            return
+        params["ContinuationToken"] = resp["NextContinuationToken"]
+
+
+def list_teams():
+    for page in _pages(Bucket=images_handler.UPLOADS_BUCKET, Prefix="items/", Delimiter="/"):
+        for p in page.get("CommonPrefixes", []):
+            yield p["Prefix"].split("/")[1]
+
+
+def list_originals(team_id):
+    for page in _pages(Bucket=images_handler.UPLOADS_BUCKET, Prefix=f"items/{team_id}/"):
+        for obj in page.get("Contents", []):
+            yield obj["Key"], obj.get("Size", 0)
+
+
+def pending_items(team_id):
+    """{imageKey: [(itemId, imageEtag), ...]} for items without renditions; None when there is no table."""
+    if not images_handler.TABLE_NAME:
+        return None
+    out = {}
+    rows = dynamo.query_team_items(
+        clients.ddb(), images_handler.TABLE_NAME, team_id,
+        ProjectionExpression="itemId, imageKey, imageEtag, thumbnailKey",
+    )
+    for row in rows:
+        key = (row.get("imageKey") or {}).get("S")
+        item_id = (row.get("itemId") or {}).get("S")
+        if not key or not item_id:
+            continue
+        ids = out.setdefault(key, [])
+        if "thumbnailKey" not in row:
+            ids.append((item_id, (row.get("imageEtag") or {}).get("S")))
+    return out
+
+
+def _init_worker(bucket, table, s3_root):
+    # Don't reuse connections inherited from the parent across fork.
+    clients.reset()
+    images_handler.UPLOADS_BUCKET = bucket
+    images_handler.TABLE_NAME = table
+    if s3_root:
+        from export_common.local_backend import DirectoryS3
+
+        clients.use(s3=DirectoryS3(s3_root))
+
+
+def _work(team_id, key):
+    t0 = time.perf_counter()
+    try:
+        result = images_handler.build_renditions(team_id, key)
+    except Exception as e:
+        result = {"imageKey": key, "error": str(e)}
+    result["ms"] = round((time.perf_counter() - t0) * 1000, 1)
+    return result
+
+
+class _InProcess:
+    """Executor stand-in for --workers 1."""
+
+    def submit(self, fn, *args):
+        fut = Future()
+        fut.set_result(fn(*args))
+        return fut
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+def backfill(team_ids, workers, inflight, s3_root=None, dry_run=False, trace=tracing.NULL_TRACE, log=sys.stderr):
+    jobs = []
+    items_for = {}
+    with trace.phase("list"):
+        for team_id in team_ids:
+            pending = pending_items(team_id)
+            for key, size in list_originals(team_id):
+                trace.count("listed")
+                if pending is not None:
+                    if key not in pending:
+                        trace.count("unreferenced")
+                        continue
+                    if not pending[key]:
+                        trace.count("skipped")
+                        continue
+                    items_for[key] = (team_id, pending[key])
+                jobs.append((team_id, key, size))
+    trace.count("queued", len(jobs))
+    if dry_run or not jobs:
+        return
+
+    bumped = set()
+
+    def handle(result):
+        if "error" in result:
+            trace.count("failed")
+            log.write(f"{result['imageKey']}: {result['error']}\n")
+            return
+        trace.count("reused" if result["reused"] else "rendered")
+        trace.count("original_bytes", result.get("originalBytes", 0))
+        team_id, item_ids = items_for.get(result["imageKey"], (None, ()))
+        keys = {"thumb": result["thumbnailKey"], "medium": result["mediumKey"]}
+        for item_id, etag in item_ids:
+            if etag and etag != result.get("etag"):
+                trace.count("replaced_meanwhile")
+                continue
+            with trace.phase("ddb_update"):
+                ok = images_handler.record_renditions(team_id, item_id, result["imageKey"], keys, etag)
+            trace.count("recorded" if ok else "replaced_meanwhile")
+            if ok:
+                bumped.add(team_id)
+
+    init = (images_handler.UPLOADS_BUCKET, images_handler.TABLE_NAME, s3_root)
+    if workers > 1:
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=init)
+    else:
+        pool = _InProcess()
+    with pool, trace.phase("process"):
+        running = set()
+        for team_id, key, _ in jobs:
+            if len(running) >= inflight:
+                done, running = wait(running, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    handle(fut.result())
+            running.add(pool.submit(_work, team_id, key))
+        for fut in running:
+            handle(fut.result())
+    # Once per team rather than per item: the exports only need to see a change.
+    with trace.phase("version_bump"):
+        for team_id in sorted(bumped):
+            versioning.bump_items_version(clients.ddb(), images_handler.TABLE_NAME, team_id)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Build missing renditions for existing item photos.")
+    ap.add_argument("teamIds", nargs="*", help="teams to backfill (default: every team under items/)")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--inflight", type=int, help="originals in flight at once (default 2 x workers)")
+    ap.add_argument("--s3-root", metavar="DIR", help="use a DirectoryS3 tree instead of S3")
+    ap.add_argument("--seed", metavar="ITEMS.json", help="use an in-memory table loaded from this file")
+    ap.add_argument("--dry-run", action="store_true", help="list and count only")
+    args = ap.parse_args()
+
+    if args.s3_root:
+        from export_common.local_backend import DirectoryS3
+
+        clients.use(s3=DirectoryS3(args.s3_root))
+        images_handler.UPLOADS_BUCKET = images_handler.UPLOADS_BUCKET or "local"
+    if args.seed:
+        from export_common.local_backend import MemoryDynamoDB
+
+        clients.use(ddb=MemoryDynamoDB.from_json(args.seed))
+        images_handler.TABLE_NAME = images_handler.TABLE_NAME or "local"
+    if not images_handler.UPLOADS_BUCKET:
+        sys.stderr.write("UPLOADS_BUCKET is not set\n")
+        return 1
+
+    workers = max(1, args.workers)
+    trace = tracing.start("item-images-backfill", stream=sys.stderr, force=True, workers=workers)
+    t0 = time.perf_counter()
+    team_ids = [t.strip() for t in args.teamIds if t.strip()] or list(list_teams())
+    try:
+        backfill(team_ids, workers, args.inflight or 2 * workers, args.s3_root, args.dry_run, trace)
+    finally:
+        c = trace.counters
+        secs = time.perf_counter() - t0
+        done = c["rendered"] + c["reused"]
+        mb = c["original_bytes"] / 1048576.0
+        sys.stderr.write(
+            f"{len(team_ids)} teams, {c['listed']} originals:"
+            f" {c['skipped']} already done, {c['unreferenced']} unreferenced, {c['queued']} queued;"
+            f" {c['rendered']} rendered, {c['reused']} reused, {c['failed']} failed,"
+            f" {c['recorded']} items updated in {secs:.1f} s"
+            f" ({done / secs if secs else 0:.1f} images/s, {mb / secs if secs else 0:.1f} MB/s)\n"
+        )
+        trace.emit()
+    return 1 if c["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
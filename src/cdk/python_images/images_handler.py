@@ -0,0 +1,293 @@
+"""
+Item photo renditions.
+
+The API invokes this function asynchronously after it stores an item image
+under items/<teamId>/, with {"teamId", "imageKey", "itemId", "imageEtag"}. It writes a
+thumbnail and a medium rendition of the photo under
+
+    renditions/<teamId>/<sha256 of the original>/{thumb,medium}.<fmt>
+
+and records their keys on the item, so item lists can presign a ~20 KB
+thumbnail instead of the camera original. Keys come from the content hash,
+so re-uploading the same photo reuses the existing renditions.
+
+Photos are stored under a stable key, so the key alone can't tell whether
+the item still has the photo that was rendered. The API records each
+upload's ETag as the item's imageEtag and passes it along; the keys are
+only stored when the downloaded original has that ETag and the item still
+records it. Requests without one (S3 events, items from before imageEtag)
+fall back to matching imageKey.
+
+Recording renditions is an item write like any other: it sets updatedAt,
+so snapshot refreshes pick up mediumKey, and bumps the team's itemsVersion,
+so exports built before the renditions existed are not reused.
+
+JPEGs are decoded with Image.draft(), which lets libjpeg scale by 1/2, 1/4
+or 1/8 in the DCT domain instead of decoding every pixel of a 12 MP photo.
+EXIF orientation is applied and all metadata (EXIF, GPS, XMP) is dropped.
+Output is WebP, or AVIF when IMAGE_FORMAT=avif and Pillow has AVIF support.
+"""
+import base64
+import hashlib
+import io
+import json
+import os
+import sys
+import tempfile
+import warnings
+from datetime import datetime, timezone
+from urllib.parse import unquote_plus
+
+from export_common import clients, tracing, versioning
+
+UPLOADS_BUCKET = os.environ.get("UPLOADS_BUCKET", "").strip()
+TABLE_NAME = os.environ.get("TABLE_NAME", "").strip()
+RENDITION_PREFIX = os.environ.get("RENDITION_PREFIX", "renditions").strip().strip("/")
+IMAGE_FORMAT = os.environ.get("IMAGE_FORMAT", "webp").strip().lower()
+
+# Longest side in pixels, largest first: each rendition is scaled down from the previous one.
+SIZES = (("medium", 1024), ("thumb", 256))
+QUALITY = {"webp": 80, "avif": 55}
+# Content-addressed, so clients may cache them forever.
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Originals are streamed into memory up to this size, then spill to /tmp.
+SPOOL_BYTES = int(os.environ.get("IMAGE_SPOOL_MB", "16") or 16) * 1024 * 1024
+READ_CHUNK = 1024 * 1024
+
+CORS = {
+    "Access-Control-Allow-Origin": "*",
+    "Access-Control-Allow-Headers": "Content-Type,Authorization",
+    "Access-Control-Allow-Methods": "POST,OPTIONS,GET"
+}
+
+
+def s3():
+    return clients.s3()
+
+
+def ddb():
+    return clients.ddb()
+
+
+def _resp(code, body=None):
+    return {
+        "statusCode": code,
+        "headers": CORS,
+        "body": json.dumps(body or {})
+    }
+
+
+_format = None
+
+
+def output_format():
+    global _format
+    if _format is None:
+        _format = "webp"
+        if IMAGE_FORMAT == "avif":
+            from PIL import features
+
+            # features.check warns (rather than failing) when libavif can't be loaded.
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                if features.check("avif"):
+                    _format = "avif"
+    return _format
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def rendition_key(team_id, digest, name, fmt):
+    return f"{RENDITION_PREFIX}/{team_id}/{digest}/{name}.{fmt}"
+
+
+def render(data, fmt=None, sizes=SIZES):
+    """Return {name: (bytes, (width, height))} for each rendition in `sizes`; data is bytes or a file."""
+    from PIL import Image, ImageOps
+
+    fmt = fmt or output_format()
+    img = Image.open(io.BytesIO(data) if isinstance(data, (bytes, bytearray)) else data)
+    largest = max(size for _, size in sizes)
+    # Only JPEG (and MPO) decoders implement draft; elsewhere this is a no-op.
+    # The requested box is square so the scale holds whatever the orientation.
+    img.draft("RGB", (largest, largest))
+    img = ImageOps.exif_transpose(img)
+
+    mode = "RGBA" if img.mode in ("RGBA", "LA", "PA") or "transparency" in img.info else "RGB"
+    if img.mode != mode:
+        img = img.convert(mode)
+    # Drop EXIF/XMP (GPS, device serials); only the colour profile is carried over.
+    icc = img.info.get("icc_profile")
+    img.info = {}
+
+    out = {}
+    for name, size in sizes:
+        img.thumbnail((size, size), Image.Resampling.LANCZOS, reducing_gap=3.0)
+        buf = io.BytesIO()
+        params = {"quality": QUALITY.get(fmt, 80)}
+        if fmt == "webp":
+            params["method"] = 4
+        if icc:
+            params["icc_profile"] = icc
+        img.save(buf, format=fmt.upper(), **params)
+        out[name] = (buf.getvalue(), img.size)
+    return out
+
+
+def _exists(key):
+    try:
+        s3().head_object(Bucket=UPLOADS_BUCKET, Key=key)
+        return True
+    except Exception:
+        return False
+
+
+def _put(key, body, fmt):
+    params = {
+        "Bucket": UPLOADS_BUCKET,
+        "Key": key,
+        "Body": body,
+        "ContentType": f"image/{fmt}",
+        "CacheControl": CACHE_CONTROL,
+    }
+    kms = os.environ.get("KMS_KEY_ARN", "").strip()
+    if kms:
+        params["ServerSideEncryption"] = "aws:kms"
+        params["SSEKMSKeyId"] = kms
+    s3().put_object(**params)
+
+
+def record_renditions(team_id, item_id, image_key, keys, etag=None):
+    """Store rendition keys on the item unless its image was replaced meanwhile."""
+    condition = "imageKey = :imageKey"
+    values = {
+        ":thumb": {"S": keys["thumb"]},
+        ":medium": {"S": keys["medium"]},
+        ":imageKey": {"S": image_key},
+        ":now": {"S": datetime.now(timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z")},
+    }
+    if etag:
+        condition += " AND imageEtag = :etag"
+        values[":etag"] = {"S": etag}
+    try:
+        ddb().update_item(
+            TableName=TABLE_NAME,
+            Key={"PK": {"S": f"TEAM#{team_id}"}, "SK": {"S": f"ITEM#{item_id}"}},
+            UpdateExpression="SET thumbnailKey = :thumb, mediumKey = :medium, updatedAt = :now",
+            ConditionExpression=condition,
+            ExpressionAttributeValues=values,
+        )
+        return True
+    except Exception as e:
+        code = getattr(e, "response", {}).get("Error", {}).get("Code")
+        if code == "ConditionalCheckFailedException":
+            return False
+        raise
+
+
+def download(image_key):
+    """Stream an original into a spooled temp file, hashing as it arrives; returns (file, sha256, size, etag)."""
+    resp = s3().get_object(Bucket=UPLOADS_BUCKET, Key=image_key)
+    body = resp["Body"]
+    f = tempfile.SpooledTemporaryFile(max_size=SPOOL_BYTES)
+    h = hashlib.sha256()
+    for chunk in iter(lambda: body.read(READ_CHUNK), b""):
+        h.update(chunk)
+        f.write(chunk)
+    size = f.tell()
+    f.seek(0)
+    return f, h.hexdigest(), size, resp.get("ETag")
+
+
+def build_renditions(team_id, image_key, trace=tracing.NULL_TRACE):
+    """Render and upload an original's renditions unless they already exist."""
+    with trace.phase("fetch"):
+        f, digest, size, etag = download(image_key)
+    trace.count("original_bytes", size)
+    fmt = output_format()
+    keys = {name: rendition_key(team_id, digest, name, fmt) for name, _ in SIZES}
+
+    with f:
+        with trace.phase("exists_check"):
+            reused = all(_exists(key) for key in keys.values())
+        result = {"imageKey": image_key, "etag": etag, "hash": digest, "format": fmt, "reused": reused,
+                  "originalBytes": size, "thumbnailKey": keys["thumb"], "mediumKey": keys["medium"]}
+
+        if not reused:
+            with trace.phase("render"):
+                renditions = render(f, fmt)
+            with trace.phase("upload"):
+                for name, (body, dims) in renditions.items():
+                    _put(keys[name], body, fmt)
+                    trace.count(f"{name}_bytes", len(body))
+                    result[f"{name}Size"] = list(dims)
+    trace.set(reused=reused)
+    return result
+
+
+def process_image(team_id, image_key, item_id=None, image_etag=None, trace=tracing.NULL_TRACE):
+    result = build_renditions(team_id, image_key, trace)
+    keys = {"thumb": result["thumbnailKey"], "medium": result["mediumKey"]}
+    if item_id and TABLE_NAME:
+        if image_etag and result["etag"] != image_etag:
+            # Replaced after this request; the newer upload's request records its own.
+            result["recorded"] = False
+        else:
+            with trace.phase("ddb_update"):
+                result["recorded"] = record_renditions(team_id, item_id, image_key, keys, image_etag)
+            if result["recorded"]:
+                with trace.phase("version_bump"):
+                    versioning.bump_items_version(ddb(), TABLE_NAME, team_id)
+    return result
+
+
+def _requests(event):
+    """(teamId, imageKey, itemId, imageEtag) from a direct invoke, an API request or an S3 event."""
+    if isinstance(event, dict) and event.get("Records"):
+        for rec in event["Records"]:
+            key = unquote_plus(((rec.get("s3") or {}).get("object") or {}).get("key") or "")
+            parts = key.split("/")
+            if len(parts) >= 3 and parts[0] == "items":
+                yield parts[1], key, None, None
+        return
+    payload = event
+    if isinstance(event, dict) and "body" in event and "teamId" not in event:
+        raw = event.get("body") or "{}"
+        if event.get("isBase64Encoded"):
+            raw = base64.b64decode(raw).decode()
+        payload = json.loads(raw)
+    yield ((payload.get("teamId") or "").strip(), (payload.get("imageKey") or "").strip(),
+           payload.get("itemId"), payload.get("imageEtag"))
+
+
+def lambda_handler(event, context):
+    try:
+        requests = list(_requests(event))
+    except ValueError:
+        return _resp(400, {"error": "Invalid JSON"})
+
+    results = []
+    for team_id, image_key, item_id, image_etag in requests:
+        if not team_id or not image_key:
+            return _resp(400, {"error": "teamId and imageKey are required"})
+        # Only originals under the team's own prefix are processed.
+        if not image_key.startswith(f"items/{team_id}/"):
+            return _resp(400, {"error": "imageKey must be under items/<teamId>/"})
+
+        trace = tracing.start("item-images", teamId=team_id)
+        calls_before = dict(clients.stats)
+        try:
+            results.append(process_image(team_id, image_key, item_id, image_etag, trace))
+        except Exception as e:
+            sys.stderr.write(f"renditions for {image_key} failed: {e}\n")
+            return _resp(500, {"error": f"Rendition failed: {e}", "imageKey": image_key})
+        finally:
+            trace.count_all(clients.stats_delta(calls_before))
+            trace.emit()
+
+    return _resp(200, {"ok": True, "renditions": results})
+
+
+main = lambda_handler
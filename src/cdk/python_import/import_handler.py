@@ -0,0 +1,451 @@
+"""
+Bulk inventory import from the inventory export's CSV layout.
+
+    {"teamId", "userId", "csv": "<text>"}      or
+    {"teamId", "userId", "s3Key": "imports/<teamId>/<file>.csv"}
+    [, "status": "Completed"] [, "dryRun": true]
+
+An s3Key ending in .pdf is a legacy hand receipt instead: pdf_import
+extracts candidate items from it and returns them with a review CSV in
+this layout, without writing anything.
+
+The file is a series of groups, as inventory_handler writes them:
+
+    FE,UIC,Desc,End Item NIIN,LIN,Desc
+    <fe>,<uic>,<team>,<niin>,<lin>,<end item description>
+
+    Name,Material,LV,Description,Auth Qty,OH Qty
+    <name>,<nsn>,A,...
+    <name>,<nsn>,B,...
+
+Each group's rows carry its End Item NIIN and LIN. LV gives the depth in
+the kit tree: an item's parent is the nearest row above it one letter
+lower, and rows with children become kits. FE/UIC/team columns belong to
+the team and are ignored. Items start as "To Review", like createItem's
+default, unless the request sets another status.
+
+Duplicates are checked the way createItem checks them (NSN among items,
+End Item NIIN among kits), against an index built from one paginated read
+of the team partition instead of a Query per row, and within the file.
+Any parse error or duplicate rejects the whole import; dryRun returns the
+same report without writing. Rows are written with BatchWriteItem, 25 per
+request and EXPORT_MAX_WORKERS requests in flight, and the team's
+itemsVersion is bumped once at the end (a bump that still fails after
+retries fails the import with a 500). When a write fails partway, the
+rows that landed are deleted again, so a retry isn't rejected as
+duplicates of them; any that could not be deleted are listed in the 500.
+"""
+import base64
+import csv
+import io
+import json
+import os
+import secrets
+import sys
+from datetime import datetime, timezone
+
+from export_common import clients, tracing, versioning
+from export_common.dynamo import (
+    BatchWriteError, batch_delete_items, batch_write_items, get_team_metadata, query_team_items,
+)
+from export_common.records import decode_team
+
+TABLE_NAME = os.environ.get("TABLE_NAME", "").strip()
+UPLOADS_BUCKET = os.environ.get("UPLOADS_BUCKET", "").strip()
+# Errors returned per request; the rest are only counted.
+MAX_ERRORS = 100
+STATUSES = ("To Review", "Completed", "Damaged", "Shortages")
+
+GROUP_HEADER = ["fe", "uic", "desc", "end item niin", "lin", "desc"]
+ITEM_HEADER = ["name", "material", "lv", "description", "auth qty", "oh qty"]
+
+CORS = {
+    "Access-Control-Allow-Origin": "*",
+    "Access-Control-Allow-Headers": "Content-Type,Authorization",
+    "Access-Control-Allow-Methods": "POST,OPTIONS,GET"
+}
+
+
+def s3():
+    return clients.s3()
+
+
+def ddb():
+    return clients.ddb()
+
+
+def _resp(code, body=None):
+    return {
+        "statusCode": code,
+        "headers": CORS,
+        "body": json.dumps(body or {})
+    }
+
+
+def _norm(value):
+    return (value or "").strip().lower()
+
+
+def _qty(value, line, errors):
+    value = (value or "").strip()
+    if not value:
+        return 1
+    try:
+        return int(value)
+    except ValueError:
+        errors.append({"line": line, "error": f"quantity {value!r} is not a whole number"})
+        return None
+
+
+def parse_inventory_csv(text):
+    """
+    Groups from an inventory CSV: [{"line", "niin", "lin", "desc", "rows"}],
+    each row {"line", "name", "nsn", "lv", "description", "authQuantity",
+    "ohQuantity"}. Returns (groups, errors); line numbers are 1-based.
+    """
+    groups, errors = [], []
+    group = None
+    state = "start"
+    for line, row in enumerate(csv.reader(io.StringIO(text.lstrip("﻿"))), 1):
+        cells = [c.strip() for c in row]
+        if not any(cells):
+            continue
+        key = [c.lower() for c in cells[:6]]
+        if key == GROUP_HEADER:
+            state = "group"
+            continue
+        if key == ITEM_HEADER:
+            if group is None:
+                errors.append({"line": line, "error": "item table before any FE/UIC group header"})
+            state = "items"
+            continue
+        cells += [""] * (6 - len(cells))
+        if state == "group":
+            group = {"line": line, "niin": cells[3], "lin": cells[4], "desc": cells[5], "rows": []}
+            groups.append(group)
+            state = "header_done"
+        elif state == "items" and group is not None:
+            name, nsn, lv, desc, auth, oh = cells[:6]
+            if not name:
+                errors.append({"line": line, "error": "Name is required"})
+            group["rows"].append({
+                "line": line, "name": name, "nsn": nsn, "lv": lv.upper(), "description": desc,
+                "authQuantity": _qty(auth, line, errors), "ohQuantity": _qty(oh, line, errors),
+            })
+        else:
+            errors.append({"line": line, "error": "expected an FE/UIC or Name/Material header row"})
+    return groups, errors
+
+
+def build_items(groups, team_id, user_id, user_name, now, status="To Review"):
+    """
+    Item rows (plain dicts in the API's createItem shape) for parsed groups,
+    with parent links rebuilt from LV. Returns (items, errors).
+    """
+    items, errors = [], []
+    for group in groups:
+        stack = []  # stack[d] = the latest item at depth d
+        for row in group["rows"]:
+            lv = row["lv"]
+            if len(lv) != 1 or not "A" <= lv <= "Z":
+                errors.append({"line": row["line"], "error": f"LV {lv!r} must be a letter A-Z"})
+                continue
+            depth = ord(lv) - ord("A")
+            if depth > len(stack):
+                errors.append({"line": row["line"], "error": f"LV {lv} has no LV {chr(ord(lv) - 1)} row above it"})
+                continue
+            del stack[depth:]
+            parent = stack[-1] if stack else None
+            if parent is not None:
+                parent["isKit"] = True
+            # Same length and alphabet as the API's newId(12).
+            item_id = secrets.token_urlsafe(12)
+            item = {
+                "PK": f"TEAM#{team_id}",
+                "SK": f"ITEM#{item_id}",
+                "Type": "Item",
+                "teamId": team_id,
+                "itemId": item_id,
+                "name": row["name"],
+                "actualName": group["desc"] if depth == 0 and group["desc"] else None,
+                "description": row["description"] or None,
+                "status": status,
+                "parent": parent["itemId"] if parent else None,
+                "isKit": False,
+                "nsn": row["nsn"] or None,
+                "authQuantity": row["authQuantity"],
+                "ohQuantity": row["ohQuantity"],
+                "liin": group["lin"],
+                "endItemNiin": group["niin"],
+                "damageReports": [],
+                "createdAt": now,
+                "updatedAt": now,
+                "createdBy": user_id,
+                "updateLog": [{"userId": user_id, "userName": user_name or "Unknown", "action": "import",
+                               "timestamp": now}],
+                "_line": row["line"],
+            }
+            stack.append(item)
+            items.append(item)
+    return items, errors
+
+
+def team_index(team_id, trace=tracing.NULL_TRACE):
+    """Existing item NSNs and kit End Item NIINs (normalized), from one paginated read."""
+    nsns, kit_niins = set(), set()
+    rows = query_team_items(
+        ddb(), TABLE_NAME, team_id,
+        on_page=lambda _: trace.count("index_pages"),
+        ProjectionExpression="nsn, endItemNiin, isKit",
+    )
+    for row in rows:
+        trace.count("index_rows")
+        if (row.get("isKit") or {}).get("BOOL"):
+            niin = _norm((row.get("endItemNiin") or {}).get("S"))
+            if niin:
+                kit_niins.add(niin)
+        else:
+            nsn = _norm((row.get("nsn") or {}).get("S"))
+            if nsn:
+                nsns.add(nsn)
+    return nsns, kit_niins
+
+
+def find_duplicates(items, nsns, kit_niins):
+    """createItem's uniqueness rules, against the team and within the import."""
+    errors = []
+    seen_nsn, seen_niin = {}, {}
+    for item in items:
+        line = item["_line"]
+        if item["isKit"]:
+            # A group's kits share its End Item NIIN; it must be new to the team and to the file.
+            niin = _norm(item["endItemNiin"])
+            group = (niin, _norm(item["liin"]))
+            if niin and niin in kit_niins:
+                errors.append({"line": line, "error": f'A kit with End Item NIIN "{item["endItemNiin"]}" already exists.'})
+            elif niin and seen_niin.setdefault(niin, (group, line))[0] != group:
+                errors.append({"line": line, "error": f'End Item NIIN "{item["endItemNiin"]}" is also used by the kit'
+                                                      f' on line {seen_niin[niin][1]}.'})
+        else:
+            nsn = _norm(item["nsn"])
+            if nsn and nsn in nsns:
+                errors.append({"line": line, "error": f'An item with NSN "{item["nsn"]}" already exists.'})
+            elif nsn and seen_nsn.setdefault(nsn, line) != line:
+                errors.append({"line": line, "error": f'NSN "{item["nsn"]}" is also on line {seen_nsn[nsn]}.'})
+    return errors
+
+
+def _av(value):
+    if value is None:
+        return {"NULL": True}
+    if isinstance(value, bool):
+        return {"BOOL": value}
+    if isinstance(value, (int, float)):
+        return {"N": str(value)}
+    if isinstance(value, list):
+        return {"L": [_av(v) for v in value]}
+    if isinstance(value, dict):
+        return {"M": {k: _av(v) for k, v in value.items()}}
+    return {"S": str(value)}
+
+
+def to_row(item):
+    """DynamoDB row for an item; unset optional attributes are left out, as the API's marshalling does."""
+    return {k: _av(v) for k, v in item.items()
+            if not k.startswith("_") and (v is not None or k == "parent")}
+
+
+def _user_name(user_id):
+    if not user_id:
+        return None
+    resp = ddb().get_item(TableName=TABLE_NAME, Key={"PK": {"S": f"USER#{user_id}"}, "SK": {"S": "METADATA"}})
+    return ((resp.get("Item") or {}).get("name") or {}).get("S")
+
+
+def bump_items_version(team_id):
+    """Once for the whole import; raises when it still fails after retries."""
+    versioning.bump_items_version(ddb(), TABLE_NAME, team_id)
+
+
+def roll_back(keys):
+    """Delete the rows of a failed import; returns the itemIds that may still be live."""
+    try:
+        batch_delete_items(ddb(), TABLE_NAME, keys, workers=clients.MAX_WORKERS)
+        return []
+    except BatchWriteError as e:
+        deleted = set(e.applied)
+        return [sk.split("#", 1)[1] for pk, sk in keys if (pk, sk) not in deleted]
+
+
+def _source_key(team_id, payload):
+    key = (payload.get("s3Key") or "").strip()
+    if not key:
+        raise ValueError("csv or s3Key is required")
+    if not key.startswith(f"imports/{team_id}/"):
+        raise ValueError("s3Key must be under imports/<teamId>/")
+    return key
+
+
+def _read_source(team_id, payload):
+    if payload.get("csv") is not None:
+        return str(payload["csv"])
+    key = _source_key(team_id, payload)
+    return s3().get_object(Bucket=UPLOADS_BUCKET, Key=key)["Body"].read().decode("utf-8-sig")
+
+
+def _report(groups, items, errors, **extra):
+    return {
+        "groups": len(groups),
+        "items": len(items),
+        "kits": sum(1 for item in items if item["isKit"]),
+        "errorCount": len(errors),
+        "errors": errors[:MAX_ERRORS],
+        **extra,
+    }
+
+
+def review_pdf(team_id, key, user_id, user_name, team_name, now, trace=tracing.NULL_TRACE):
+    """Candidates and a review CSV from a PDF hand receipt, checked like a dryRun of that CSV."""
+    import pdf_import
+
+    candidates, stats = pdf_import.extract_candidates(s3(), UPLOADS_BUCKET, team_id, key, trace)
+    trace.count("candidates", len(candidates))
+    with trace.phase("parse"):
+        text = pdf_import.review_csv(candidates, team_name)
+        groups, errors = parse_inventory_csv(text)
+        items, build_errors = build_items(groups, team_id, user_id, user_name, now)
+        errors += build_errors
+    if items:
+        with trace.phase("index"):
+            nsns, kit_niins = team_index(team_id, trace)
+        with trace.phase("validate"):
+            errors += find_duplicates(items, nsns, kit_niins)
+    errors.sort(key=lambda e: e["line"])
+    return _resp(200, {
+        "ok": True,
+        "review": True,
+        "csv": text,
+        "candidateCount": len(candidates),
+        "candidates": candidates[:pdf_import.MAX_CANDIDATES],
+        **stats,
+        **_report(groups, items, errors),
+    })
+
+
+def import_inventory(team_id, payload, trace=tracing.NULL_TRACE):
+    if not TABLE_NAME:
+        return _resp(500, {"error": "TABLE_NAME env var is not set"})
+    user_id = (payload.get("userId") or "").strip()
+    if not user_id:
+        return _resp(400, {"error": "userId is required"})
+    status = payload.get("status") or "To Review"
+    if status not in STATUSES:
+        return _resp(400, {"error": f"status must be one of {', '.join(STATUSES)}"})
+    dry_run = bool(payload.get("dryRun"))
+    trace.set(dry_run=dry_run)
+
+    pdf_key = None
+    with trace.phase("read"):
+        try:
+            if payload.get("csv") is None and (payload.get("s3Key") or "").strip().lower().endswith(".pdf"):
+                pdf_key = _source_key(team_id, payload)
+            else:
+                text = _read_source(team_id, payload)
+        except ValueError as e:
+            return _resp(400, {"error": str(e)})
+    with trace.phase("team_get"):
+        team = get_team_metadata(ddb(), TABLE_NAME, team_id)
+        if not team:
+            return _resp(404, {"error": "Team not found"})
+        user_name = _user_name(user_id)
+
+    now = datetime.now(timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z")
+    if pdf_key:
+        trace.set(source="pdf")
+        return review_pdf(team_id, pdf_key, user_id, user_name, decode_team(team).get("name") or "", now, trace)
+    with trace.phase("parse"):
+        groups, errors = parse_inventory_csv(text)
+        items, build_errors = build_items(groups, team_id, user_id, user_name, now, status)
+        errors += build_errors
+    trace.count("groups", len(groups))
+    trace.count("items", len(items))
+    if errors:
+        errors.sort(key=lambda e: e["line"])
+        return _resp(400, {"ok": False, **_report(groups, items, errors)})
+    if not items:
+        return _resp(400, {"error": "No items found in the file"})
+
+    with trace.phase("index"):
+        nsns, kit_niins = team_index(team_id, trace)
+    with trace.phase("validate"):
+        errors = find_duplicates(items, nsns, kit_niins)
+    if errors:
+        return _resp(409, {"ok": False, **_report(groups, items, errors)})
+    if dry_run:
+        return _resp(200, {"ok": True, "dryRun": True, **_report(groups, items, errors)})
+
+    with trace.phase("write"):
+        rows = [to_row(item) for item in items]
+        try:
+            written = batch_write_items(ddb(), TABLE_NAME, rows, workers=clients.MAX_WORKERS)
+        except BatchWriteError as e:
+            sys.stderr.write(f"import for {team_id} failed after {len(e.applied)} rows: {e}\n")
+            keys = e.applied + e.unknown
+            with trace.phase("rollback"):
+                left = roll_back(keys)
+            trace.count("rolled_back", len(keys) - len(left))
+            # An export may have read the rows in between.
+            stale = ""
+            try:
+                bump_items_version(team_id)
+            except Exception as bump_error:
+                stale = f"; itemsVersion not bumped, exports may be stale: {bump_error}"
+            if left:
+                return _resp(500, {"error": f"Import failed: {e}; {len(left)} items may have been written "
+                                            f"and could not be removed{stale}", "written": len(left), "itemIds": left})
+            return _resp(500, {"error": f"Import failed: {e}; nothing was imported{stale}", "written": 0})
+    trace.count("written", written)
+    with trace.phase("version_bump"):
+        try:
+            bump_items_version(team_id)
+        except Exception as e:
+            return _resp(500, {"error": f"Imported {written} items, but itemsVersion was not bumped, "
+                                        f"so exports may be stale: {e}", "written": written})
+    return _resp(200, {"ok": True, "written": written, **_report(groups, items, errors)})
+
+
+def lambda_handler(event, context):
+    payload = event
+    if isinstance(event, dict) and "body" in event and "teamId" not in event:
+        method = ((event.get("requestContext") or {}).get("http", {}).get("method") or event.get("httpMethod") or "")
+        if method.upper() == "OPTIONS":
+            return _resp(200, {})
+        if method.upper() == "GET":
+            return _resp(200, {"ok": True, "service": "inventory-import"})
+        raw = event.get("body") or "{}"
+        if event.get("isBase64Encoded"):
+            raw = base64.b64decode(raw).decode()
+        try:
+            payload = json.loads(raw)
+        except ValueError:
+            return _resp(400, {"error": "Invalid JSON"})
+    if not isinstance(payload, dict):
+        return _resp(400, {"error": "Invalid JSON"})
+
+    team_id = (payload.get("teamId") or "").strip()
+    if not team_id:
+        return _resp(400, {"error": "teamId is required"})
+
+    trace = tracing.start("inventory-import", teamId=team_id)
+    calls_before = dict(clients.stats)
+    try:
+        return import_inventory(team_id, payload, trace)
+    except Exception as e:
+        sys.stderr.write(f"import for {team_id} failed: {e}\n")
+        return _resp(500, {"error": f"Import failed: {e}"})
+    finally:
+        trace.count_all(clients.stats_delta(calls_before))
+        trace.emit()
+
+
+main = lambda_handler
@@ -0,0 +1,396 @@
+"""
+Candidate items from legacy PDF hand receipts, for review before import.
+
+    {"teamId", "userId", "s3Key": "imports/<teamId>/<file>.pdf"}
+
+The upload is streamed to /tmp and read with pypdf, which loads each page's
+objects only when that page is touched. Every page is keyed by a content
+digest: its decoded content stream plus its resources (fonts, ToUnicode
+maps, form XObjects; image data is left out). Text already extracted for a
+digest comes from a per-container LRU, then from
+imports/<teamId>/.cache/text/, so a re-upload only reads its pages. The
+remaining pages go to PageObject.extract_text() in IMPORT_PDF_WORKERS
+forked processes, each opening the file itself and sending its pages' text
+back over a pipe. Lambda has no /dev/shm, so multiprocessing.Pool and
+ProcessPoolExecutor cannot create their locks, but plain Processes and
+Pipes work.
+
+Text is parsed in page order as it arrives. A line with an NSN (with or
+without dashes) is an item; the words before it are the name, and after it
+come an optional LV letter, the description, an optional unit of issue and
+up to two quantities (Auth, OH). A line with a 9-digit End Item NIIN and a
+LIN starts a group, as in the inventory export's FE/UIC header. Pages with
+no text layer (scans that were never OCR'd) are reported, not guessed at.
+
+Nothing is written to the table. The response carries the candidates with
+their page numbers and a review CSV in the CSV import's layout; its report
+(LV, duplicate NSN/End Item NIIN) points at lines of that CSV, which the
+user corrects and sends back through the CSV import.
+"""
+import hashlib
+import multiprocessing
+import os
+import re
+import sys
+import tempfile
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing.connection import wait
+
+from export_common import clients, tracing
+
+# Candidates returned inline; the review CSV always has all of them.
+MAX_CANDIDATES = 2000
+PAGES_PER_WORKER = 4
+DOWNLOAD_CHUNK = 1024 * 1024
+# Lambda gives one vCPU per 1,769 MB of memory.
+MB_PER_VCPU = 1769
+
+NSN_RE = re.compile(r"(?<![\d-])(\d{4})-?(\d{2})-?(\d{3})-?(\d{4})(?![\d-])")
+GROUP_RE = re.compile(r"(?<!\d)(\d{9})(?!\d)\s+([A-Z][A-Z0-9]\d{4})\b\s*(.*)$")
+QTY_RE = re.compile(r"(?:^|\s)(\d{1,6})$")
+LV_RE = re.compile(r"^([A-Z])(?:\s+|$)")
+UNITS = {"EA", "KT", "SE", "PR", "BX", "PG", "RO", "CO", "AY", "HD", "DZ", "GL", "FT", "LB"}
+
+_TEXT = OrderedDict()
+_TEXT_MAX_BYTES = int(os.environ.get("IMPORT_TEXT_CACHE_BYTES", str(16 * 1024 * 1024)))
+_text_bytes = 0
+
+
+def workers():
+    configured = os.environ.get("IMPORT_PDF_WORKERS", "").strip()
+    if configured:
+        return max(1, int(configured))
+    cpus = os.cpu_count() or 1
+    function_mb = os.environ.get("AWS_LAMBDA_FUNCTION_MEMORY_SIZE", "").strip()
+    if function_mb:
+        cpus = min(cpus, max(1, int(function_mb) // MB_PER_VCPU))
+    return cpus
+
+
+def _cache_salt():
+    import pypdf
+
+    # Text depends on the extractor as well as the page.
+    return f"pypdf-{pypdf.__version__}/plain\n".encode()
+
+
+def _canon(obj, h, seen):
+    """Feed a PDF object into h, resolving references; images and embedded font programs are skipped."""
+    from pypdf.generic import ArrayObject, DictionaryObject, IndirectObject, StreamObject
+
+    if isinstance(obj, IndirectObject):
+        ref = (obj.idnum, obj.generation)
+        digest = seen.get(ref)
+        if digest is None:
+            seen[ref] = b"cycle"
+            sub = hashlib.sha256()
+            _canon(obj.get_object(), sub, seen)
+            digest = seen[ref] = sub.digest()
+        h.update(digest)
+    elif isinstance(obj, DictionaryObject):
+        image = obj.get("/Subtype") == "/Image"
+        h.update(b"<<")
+        for key in sorted(obj):
+            if key in ("/Parent", "/FontFile", "/FontFile2", "/FontFile3") or (image and key not in ("/Width", "/Height")):
+                continue
+            h.update(key.encode())
+            _canon(obj[key], h, seen)
+        if isinstance(obj, StreamObject) and not image:
+            h.update(hashlib.sha256(obj.get_data()).digest())
+        h.update(b">>")
+    elif isinstance(obj, ArrayObject):
+        h.update(b"[")
+        for value in obj:
+            _canon(value, h, seen)
+        h.update(b"]")
+    else:
+        h.update(repr(obj).encode())
+
+
+def page_digest(page, seen, salt=b""):
+    h = hashlib.sha256(salt)
+    contents = page.get_contents()
+    h.update(contents.get_data() if contents is not None else b"")
+    _canon(page.get("/Resources"), h, seen)
+    return h.hexdigest()
+
+
+def _cache_put(digest, text):
+    global _text_bytes
+    old = _TEXT.pop(digest, None)
+    if old is not None:
+        _text_bytes -= len(old)
+    _TEXT[digest] = text
+    _text_bytes += len(text)
+    while _text_bytes > _TEXT_MAX_BYTES and _TEXT:
+        _, old = _TEXT.popitem(last=False)
+        _text_bytes -= len(old)
+
+
+def cache_key(team_id, digest):
+    return f"imports/{team_id}/.cache/text/{digest}.txt"
+
+
+def cached_texts(s3, bucket, team_id, digests, trace=tracing.NULL_TRACE):
+    """{digest: text} from the container LRU, then S3."""
+    found, misses = {}, []
+    for digest in set(digests):
+        text = _TEXT.get(digest)
+        if text is None:
+            misses.append(digest)
+            continue
+        _TEXT.move_to_end(digest)
+        found[digest] = text
+        trace.count("text_cache_hits")
+
+    def load(digest):
+        try:
+            return s3.get_object(Bucket=bucket, Key=cache_key(team_id, digest))["Body"].read().decode("utf-8")
+        except Exception:
+            return None
+
+    if misses:
+        with ThreadPoolExecutor(max_workers=min(clients.MAX_WORKERS, len(misses))) as pool:
+            for digest, text in zip(misses, pool.map(load, misses)):
+                if text is not None:
+                    trace.count("text_s3_hits")
+                    found[digest] = text
+                    _cache_put(digest, text)
+    return found
+
+
+def store_texts(s3, bucket, team_id, texts):
+    def put(item):
+        digest, text = item
+        try:
+            s3.put_object(Bucket=bucket, Key=cache_key(team_id, digest), Body=text.encode("utf-8"),
+                          ContentType="text/plain; charset=utf-8")
+        except Exception as e:
+            # A missing cache entry only costs a re-extraction next time.
+            sys.stderr.write(f"text cache {digest} not written: {e}\n")
+
+    for digest, text in texts.items():
+        _cache_put(digest, text)
+    if texts:
+        with ThreadPoolExecutor(max_workers=min(clients.MAX_WORKERS, len(texts))) as pool:
+            list(pool.map(put, texts.items()))
+
+
+def _extract(reader, index):
+    try:
+        return index, reader.pages[index].extract_text(), None
+    except Exception as e:
+        return index, None, str(e)
+
+
+def _worker(path, pages, conn):
+    from pypdf import PdfReader
+
+    try:
+        reader = PdfReader(path)
+        for index in pages:
+            conn.send(_extract(reader, index))
+    finally:
+        conn.close()
+
+
+def extract_pages(path, pages, n_workers):
+    """Yields (page index, text, error) for `pages`, in completion order."""
+    n_workers = min(n_workers, -(-len(pages) // PAGES_PER_WORKER))
+    if n_workers <= 1:
+        from pypdf import PdfReader
+
+        reader = PdfReader(path)
+        for index in pages:
+            yield _extract(reader, index)
+        return
+
+    ctx = multiprocessing.get_context("fork")
+    procs, conns, pending = [], [], set(pages)
+    for k in range(n_workers):
+        recv, send = ctx.Pipe(duplex=False)
+        proc = ctx.Process(target=_worker, args=(path, pages[k::n_workers], send), daemon=True)
+        proc.start()
+        send.close()
+        procs.append(proc)
+        conns.append(recv)
+    try:
+        while conns:
+            for conn in wait(conns):
+                try:
+                    result = conn.recv()
+                except EOFError:
+                    conns.remove(conn)
+                    continue
+                pending.discard(result[0])
+                yield result
+    finally:
+        for proc in procs:
+            proc.join(timeout=1)
+            if proc.is_alive():
+                proc.kill()
+    for index in sorted(pending):
+        # Its worker died (out of memory, most likely) before sending it.
+        yield index, None, "extraction worker exited"
+
+
+def _qtys(rest):
+    qtys = []
+    while len(qtys) < 2:
+        m = QTY_RE.search(rest)
+        if not m:
+            break
+        qtys.insert(0, int(m.group(1)))
+        rest = rest[:m.start()]
+    return rest.strip(), qtys
+
+
+def parse_line(line):
+    """("item", candidate) / ("group", (niin, lin, desc)) / ("heading", None) / None for one line of text."""
+    line = " ".join(line.split())
+    m = NSN_RE.search(line)
+    if m is None:
+        g = GROUP_RE.search(line)
+        if g:
+            return "group", g.groups()
+        return ("heading", None) if "END ITEM NIIN" in line.upper() else None
+    nsn = "-".join(m.groups())
+    before, rest = line[:m.start()].strip(), line[m.end():].strip()
+    lv = None
+    lv_m = LV_RE.match(rest)
+    if lv_m:
+        lv, rest = lv_m.group(1), rest[lv_m.end():]
+    rest, qtys = _qtys(rest)
+    words = rest.split()
+    if words and words[-1] in UNITS:
+        rest = " ".join(words[:-1])
+    if not before:
+        # DA 2062 order: stock number, then the item description.
+        before, rest = rest, ""
+    if not before:
+        return None
+    auth = qtys[0] if qtys else None
+    return "item", {
+        "name": before, "nsn": nsn, "lv": lv, "description": rest,
+        "authQuantity": auth, "ohQuantity": qtys[1] if len(qtys) > 1 else auth,
+    }
+
+
+def parse_page(text, page, state, candidates):
+    """Appends the page's candidates; `state` carries the current group across pages."""
+    for n, line in enumerate((text or "").splitlines(), 1):
+        kind, value = parse_line(line) or (None, None)
+        if kind == "heading":
+            state["heading"] = True
+            continue
+        if state.pop("heading", False) and kind != "group":
+            # The row under an End Item NIIN heading starts a group even when it has no NIIN.
+            state["group"] = None
+            if kind is None:
+                continue
+        if kind == "group":
+            state["group"] = value
+            continue
+        if kind is None:
+            continue
+        niin, lin, desc = state.get("group") or ("", "", "")
+        candidates.append({"page": page, "line": n, **value, "endItemNiin": niin, "liin": lin, "endItemDesc": desc})
+
+
+def _cell(value):
+    value = "" if value is None else str(value)
+    return '"' + value.replace('"', '""') + '"' if any(c in value for c in ',"\n') else value
+
+
+def review_csv(candidates, team_name=""):
+    """Candidates in the CSV import's layout, grouped by (End Item NIIN, LIN) in order of appearance."""
+    groups = OrderedDict()
+    for c in candidates:
+        groups.setdefault((c["endItemNiin"], c["liin"]), (c["endItemDesc"], []))[1].append(c)
+    lines = []
+    for (niin, lin), (desc, rows) in groups.items():
+        lines += ["FE,UIC,Desc,End Item NIIN,LIN,Desc", ",".join(map(_cell, ["", "", team_name, niin, lin, desc])), "",
+                  "Name,Material,LV,Description,Auth Qty,OH Qty"]
+        for c in rows:
+            lines.append(",".join(map(_cell, [c["name"], c["nsn"], c["lv"] or "A", c["description"],
+                                              c["authQuantity"], c["ohQuantity"]])))
+        lines.append("")
+    return "\n".join(lines)
+
+
+def download(s3, bucket, key, f):
+    """Streams an object into an open file; returns its size."""
+    body = s3.get_object(Bucket=bucket, Key=key)["Body"]
+    size = 0
+    while True:
+        chunk = body.read(DOWNLOAD_CHUNK)
+        if not chunk:
+            return size
+        f.write(chunk)
+        size += len(chunk)
+
+
+def extract_candidates(s3, bucket, team_id, key, trace=tracing.NULL_TRACE):
+    """(candidates, stats) for the PDF at key."""
+    from pypdf import PdfReader
+
+    with tempfile.NamedTemporaryFile(prefix="import-", suffix=".pdf", dir=tempfile.gettempdir()) as f:
+        with trace.phase("download"):
+            trace.count("pdf_bytes", download(s3, bucket, key, f))
+            f.flush()
+
+        with trace.phase("digest"):
+            reader = PdfReader(f.name)
+            seen, salt = {}, _cache_salt()
+            digests = [page_digest(page, seen, salt) for page in reader.pages]
+            del reader, seen
+        trace.count("pages", len(digests))
+
+        with trace.phase("cache"):
+            texts = cached_texts(s3, bucket, team_id, digests, trace)
+        todo, queued = [], set()
+        for i, digest in enumerate(digests):
+            # Identical pages (repeated cover sheets) are extracted once.
+            if digest not in texts and digest not in queued:
+                queued.add(digest)
+                todo.append(i)
+        n_workers = workers()
+        trace.set(pdf_workers=n_workers)
+
+        candidates, state, failed, no_text = [], {}, [], []
+        ready, fresh, next_page = {}, {}, 0
+
+        def drain():
+            # Pages are parsed in order, since a group header carries over to the next page.
+            nonlocal next_page
+            while next_page < len(digests) and digests[next_page] in ready:
+                text = ready[digests[next_page]]
+                if text is None:
+                    failed.append(next_page + 1)
+                elif not text.strip():
+                    no_text.append(next_page + 1)
+                else:
+                    parse_page(text, next_page + 1, state, candidates)
+                next_page += 1
+
+        ready.update(texts)
+        with trace.phase("extract"):
+            drain()
+            for index, text, error in extract_pages(f.name, todo, n_workers):
+                trace.count("pages_extracted")
+                if error:
+                    sys.stderr.write(f"{key} page {index + 1}: {error}\n")
+                    trace.count("page_failures")
+                else:
+                    fresh[digests[index]] = text
+                ready[digests[index]] = text
+                drain()
+    with trace.phase("cache_write"):
+        store_texts(s3, bucket, team_id, fresh)
+    return candidates, {
+        "pages": len(digests),
+        "extractedPages": len(todo),
+        "noTextPages": no_text,
+        "failedPages": failed,
+    }
@@ -1,28 +1,24 @@
-import os, io, json, base64, csv, sys
-import boto3
-from boto3.dynamodb.types import TypeDeserializer
-from collections import defaultdict, deque
+import os, io, json, base64, csv, sys, hashlib, time, gzip, zlib
+from collections import OrderedDict, defaultdict, deque
+from datetime import datetime, timezone
+
+from export_common.records import decode_item, decode_items, decode_team
+from export_common.dynamo import batch_get_items, get_team_metadata, query_team_items_since
+from export_common.snapshot import SnapshotStore, load_team_items
+from export_common.manifest import Manifest
+from export_common.versioning import artifact_token, team_version, token_metadata
+from export_common import checkpoint, clients, profiling, tracing
 
 UPLOADS_BUCKET = os.environ.get("UPLOADS_BUCKET", "").strip()
 TABLE_NAME = os.environ.get("TABLE_NAME", "").strip()
-
-_s3 = None
-_ddb = None
-
+SNAPSHOT_PREFIX = os.environ.get("SNAPSHOT_PREFIX", "").strip()
 
 def s3():
-    global _s3
-    if _s3 is None:
-        from botocore.config import Config
-        _s3 = boto3.client("s3", config=Config(signature_version='s3v4'))
-    return _s3
+    return clients.s3()
 
 
 def ddb():
-    global _ddb
-    if _ddb is None:
-        _ddb = boto3.client("dynamodb")
-    return _ddb
+    return clients.ddb()
 
 
 CORS = {
@@ -47,8 +43,21 @@ def _get_body_json(event):
         return event
 
     body = event.get("body") or "{}"
+    if event.get("isBase64Encoded"):
+        body = base64.b64decode(body).decode("utf-8")
+    try:
+        return json.loads(body)
+    except ValueError:
+        return None
 
 
+def _accepts_gzip(event):
+    headers = event.get("headers") if isinstance(event, dict) else None
+    for name, value in (headers or {}).items():
+        if name.lower() == "accept-encoding":
+            return "gzip" in str(value).lower()
+    return False
+
 
 def _resp(status, body=None, headers=None, is_b64=False):
     h = {"Cache-Control": "no-store", **CORS}
@@ -70,45 +79,21 @@ END_DESC_KEY = "actualName"
 NSN_KEY = "nsn"  
 
 
-def fetch_inventory_from_dynamo(team_id, overrides):
-    if not TABLE_NAME:
-        raise RuntimeError("TABLE_NAME env var is not set")
+def _team_items(team_id, trace=tracing.NULL_TRACE):
+    store = None
+    if SNAPSHOT_PREFIX and UPLOADS_BUCKET:
+        store = SnapshotStore(s3(), UPLOADS_BUCKET, SNAPSHOT_PREFIX)
+    return load_team_items(store, ddb(), TABLE_NAME, team_id, trace=trace)
 
-    deserializer = TypeDeserializer()
 
-    resp = ddb().query(
-        TableName=TABLE_NAME,
-        KeyConditionExpression="PK = :pk",
-        ExpressionAttributeValues={
-            ":pk": {"S": f"TEAM#{team_id}"},
-        }
-    )
-
-    raw_rows = [ {k: deserializer.deserialize(v) for k, v in item.items()}
-                 for item in resp.get("Items", []) ]
-
-   
-    items = [
-    row
-    for row in raw_rows
-    if row.get("itemId")
-    and (row.get("status") or "").strip() != "To Review"]
-
-
-    
-    meta_resp = ddb().get_item(
-        TableName=TABLE_NAME,
-        Key={
-            "PK": {"S": f"TEAM#{team_id}"},
-            "SK": {"S": "METADATA"},
-        },
-        ConsistentRead=True,
-    )
+def fetch_team_metadata(team_id):
+    if not TABLE_NAME:
+        raise RuntimeError("TABLE_NAME env var is not set")
+    return get_team_metadata(ddb(), TABLE_NAME, team_id)
 
-    meta = {}
-    if meta_resp.get("Item"):
-        meta = {k: deserializer.deserialize(v) for k, v in meta_resp["Item"].items()}
 
+def merge_overrides(meta_raw, overrides):
+    meta = decode_team(meta_raw)
     merged_overrides = {
         "fe": meta.get("fe"),
         "uic": meta.get("uic"),
@@ -117,8 +102,79 @@ def fetch_inventory_from_dynamo(team_id, overrides):
 
     if isinstance(overrides, dict):
         merged_overrides.update(overrides)
+    return merged_overrides
+
+
+def _exportable(row):
+    return bool(row.itemId) and (row.status or "").strip() != "To Review"
+
+
+def normalize_since(value):
+    """ISO-8601 timestamp -> the millisecond UTC form the API stores in updatedAt."""
+    dt = datetime.fromisoformat(str(value).strip().replace("Z", "+00:00"))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    dt = dt.astimezone(timezone.utc)
+    return dt.strftime("%Y-%m-%dT%H:%M:%S.") + f"{dt.microsecond // 1000:03d}Z"
+
+
+def fetch_changed_items(team_id, since, trace=tracing.NULL_TRACE):
+    """
+    Items updated after `since` plus the ancestors that share their
+    (endItemNiin, liin) group, so LV letters match the full export.
+    Returns (items, changed_count). Deletions are not reported.
+    """
+    pages = query_team_items_since(
+        ddb(), TABLE_NAME, team_id, since,
+        on_page=lambda resp: trace.count("ddb_pages"),
+    )
+    with trace.phase("deserialize", exclude=("ddb_query",)):
+        changed = [row for row in decode_items(trace.iter("ddb_query", pages)) if _exportable(row)]
+    by_id = {row.itemId: row for row in changed}
+
+    def group(row):
+        return (row.get(END_NIIN_KEY), row.get(END_LIN_KEY))
+
+    pending = {row.parent: group(row) for row in changed if row.parent and row.parent not in by_id}
+    while pending:
+        keys = [{"PK": {"S": f"TEAM#{team_id}"}, "SK": {"S": f"ITEM#{pid}"}} for pid in pending]
+        wanted = pending
+        pending = {}
+        with trace.phase("ancestor_fetch"):
+            raws = batch_get_items(ddb(), TABLE_NAME, keys)
+        for raw in raws:
+            row = decode_item(raw)
+            if row.itemId in by_id or not _exportable(row) or group(row) != wanted.get(row.itemId):
+                continue
+            by_id[row.itemId] = row
+            if row.parent and row.parent not in by_id:
+                pending[row.parent] = group(row)
+
+    trace.count("items_loaded", len(by_id))
+    return list(by_id.values()), len(changed)
 
-    return {"items": items, "overrides": merged_overrides}
+
+def fetch_inventory_from_dynamo(team_id, overrides, meta_raw=None, since=None, trace=tracing.NULL_TRACE):
+    if not TABLE_NAME:
+        raise RuntimeError("TABLE_NAME env var is not set")
+
+    changed_count = None
+    if since:
+        items, changed_count = fetch_changed_items(team_id, since, trace)
+    else:
+        records = _team_items(team_id, trace)
+        with trace.phase("filter"):
+            items = [row for row in records if _exportable(row)]
+
+    if meta_raw is None:
+        with trace.phase("metadata"):
+            meta_raw = fetch_team_metadata(team_id)
+
+    data = {"items": items, "overrides": merge_overrides(meta_raw, overrides)}
+    if since:
+        data["since"] = since
+        data["changedCount"] = changed_count
+    return data
 
 
 def _compute_lv_for_group(items_for_kit):
@@ -167,84 +223,431 @@ def _compute_lv_for_group(items_for_kit):
     return lv_by_id, roots, children
 
 
-def render_inventory_csv(data):
+def group_items(items):
+    """Items keyed by (endItemNiin, liin), in first-seen order."""
+    groups = defaultdict(list)
+    for itm in items:
+        key = (itm.get(END_NIIN_KEY), itm.get(END_LIN_KEY))
+        groups[key].append(itm)
+    return groups
+
+
+def group_header(end_niin, end_lin, kit_items, overrides):
+    end_desc = None
+    for itm in kit_items:
+        d = itm.get(END_DESC_KEY)
+        if d:
+            end_desc = d
+            break
+    if not end_desc:
+        end_desc = overrides.get("actualName") or ""
+
+    return [
+        overrides.get("fe") or "",
+        overrides.get("uic") or "",
+        overrides.get("name"),
+        end_niin or "",
+        end_lin or "",
+        end_desc or ""
+    ]
+
+
+def group_rows(kit_items):
+    """Yield [Name, Material, LV, Description, Auth Qty, OH Qty] in kit-tree order."""
+    lv_by_id, roots, children = _compute_lv_for_group(kit_items)
+
+    def walk(node, depth):
+        nid = node.get(ITEM_ID_KEY)
+        lv = lv_by_id.get(nid) or chr(ord("A") + depth)
+
+        name = node.get("name") or ""
+        nsn = node.get(NSN_KEY) or ""
+        desc = node.get("description") or ""
+        auth_qty = node.get("authQuantity")
+        oh_qty = node.get("ohQuantity")
+
+        yield [name, nsn, lv, desc, auth_qty, oh_qty]
+
+        kids = sorted(children.get(nid, []), key=lambda x: (x.get("name") or ""))
+        for c in kids:
+            yield from walk(c, depth + 1)
+
+    # Multiple roots in the same (niin, lin) group all in same table
+    roots_sorted = sorted(roots, key=lambda x: (x.get("name") or ""))
+    for r in roots_sorted:
+        yield from walk(r, 0)
+
+
+# Rendered CSV blocks per (endItemNiin, liin) group, keyed by a digest of the
+# header values and the members' (itemId, updatedAt). Lives for the container,
+# so repeat exports only re-render groups that contain changed items.
+_BLOCK_CACHE = OrderedDict()
+_BLOCK_CACHE_MAX_BYTES = int(os.environ.get("CSV_BLOCK_CACHE_BYTES", str(64 * 1024 * 1024)))
+_block_cache_bytes = 0
+
+
+def _group_digest(header, kit_items):
+    h = hashlib.blake2b(digest_size=16)
+    h.update(repr(header).encode("utf-8"))
+    members = []
+    for itm in kit_items:
+        upd = itm.get("updatedAt")
+        if not upd:
+            # Without updatedAt a content change would go unnoticed.
+            return None
+        members.append(f"{itm.get(ITEM_ID_KEY)}\x1f{upd}")
+    members.sort()
+    h.update("\x1e".join(members).encode("utf-8"))
+    return h.digest()
+
+
+def _cache_put(digest, block):
+    global _block_cache_bytes
+    _BLOCK_CACHE[digest] = block
+    _block_cache_bytes += len(block)
+    while _block_cache_bytes > _BLOCK_CACHE_MAX_BYTES and _BLOCK_CACHE:
+        _, old = _BLOCK_CACHE.popitem(last=False)
+        _block_cache_bytes -= len(old)
+
+
+def render_group_block(end_niin, end_lin, kit_items, overrides):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+
+    header = group_header(end_niin, end_lin, kit_items, overrides)
+    writer.writerow(["FE", "UIC", "Desc", "End Item NIIN", "LIN", "Desc"])
+    writer.writerow(header)
+    writer.writerow([])
+    writer.writerow(["Name", "Material", "LV", "Description", "Auth Qty", "OH Qty"])
+    writer.writerows(group_rows(kit_items))
+
+    return buf.getvalue()
+
+
+def _group_blocks(groups, overrides, counts):
+    """CSV block per ((endItemNiin, liin), items), from the block cache when unchanged."""
+    for (end_niin, end_lin), kit_items in groups:
+        header = group_header(end_niin, end_lin, kit_items, overrides)
+        digest = _group_digest(header, kit_items)
+        block = _BLOCK_CACHE.get(digest) if digest else None
+        if block is None:
+            block = render_group_block(end_niin, end_lin, kit_items, overrides)
+            counts["rendered"] += 1
+            if digest:
+                _cache_put(digest, block)
+        else:
+            _BLOCK_CACHE.move_to_end(digest)
+            counts["cached"] += 1
+        yield block
+
+
+def render_inventory_csv(data, stats=None, trace=tracing.NULL_TRACE):
     """
     Divide by (endItemNiin, liin):
       - One FE/UIC header + table per (endItemNiin, liin).
       - Within each table, there may be MULTIPLE roots (kits).
       - For each root: LV A, its children B, grandchildren C, etc.
       - Table columns: Name, Material (NSN), LV, Description, Auth Qty, OH Qty.
+    Group blocks are served from the per-container cache when unchanged;
+    pass a dict as `stats` to get rendered/cached counts back.
+    """
+    csv_bytes, _, _ = render_inventory_chunk(data, stats=stats, trace=trace)
+    return csv_bytes
+
+
+# Groups rendered between deadline checks.
+DEADLINE_CHECK_GROUPS = 200
+# Inventory CSVs compress 10-20x; level 6 is zlib's usual speed/size balance.
+GZIP_LEVEL = int(os.environ.get("INVENTORY_GZIP_LEVEL", "6") or 6)
+# Store CSV artifacts gzip-encoded (S3 ContentEncoding), decoded by the browser on download.
+GZIP_ARTIFACTS = os.environ.get("INVENTORY_GZIP", "true").strip().lower() not in ("0", "false", "no")
+
+
+def _chunk_blocks(groups, start, overrides, counts, deadline, state):
+    """Group blocks from index `start` on; state["stop"] is where it stopped."""
+    t0 = time.perf_counter()
+    state["stop"] = len(groups)
+    for i, block in enumerate(_group_blocks(groups[start:], overrides, counts), start):
+        yield block
+        done = i + 1 - start
+        if deadline is not None and done % DEADLINE_CHECK_GROUPS == 0:
+            per_group_ms = (time.perf_counter() - t0) * 1000 / done
+            left = deadline.units_left(per_group_ms)
+            if left is not None and left < DEADLINE_CHECK_GROUPS:
+                state["stop"] = i + 1
+                return
+
+
+def _csv_pieces(blocks, state):
+    # Groups are separated by one blank row.
+    for i, block in enumerate(blocks):
+        piece = (b"\r\n" if i else b"") + block.encode("utf-8")
+        state["bytes"] = state.get("bytes", 0) + len(piece)
+        yield piece
+
+
+def gzip_stream(pieces, level=GZIP_LEVEL):
+    """One gzip member over an iterable of bytes, compressed as the pieces arrive (mtime 0, so reproducible)."""
+    z = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for piece in pieces:
+        out = z.compress(piece)
+        if out:
+            yield out
+    yield z.flush()
+
+
+def render_inventory_chunk(data, start=0, deadline=None, stats=None, trace=tracing.NULL_TRACE, compress=False):
+    """
+    Render the groups from index `start` on, stopping early once `deadline`
+    has no time left for the next DEADLINE_CHECK_GROUPS groups.
+    Returns (csv bytes, next start, group count). The chunks of one export,
+    joined with a blank row, equal the single-pass CSV. With compress=True each
+    block is compressed as it is rendered and the bytes are a gzip member
+    (see join_csv_parts).
     """
     items = data.get("items", [])
     overrides = data.get("overrides", {})
 
-    groups = defaultdict(list)
-    for itm in items:
-        key = (itm.get(END_NIIN_KEY), itm.get(END_LIN_KEY))
-        groups[key].append(itm)
-
-    buf = io.StringIO()
-    writer = csv.writer(buf)
-
-    first = True
-    for (end_niin, end_lin), kit_items in groups.items():
-        if not first:
-            writer.writerow([])  
-        first = False
-
-        
-        end_desc = None
-        for itm in kit_items:
-            d = itm.get(END_DESC_KEY)
-            if d:
-                end_desc = d
-                break
-        if not end_desc:
-            end_desc = overrides.get("actualName") or ""
-
-        # Group header
-        writer.writerow(["FE", "UIC", "Desc", "End Item NIIN", "LIN", "Desc"])
-        writer.writerow([
-            overrides.get("fe") or "",
-            overrides.get("uic") or "",
-            overrides.get("name"),
-            end_niin or "",
-            end_lin or "",
-            end_desc or ""
-        ])
-
-        writer.writerow([])
-
-       
-        writer.writerow(["Name", "Material", "LV", "Description", "Auth Qty", "OH Qty"])
-
-    
-        lv_by_id, roots, children = _compute_lv_for_group(kit_items)
-
-        def walk(node, depth):
-            nid = node.get(ITEM_ID_KEY)
-            lv = lv_by_id.get(nid) or chr(ord("A") + depth)
-
-            name = node.get("name") or ""
-            nsn = node.get(NSN_KEY) or ""  
-            desc = node.get("description") or ""
-            auth_qty = node.get("authQuantity")
-            oh_qty = node.get("ohQuantity") 
-
-            writer.writerow([name, nsn, lv, desc, auth_qty, oh_qty])
+    with trace.phase("tree_build"):
+        groups = list(group_items(items).items())
+
+    counts = {"rendered": 0, "cached": 0}
+    state = {}
+    pieces = _csv_pieces(_chunk_blocks(groups, start, overrides, counts, deadline, state), state)
+    body = b"".join(gzip_stream(pieces) if compress else pieces)
+
+    if stats is not None:
+        stats.update(groupsRendered=counts["rendered"], groupsCached=counts["cached"])
+    trace.count("groups_rendered", counts["rendered"])
+    trace.count("groups_cached", counts["cached"])
+    trace.count("csv_bytes", state.get("bytes", 0))
+
+    return body, state["stop"], len(groups)
+
+
+def join_csv_parts(parts, gzip_parts=False):
+    """A checkpointed export's CSV chunks as one CSV; gzip members are re-streamed into a single member."""
+    if not gzip_parts:
+        return b"\r\n".join(p for p in parts if p)
+
+    def pieces():
+        first = True
+        for part in parts:
+            raw = gzip.decompress(part)
+            if raw:
+                yield raw if first else b"\r\n" + raw
+                first = False
+
+    return b"".join(gzip_stream(pieces()))
+
+
+# Printable layout: landscape letter, in points. Column widths and row
+# heights are fixed so reportlab never measures cells; text is clipped to
+# its column instead of wrapping.
+PDF_LAYOUT = {
+    "margin": 36,
+    "font": "Helvetica",
+    "bold": "Helvetica-Bold",
+    "size": 7.5,
+    "row_h": 12,
+    "padding": 3,
+    # Item rows per Table ("table" engine): a table about one page long splits at most once.
+    "rows_per_table": 40,
+    "group_gap": 14,
+}
+PDF_HEADER_COLS = (("FE", 70), ("UIC", 70), ("Desc", 170), ("End Item NIIN", 100), ("LIN", 70), ("Desc", 240))
+PDF_ITEM_COLS = (("Name", 170), ("Material", 110), ("LV", 30), ("Description", 280), ("Auth Qty", 65), ("OH Qty", 65))
+PDF_ITEM_ALIGN = ("LEFT", "LEFT", "CENTER", "LEFT", "RIGHT", "RIGHT")
+# "fixed" lays tables out arithmetically (export_common.pdf_table.FixedTable);
+# "table" uses platypus.Table with fixed widths and heights.
+PDF_ENGINE = os.environ.get("INVENTORY_PDF_ENGINE", "fixed").strip().lower() or "fixed"
+
+
+def _clip(value, width, font, size):
+    from export_common.pdf_table import clip
+
+    return clip("" if value is None else str(value), width - 2 * PDF_LAYOUT["padding"], font, size)
+
+
+_pdf_styles_cache = None
+
+
+def _pdf_styles():
+    """(group header style, item table style), built once per container."""
+    global _pdf_styles_cache
+    if _pdf_styles_cache is None:
+        from reportlab.lib import colors
+        from reportlab.platypus import TableStyle
+
+        lay = PDF_LAYOUT
+        base = [
+            ("FONT", (0, 0), (-1, -1), lay["font"], lay["size"]),
+            ("FONT", (0, 0), (-1, 0), lay["bold"], lay["size"]),
+            ("GRID", (0, 0), (-1, -1), 0.25, colors.grey),
+            ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#e6e6e6")),
+            ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
+            ("TOPPADDING", (0, 0), (-1, -1), 1),
+            ("BOTTOMPADDING", (0, 0), (-1, -1), 2),
+            ("LEFTPADDING", (0, 0), (-1, -1), lay["padding"]),
+            ("RIGHTPADDING", (0, 0), (-1, -1), lay["padding"]),
+        ]
+        _pdf_styles_cache = (TableStyle(base), TableStyle(base + [
+            ("ALIGN", (2, 0), (2, -1), "CENTER"),
+            ("ALIGN", (4, 0), (5, -1), "RIGHT"),
+        ]))
+    return _pdf_styles_cache
+
+
+def _fixed_table(rows, cols, style, repeat=0):
+    from reportlab.platypus import Table
+
+    lay = PDF_LAYOUT
+    widths = [w for _, w in cols]
+    body = [[_clip(v, w, lay["font"], lay["size"]) for v, w in zip(row, widths)] for row in rows]
+    return Table([[name for name, _ in cols]] + body, colWidths=widths,
+                 rowHeights=[lay["row_h"]] * (len(body) + 1), style=style, repeatRows=repeat, hAlign="LEFT")
+
+
+def _fixed_group(header_row, rows):
+    from export_common.pdf_table import FixedTable
+    from reportlab.platypus import CondPageBreak, Spacer
+
+    lay = PDF_LAYOUT
+    style = {"font": lay["font"], "bold": lay["bold"], "size": lay["size"], "padding": lay["padding"]}
+    header = FixedTable([header_row], [w for _, w in PDF_HEADER_COLS], lay["row_h"],
+                        header=[name for name, _ in PDF_HEADER_COLS], **style)
+    items = FixedTable(rows, [w for _, w in PDF_ITEM_COLS], lay["row_h"],
+                       header=[name for name, _ in PDF_ITEM_COLS], align=PDF_ITEM_ALIGN, **style)
+    # Don't strand a group header at the bottom of a page: keep it with a few rows.
+    keep = lay["row_h"] * (2 + 1 + min(3, len(rows))) + 4
+    return [CondPageBreak(keep), header, Spacer(0, 4), items, Spacer(0, lay["group_gap"])]
+
+
+def group_flowables(end_niin, end_lin, kit_items, overrides, engine=None):
+    """One group as flowables: its header table, then its kit tree."""
+    from reportlab.platypus import KeepTogether, Spacer
+
+    if (engine or PDF_ENGINE) == "fixed":
+        return _fixed_group(group_header(end_niin, end_lin, kit_items, overrides), list(group_rows(kit_items)))
+
+    lay = PDF_LAYOUT
+    header_style, item_style = _pdf_styles()
+    header = _fixed_table([group_header(end_niin, end_lin, kit_items, overrides)], PDF_HEADER_COLS, header_style)
+    rows = list(group_rows(kit_items))
+    n = lay["rows_per_table"]
+    tables = [_fixed_table(rows[i:i + n], PDF_ITEM_COLS, item_style, repeat=1)
+              for i in range(0, len(rows), n)] or [_fixed_table([], PDF_ITEM_COLS, item_style)]
+    # Don't strand a group header at the bottom of a page.
+    out = [KeepTogether([header, Spacer(0, 4), tables[0]])]
+    out += tables[1:]
+    out.append(Spacer(0, lay["group_gap"]))
+    return out
 
-            kids = sorted(children.get(nid, []), key=lambda x: (x.get("name") or ""))  
-            for c in kids:
-                walk(c, depth + 1)
 
-        # Multiple roots in the same (niin, lin) group all in same table
-        roots_sorted = sorted(roots, key=lambda x: (x.get("name") or ""))
-        for r in roots_sorted:
-            walk(r, 0)
+def render_inventory_pdf(data, start=0, deadline=None, page_offset=0, title="Inventory", trace=tracing.NULL_TRACE,
+                         engine=None):
+    """
+    PDF counterpart of render_inventory_chunk: the same (endItemNiin, liin)
+    groups and kit-tree rows, one header table plus item tables per group.
+    Page numbers continue from `page_offset` so resumed parts join up.
+    Returns (pdf bytes, next start, group count, pages).
+    """
+    from reportlab.lib.pagesizes import landscape, letter
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.platypus import ActionFlowable, Paragraph, SimpleDocTemplate
 
-    out = buf.getvalue()
-    buf.close()
-    return out.encode("utf-8")
+    items = data.get("items", [])
+    overrides = data.get("overrides", {})
+    lay = PDF_LAYOUT
+
+    with trace.phase("tree_build"):
+        groups = list(group_items(items).items())
+
+    flowables = []
+    stop = [len(groups)]
+    t0 = time.perf_counter()
+
+    class DeadlineMark(ActionFlowable):
+        """Placed before a group; ends the document there when time is short."""
+
+        def __init__(self, index):
+            self.index = index
+
+        def apply(self, doc):
+            done = self.index - start
+            per_group_ms = (time.perf_counter() - t0) * 1000 / done
+            left = deadline.units_left(per_group_ms)
+            if left is not None and left < DEADLINE_CHECK_GROUPS:
+                stop[0] = self.index
+                del flowables[:]
+
+    for i, ((end_niin, end_lin), kit_items) in enumerate(groups[start:], start):
+        if deadline is not None and i > start and (i - start) % DEADLINE_CHECK_GROUPS == 0:
+            flowables.append(DeadlineMark(i))
+        flowables += group_flowables(end_niin, end_lin, kit_items, overrides, engine)
+
+    generated = _today()
+
+    def footer(canv, doc):
+        canv.saveState()
+        canv.setFont(lay["font"], lay["size"])
+        canv.drawString(lay["margin"], lay["margin"] / 2, f"{title} - generated {generated}")
+        canv.drawRightString(doc.pagesize[0] - lay["margin"], lay["margin"] / 2,
+                             f"Page {page_offset + doc.page}")
+        canv.restoreState()
+
+    buf = io.BytesIO()
+    doc = SimpleDocTemplate(buf, pagesize=landscape(letter), title=title,
+                            leftMargin=lay["margin"], rightMargin=lay["margin"],
+                            topMargin=lay["margin"], bottomMargin=lay["margin"])
+    with trace.phase("pdf_layout"):
+        if not flowables:
+            flowables.append(Paragraph("No items to export.", getSampleStyleSheet()["Normal"]))
+        doc.build(flowables, onFirstPage=footer, onLaterPages=footer)
+    trace.count("groups_rendered", stop[0] - start)
+    trace.count("pdf_pages", doc.page)
+    return buf.getvalue(), stop[0], len(groups), doc.page
+
+
+def _today():
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d")
+
+
+def concat_pdf_parts(parts):
+    if len(parts) == 1:
+        return parts[0]
+    from pypdf import PdfWriter
+
+    writer = PdfWriter()
+    for part in parts:
+        writer.append(io.BytesIO(part))
+    out = io.BytesIO()
+    writer.write(out)
+    return out.getvalue()
+
+
+FORMATS = {"csv": "text/csv", "pdf": "application/pdf"}
+
+# Override keys that end up in the CSV headers; a change to any of them
+# invalidates a previously generated artifact.
+TOKEN_OVERRIDE_KEYS = ("fe", "uic", "name", "actualName")
+
+
+def _s3_response(key, unchanged=False, content_type="text/csv", **extra):
+    url = s3().generate_presigned_url(
+        'get_object',
+        Params={'Bucket': UPLOADS_BUCKET, 'Key': key},
+        ExpiresIn=3600
+    )
+    return _resp(200, {
+        "ok": True,
+        "s3Key": key,
+        "bucket": UPLOADS_BUCKET,
+        "url": url,
+        "contentType": content_type,
+        "unchanged": unchanged,
+        **extra,
+    })
 
 
 def lambda_handler(event, context):
@@ -274,88 +677,233 @@ def lambda_handler(event, context):
     if not team_id:
         return _resp(400, {"error": "teamId is required"})
 
+    trace = tracing.start("export-inventory", teamId=team_id)
+    calls_before = dict(clients.stats)
+    try:
+        return profiling.capture(
+            lambda: export_inventory(team_id, payload, trace, context, _accepts_gzip(event)),
+            payload, team_id, "export-inventory", s3=s3, bucket=UPLOADS_BUCKET,
+        )
+    finally:
+        trace.count_all(clients.stats_delta(calls_before))
+        trace.emit()
+
+
+def export_inventory(team_id, payload, trace=tracing.NULL_TRACE, context=None, accepts_gzip=False):
     save_to_s3 = bool(payload.get("saveToS3", True))
+    # Checkpointing needs somewhere to park parts, so only S3 exports get a
+    # deadline. Started before the reads so the caller's budgetMs covers them.
+    deadline = checkpoint.Deadline(context, budget_ms=payload.get("budgetMs")) if save_to_s3 else None
+    fmt = str(payload.get("format") or "csv").strip().lower()
+    if fmt not in FORMATS:
+        return _resp(400, {"error": f"format must be one of {', '.join(FORMATS)}"})
+    content_type = FORMATS[fmt]
+    # PDFs are compressed already.
+    gzipped = fmt == "csv" and (GZIP_ARTIFACTS if save_to_s3 else accepts_gzip)
+    trace.set(gzip=gzipped)
+
+    since = None
+    if payload.get("since"):
+        try:
+            since = normalize_since(payload["since"])
+        except (TypeError, ValueError):
+            return _resp(400, {"error": "since must be an ISO-8601 timestamp"})
 
     try:
-        data = fetch_inventory_from_dynamo(team_id, payload)
+        with trace.phase("metadata"):
+            meta_raw = fetch_team_metadata(team_id)
     except Exception as e:
         return _resp(500, {"error": f"DDB fetch failed: {e}"})
 
-    try:
-        csv_bytes = render_inventory_csv(data)
-    except Exception as e:
-        return _resp(500, {"error": f"CSV build failed: {e}"})
-
-    team_name = data.get("overrides", {}).get("name") or "team"
+    overrides = merge_overrides(meta_raw, payload)
+    team_name = overrides.get("name") or "team"
     safe_team_name = str(team_name).replace(" ", "_").replace("/", "_")
-    filename = f"inventory_{safe_team_name}.csv"
+    suffix = "_delta" if since else ""
+    filename = f"inventory_{safe_team_name}{suffix}.{fmt}"
     key = f"Documents/{team_id}/inventory/{filename}"
 
+    token = None
     if save_to_s3:
         if not UPLOADS_BUCKET:
             return _resp(500, {"error": "UPLOADS_BUCKET env var is not set"})
+        # Delta exports depend on `since`, so they are never reused.
+        if not since:
+            token = artifact_token(
+                team_version(meta_raw),
+                [overrides.get(k) for k in TOKEN_OVERRIDE_KEYS],
+                *((fmt,) if fmt != "csv" else ()),
+            )
+
+    # What a continuation must have been started for. A delta has no token,
+    # so its since and the team's itemsVersion are checked instead.
+    run_fields = {"key": key, "token": token}
+    if since:
+        run_fields.update(since=since, version=team_version(meta_raw))
+
+    run = None
+    if save_to_s3 and payload.get("continuation"):
+        try:
+            run = checkpoint.Checkpoint.load(s3(), UPLOADS_BUCKET, team_id, "inventory", payload["continuation"])
+        except ValueError as e:
+            return _resp(400, {"error": str(e)})
+        if {k: run.state.get(k) for k in run_fields} != run_fields:
+            # Items changed since the run started; start over so the CSV is consistent.
+            run.discard()
+            run = None
+            trace.set(restarted=True)
+        else:
+            trace.set(resumed=True)
+
+    artifacts = None
+    if save_to_s3 and run is None:
+        with trace.phase("freshness_check"):
+            artifacts = Manifest.load(s3(), UPLOADS_BUCKET, team_id)
+            fresh = not payload.get("force") and artifacts.is_fresh(key, token)
+        if fresh:
+            trace.set(unchanged=True)
+            try:
+                with trace.phase("presign"):
+                    return _s3_response(key, unchanged=True, content_type=content_type)
+            except Exception as e:
+                return _resp(500, {"error": f"S3 presign failed: {e}"})
+
+    try:
+        data = fetch_inventory_from_dynamo(team_id, payload, meta_raw, since, trace)
+    except Exception as e:
+        return _resp(500, {"error": f"DDB fetch failed: {e}"})
+
+    start = run.cursor if run else 0
+    try:
+        with trace.phase("render", exclude=("tree_build",)):
+            if fmt == "pdf":
+                pages_before = run.counts.get("pages", 0) if run else 0
+                body, stop, n_groups, pages = render_inventory_pdf(
+                    data, start, deadline, pages_before, f"{team_name} inventory{' (changes)' if since else ''}", trace)
+            else:
+                body, stop, n_groups = render_inventory_chunk(data, start, deadline, trace=trace, compress=gzipped)
+                pages = 0
+    except Exception as e:
+        return _resp(500, {"error": f"{fmt.upper()} build failed: {e}"})
+
+    if stop < n_groups:
+        try:
+            with trace.phase("checkpoint"):
+                if run is None:
+                    run = checkpoint.Checkpoint.start(s3(), UPLOADS_BUCKET, team_id, "inventory", **run_fields)
+                run.add_part(body, f".{fmt}", content_type)
+                run.save(stop, groups=stop - start, pages=pages)
+        except Exception as e:
+            return _resp(500, {"error": f"Checkpoint failed: {e}"})
+        trace.set(continued=True)
+        return _resp(202, {
+            "ok": True,
+            "done": False,
+            "continuation": run.run_id,
+            "teamId": team_id,
+            "progress": {"groups": stop, "total": n_groups},
+        })
+
+    if run:
+        try:
+            with trace.phase("assemble"):
+                if fmt == "pdf":
+                    body = concat_pdf_parts([*run.read_parts(), body])
+                else:
+                    body = join_csv_parts([*run.read_parts(), body], gzipped)
+        except Exception as e:
+            return _resp(500, {"error": f"Checkpoint read failed: {e}"})
+
+    # csv_bytes (uncompressed) is counted as the chunk renders.
+    if fmt == "pdf":
+        trace.count("pdf_bytes", len(body))
+    elif gzipped:
+        trace.count("gzip_bytes", len(body))
+    delta_info = {"since": since, "changedCount": data["changedCount"]} if since else {}
+
+    if save_to_s3:
         try:
             kms_key_arn = os.environ.get('KMS_KEY_ARN', '').strip()
 
             put_params = {
                 'Bucket': UPLOADS_BUCKET,
                 'Key': key,
-                'Body': csv_bytes,
-                'ContentType': 'text/csv',
+                'Body': body,
+                'ContentType': content_type,
+                'Metadata': token_metadata(token),
             }
 
+            if gzipped:
+                put_params['ContentEncoding'] = 'gzip'
             if kms_key_arn:
                 put_params['ServerSideEncryption'] = 'aws:kms'
                 put_params['SSEKMSKeyId'] = kms_key_arn
 
-            s3().put_object(**put_params)
-          
-            url = s3().generate_presigned_url(
-                'get_object',
-                Params={'Bucket': UPLOADS_BUCKET, 'Key': key},
-                ExpiresIn=3600
-            )
+            with trace.phase("upload"):
+                s3().put_object(**put_params)
+            if run:
+                run.discard()
+            with trace.phase("manifest"):
+                artifacts = artifacts or Manifest.load(s3(), UPLOADS_BUCKET, team_id)
+                artifacts.record(key, f"inventory-{fmt}{suffix.replace('_', '-')}", token, len(body), trace)
 
-            return _resp(200, {
-                "ok": True,
-                "s3Key": key,
-                "bucket": UPLOADS_BUCKET,
-                "url": url,
-                "contentType": "text/csv"
-            })
+            with trace.phase("presign"):
+                return _s3_response(key, content_type=content_type, **delta_info)
         except Exception as e:
             return _resp(500, {"error": f"S3 put failed: {e}"})
 
-    # Direct download path
-    b64 = base64.b64encode(csv_bytes).decode("utf-8")
-    return _resp(
-        200,
-        b64,
-        headers={
-            "Content-Type": "text/csv",
-            "Content-Disposition": f'attachment; filename=\"{filename}\"'
-        },
-        is_b64=True
-    )
+    # Direct download path; the response is capped at 6 MB after base64, so
+    # CSVs go out gzip-encoded when the client accepts it.
+    b64 = base64.b64encode(body).decode("utf-8")
+    headers = {
+        "Content-Type": content_type,
+        "Content-Disposition": f'attachment; filename=\"{filename}\"'
+    }
+    if fmt == "csv":
+        headers["Vary"] = "Accept-Encoding"
+    if gzipped:
+        headers["Content-Encoding"] = "gzip"
+    return _resp(200, b64, headers=headers, is_b64=True)
 
 
 main = lambda_handler
 
 
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        sys.stderr.write("teamId argument is required\n")
-        sys.exit(1)
+    import argparse
+
+    ap = argparse.ArgumentParser(description="Print a team's inventory CSV to stdout.")
+    ap.add_argument("teamId")
+    ap.add_argument("since", nargs="?", help="ISO-8601 timestamp for a delta export")
+    ap.add_argument("--seed", metavar="ITEMS.json",
+                    help="run offline against an in-memory table loaded from this file "
+                         "(same as EXPORT_BACKEND=memory LOCAL_DDB_SEED=...)")
+    args = ap.parse_args()
 
-    team_id = sys.argv[1].strip()
+    team_id = args.teamId.strip()
     if not team_id:
         sys.stderr.write("teamId argument is empty\n")
         sys.exit(1)
 
+    since = normalize_since(args.since) if args.since else None
+
+    if args.seed:
+        from export_common.local_backend import MemoryDynamoDB
+
+        clients.use(ddb=MemoryDynamoDB.from_json(args.seed))
+    if clients.backend() != "aws" or args.seed:
+        TABLE_NAME = TABLE_NAME or "local"
+
+    # Trace lines go to stderr so stdout stays a clean CSV.
+    trace = tracing.start("export-inventory", stream=sys.stderr, teamId=team_id)
+    calls_before = dict(clients.stats)
     try:
-        data = fetch_inventory_from_dynamo(team_id, {})
-        csv_bytes = render_inventory_csv(data)
+        data = fetch_inventory_from_dynamo(team_id, {}, since=since, trace=trace)
+        with trace.phase("render", exclude=("tree_build",)):
+            csv_bytes = render_inventory_csv(data, trace=trace)
         sys.stdout.write(csv_bytes.decode("utf-8"))
     except Exception as e:
         sys.stderr.write(f"inventory export failed: {e}\n")
         sys.exit(1)
+    finally:
+        trace.count_all(clients.stats_delta(calls_before))
+        trace.emit()
@@ -0,0 +1,163 @@
+"""
+Checkpoint/resume and snapshot tests for the inventory export, run against
+the in-memory backends:
+
+    cd src/cdk && python -m pytest -q python_inventory
+
+Invocations get a context with no time left, so every one renders exactly
+DEADLINE_CHECK_GROUPS groups and hands back a continuation.
+"""
+import gzip
+import importlib.util
+import json
+import os
+import sys
+
+import pytest
+
+CDK_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [
+    os.path.join(CDK_DIR, "layers", "export-common", "python"),
+    os.path.join(CDK_DIR, "layers", "pdf-deps", "python"),
+    os.path.join(CDK_DIR, "bench"),
+]
+os.environ.update(TABLE_NAME="test-table", UPLOADS_BUCKET="test-bucket", SNAPSHOT_PREFIX="", EXPORT_TRACE="",
+                  EXPORT_PROFILE="")
+
+from export_common import clients  # noqa: E402
+from export_common.local_backend import FakeContext, MemoryDynamoDB, MemoryS3  # noqa: E402
+from export_common.snapshot import SnapshotStore, decode_snapshot  # noqa: E402
+from synthetic import make_team  # noqa: E402
+
+_spec = importlib.util.spec_from_file_location(
+    "inventory_handler", os.path.join(os.path.dirname(os.path.abspath(__file__)), "inventory_handler.py"))
+inventory_handler = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(inventory_handler)
+
+SINCE = "2025-01-01T00:00:00.000Z"
+
+
+@pytest.fixture
+def team(monkeypatch):
+    meta, rows = make_team(600, team_id="resume")
+    meta["itemsVersion"] = {"N": "1"}
+    ddb, s3 = MemoryDynamoDB().load([meta] + rows), MemoryS3()
+    clients.use(ddb=ddb, s3=s3)
+    monkeypatch.setattr(inventory_handler, "DEADLINE_CHECK_GROUPS", 5)
+    inventory_handler._BLOCK_CACHE.clear()
+    monkeypatch.setattr(inventory_handler, "_block_cache_bytes", 0)
+    return ddb, s3, rows
+
+
+def invoke(context=None, **payload):
+    resp = inventory_handler.lambda_handler({"teamId": "resume", "force": True, **payload}, context)
+    return resp["statusCode"], json.loads(resp["body"])
+
+
+def csv_of(s3, body):
+    return gzip.decompress(s3.objects[("test-bucket", body["s3Key"])][0])
+
+
+def export(s3, **payload):
+    code, body = invoke(**payload)
+    assert code == 200, body
+    return csv_of(s3, body)
+
+
+def resume(s3, continuation=None, max_invocations=100, **payload):
+    """Follow continuations to the end; returns (CSV, invocations)."""
+    for n in range(1, max_invocations + 1):
+        extra = {"continuation": continuation} if continuation else {}
+        code, body = invoke(FakeContext(0), **payload, **extra)
+        if code == 202:
+            continuation = body["continuation"]
+            continue
+        assert code == 200, body
+        return csv_of(s3, body), n
+    raise AssertionError("export did not finish")
+
+
+def checkpoint_keys(s3):
+    return [key for (_, key) in s3.objects if key.startswith("ops/exports/")]
+
+
+def edit_item(ddb, row, name, updated_at="2025-03-01T00:00:00.000Z", bump=True):
+    ddb.update_item(TableName="test-table", Key={"PK": row["PK"], "SK": row["SK"]},
+                    UpdateExpression="SET #n = :name, updatedAt = :now",
+                    ExpressionAttributeNames={"#n": "name"},
+                    ExpressionAttributeValues={":name": {"S": name}, ":now": {"S": updated_at}})
+    if bump:
+        ddb.update_item(TableName="test-table", Key={"PK": {"S": "TEAM#resume"}, "SK": {"S": "METADATA"}},
+                        UpdateExpression="ADD itemsVersion :one", ExpressionAttributeValues={":one": {"N": "1"}})
+
+
+def exported(row):
+    return row["status"]["S"] != "To Review"
+
+
+def test_resumed_export_matches_single_pass(team):
+    _, s3, _ = team
+    whole = export(s3)
+    resumed, invocations = resume(s3)
+    assert invocations > 2
+    assert resumed == whole
+    assert not checkpoint_keys(s3)
+
+
+def test_continuation_is_discarded_after_items_version_bump(team):
+    ddb, s3, rows = team
+    code, body = invoke(FakeContext(0))
+    assert code == 202
+    first = body["continuation"]
+    edit_item(ddb, next(r for r in rows if exported(r)), "Renamed after start")
+
+    resumed, _ = resume(s3, first)
+    assert b"Renamed after start" in resumed
+    assert resumed == export(s3)
+    assert not checkpoint_keys(s3)
+
+
+def test_delta_resume_matches_single_pass(team):
+    _, s3, _ = team
+    whole = export(s3, since=SINCE)
+    resumed, invocations = resume(s3, since=SINCE)
+    assert invocations > 2
+    assert resumed == whole
+
+
+def test_delta_continuation_for_another_since_is_discarded(team):
+    _, s3, _ = team
+    code, body = invoke(FakeContext(0), since=SINCE)
+    assert code == 202
+    code, body = invoke(FakeContext(0), since="2024-06-01T00:00:00.000Z", continuation=body["continuation"])
+    assert (code, body["progress"]["groups"]) == (202, 5)
+
+
+def test_delta_continuation_is_discarded_after_items_version_bump(team):
+    ddb, s3, rows = team
+    code, body = invoke(FakeContext(0), since=SINCE)
+    assert code == 202
+    edit_item(ddb, next(r for r in rows if exported(r)), "Renamed after start")
+
+    resumed, _ = resume(s3, body["continuation"], since=SINCE)
+    assert b"Renamed after start" in resumed
+    assert resumed == export(s3, since=SINCE)
+
+
+def test_snapshot_picks_up_updated_items(team, monkeypatch, tmp_path):
+    ddb, s3, rows = team
+    monkeypatch.setattr(inventory_handler, "SNAPSHOT_PREFIX", "ops/snapshots")
+    monkeypatch.setattr(inventory_handler, "SnapshotStore",
+                        lambda *args: SnapshotStore(*args, tmp_dir=str(tmp_path)))
+    before = export(s3)
+    assert ("test-bucket", "ops/snapshots/resume/items.snap") in s3.objects
+
+    row = next(r for r in rows if exported(r))
+    edit_item(ddb, row, "Renamed in place")
+    after = export(s3)
+    assert b"Renamed in place" in after and b"Renamed in place" not in before
+    _, records = decode_snapshot(s3.objects[("test-bucket", "ops/snapshots/resume/items.snap")][0])
+    assert next(r for r in records if r.itemId == row["itemId"]["S"]).name == "Renamed in place"
+
+    monkeypatch.setattr(inventory_handler, "SNAPSHOT_PREFIX", "")
+    assert export(s3) == after
@@ -59,31 +59,45 @@ export const downloadPDF = async (pdfData: string, filename: string, isBase64: b
   }
 };
 
+// Large exports come back unfinished ({ done: false, continuation }) and
+// are resumed by calling getExport again with the continuation.
+const MAX_EXPORT_ROUNDS = 20;
+
 /**
  * Main function to generate export documents
  * Calls the backend export script and returns the data (does NOT auto-download)
  */
 export const generateExportDocuments = async (teamId: string) => {
   try {
-    // Call backend to run Python scripts and generate files
-    const result = await trpcFetch(`${TRPC}/getExport`, {
-      method: 'POST',
-      body: JSON.stringify({ teamId }),
-    });
+    let body: Record<string, unknown> = { teamId };
+    for (let round = 1; ; round++) {
+      // Call backend to run Python scripts and generate files
+      const result = await trpcFetch(`${TRPC}/getExport`, {
+        method: 'POST',
+        body: JSON.stringify(body),
+      });
 
-    if (!result) {
-      throw new Error('No response from backend');
-    }
+      if (!result) {
+        throw new Error('No response from backend');
+      }
 
-    if (!result.success) {
-      throw new Error(result?.error || 'Export failed');
-    }
+      if (!result.success) {
+        throw new Error(result?.error || 'Export failed');
+      }
 
-    return {
-      success: true,
-      pdf2404: result.pdf2404,
-      csvInventory: result.csvInventory,
-    };
+      if (result.done !== false) {
+        return {
+          success: true,
+          pdf2404: result.pdf2404,
+          csvInventory: result.csvInventory,
+        };
+      }
+
+      if (round >= MAX_EXPORT_ROUNDS) {
+        throw new Error('Export did not finish, please try again');
+      }
+      body = { teamId, continuation: result.continuation };
+    }
   } catch (error) {
     if (error instanceof Error) {
       throw new Error(error.message || 'Failed to generate documents');